@@ -0,0 +1,117 @@
+"""
+Benchmark the insert paths of OracleVS4DBLoading
+
+compares LangChain add_documents with bulk_add_documents (array binding)
+on synthetic chunks. Embeddings are random vectors computed locally,
+so that only the DB insert is measured.
+
+Two temporary collections are created and dropped at the end.
+
+Usage: python bench_bulk_insert.py --chunks 5000 --dimensions 1024
+"""
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+from db_doc_loader_backend import get_db_connection
+from oraclevs_4_db_loading import OracleVS4DBLoading
+from utils import get_console_logger
+from config import BULK_INSERT_BATCH_SIZE
+
+logger = get_console_logger()
+
+
+class RandomEmbeddings(Embeddings):
+    """
+    local embeddings: random normalized vectors
+    """
+
+    def __init__(self, dimensions):
+        self.dimensions = dimensions
+        self.rng = np.random.default_rng(1234)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.rng.standard_normal((len(texts), self.dimensions))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        return vectors.astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def main():
+    """
+    time add_documents and bulk_add_documents, each in a temporary collection
+    """
+    parser = argparse.ArgumentParser(description="Benchmark insert paths.")
+
+    parser.add_argument("--chunks", type=int, default=5000, help="Num. of chunks.")
+    parser.add_argument("--dimensions", type=int, default=1024, help="Vector dims.")
+    parser.add_argument(
+        "--chunk-size", type=int, default=2000, help="Chunk size (chars)."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=BULK_INSERT_BATCH_SIZE,
+        help="Bulk batch size.",
+    )
+
+    args = parser.parse_args()
+
+    embed_model = RandomEmbeddings(args.dimensions)
+
+    docs = [
+        Document(
+            page_content=f"Chunk {i} " + "lorem ipsum " * (args.chunk_size // 12),
+            metadata={"source": f"bench_{i // 100}.pdf", "page_label": str(i % 100)},
+        )
+        for i in range(args.chunks)
+    ]
+
+    results = {}
+
+    with get_db_connection() as conn:
+        for mode in ["add_documents", "bulk_add_documents"]:
+            collection_name = f"BENCH_{mode.upper()}"
+
+            if collection_name in OracleVS4DBLoading.list_collections(conn):
+                OracleVS4DBLoading.drop_collection(conn, collection_name)
+
+            v_store = OracleVS4DBLoading(
+                client=conn,
+                table_name=collection_name,
+                distance_strategy=DistanceStrategy.COSINE,
+                embedding_function=embed_model,
+            )
+
+            time_start = time.perf_counter()
+            if mode == "add_documents":
+                v_store.add_documents(docs)
+            else:
+                v_store.bulk_add_documents(docs, batch_size=args.batch_size)
+            results[mode] = time.perf_counter() - time_start
+
+            OracleVS4DBLoading.drop_collection(conn, collection_name)
+
+    logger.info("")
+    logger.info("Inserted %s chunks, %s dims:", args.chunks, args.dimensions)
+    for mode, elapsed in results.items():
+        logger.info(
+            "%20s: %7.2f sec., %8.1f chunks/sec.", mode, elapsed, args.chunks / elapsed
+        )
+    logger.info(
+        "Speedup: %.1fx", results["add_documents"] / results["bulk_add_documents"]
+    )
+    logger.info("")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark of the startup time of the commands: time to import the
+modules they need, each time in a new interpreter
+
+compares the light modules used by the admin commands (db_connection,
+collection_admin) with the chain they imported before the split (the old
+db_doc_loader_backend: the third-party modules it and its imports
+loaded at import time), and shows the slowest modules imported
+(python -X importtime)
+
+Usage: python bench_import_time.py --runs 5 --top 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from utils import get_console_logger
+
+logger = get_console_logger()
+
+ADMIN_SET = "admin (db_connection, collection_admin)"
+BASELINE_SET = "baseline (old db_doc_loader_backend chain)"
+
+# name -> modules imported
+IMPORT_SETS = {
+    ADMIN_SET: ["db_connection", "collection_admin"],
+    # imported, before the split, by db_doc_loader_backend,
+    # oraclevs_4_db_loading, chunk_index_utils, custom_rest_embeddings, utils
+    # (the old modules can't be imported from this tree)
+    BASELINE_SET: [
+        "oracledb",
+        "numpy",
+        "requests",
+        "tqdm",
+        "langchain.schema",
+        "langchain.prompts",
+        "langchain_text_splitters",
+        "langchain_community.vectorstores.utils",
+        "langchain_community.vectorstores.oraclevs",
+        "langchain_community.embeddings.oci_generative_ai",
+        "langchain_community.document_loaders.pdf",
+        "langchain_community.document_loaders.markdown",
+        "langchain_community.chat_models.oci_generative_ai",
+        "langchain_unstructured",
+    ],
+    "loader (db_doc_loader_backend, chunk_index_utils)": [
+        "db_doc_loader_backend",
+        "chunk_index_utils",
+    ],
+}
+
+TIMING_CODE = """
+import time
+time_start = time.perf_counter()
+{imports}
+print(time.perf_counter() - time_start)
+"""
+
+
+def run_python(args):
+    """
+    run a new interpreter in the dir of the repo, returns the output
+    """
+    result = subprocess.run(
+        [sys.executable] + args,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return result
+
+
+def time_imports(modules, runs):
+    """
+    list of the times (sec.) to import modules, one for each run
+    """
+    code = TIMING_CODE.format(imports="\n".join(f"import {m}" for m in modules))
+
+    return [float(run_python(["-c", code]).stdout.split()[-1]) for _ in range(runs)]
+
+
+def slowest_modules(modules, top):
+    """
+    the modules imported by modules, slowest first (cumulative
+    import time in sec.), from -X importtime
+    """
+    code = "\n".join(f"import {m}" for m in modules)
+    stderr = run_python(["-X", "importtime", "-c", code]).stderr
+
+    timings = []
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        timings.append((int(cumulative) / 1e6, name[1:].rstrip()))
+
+    # the modules imported directly by modules (indented by one level)
+    timings = [
+        (sec, name.strip())
+        for sec, name in timings
+        if name.startswith("  ") and not name.startswith("    ")
+    ]
+
+    return sorted(timings, reverse=True)[:top]
+
+
+def main():
+    """
+    time the import of each set, then show the slowest modules
+    of the admin and baseline sets
+    """
+    parser = argparse.ArgumentParser(description="Import time benchmark.")
+
+    parser.add_argument("--runs", type=int, default=5, help="Runs for each set.")
+    parser.add_argument("--top", type=int, default=8, help="Slowest modules shown.")
+
+    args = parser.parse_args()
+
+    logger.info("")
+    logger.info("%-55s %10s %10s", "modules", "median s", "min s")
+
+    results = {}
+    for name, modules in IMPORT_SETS.items():
+        times = time_imports(modules, args.runs)
+        results[name] = statistics.median(times)
+
+        logger.info("%-55s %10.3f %10.3f", name, results[name], min(times))
+
+    logger.info("")
+    logger.info(
+        "Admin commands startup vs baseline: %.1fx faster",
+        results[BASELINE_SET] / results[ADMIN_SET],
+    )
+
+    for name in [ADMIN_SET, BASELINE_SET]:
+        logger.info("")
+        logger.info("Slowest imports, %s:", name)
+        for sec, module in slowest_modules(IMPORT_SETS[name], args.top):
+            logger.info("  %8.3f s %s", sec, module)
+
+    logger.info("")
+
+
+if __name__ == "__main__":
+    main()
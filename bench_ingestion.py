@@ -0,0 +1,239 @@
+"""
+Offline benchmark of the ingestion pipeline
+
+runs the real pipeline (chunk_index_utils + db_doc_loader_backend) on a
+synthetic corpus, with local stand-ins for the external services:
+    * embeddings: the stub NIM server (stub_embedding_server.py)
+    * DB: an in-memory store (local_vector_store.py)
+
+and reports, for each stage (parse, embed, insert), chunks/s, MB/s
+and the p50/p99 latency of the calls, to catch regressions before
+production.
+
+Usage: python bench_ingestion.py --files 12 --pages 20 --workers 2 --mode streaming
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import db_doc_loader_backend
+from chunk_index_utils import load_and_split_files, iter_chunks
+from custom_rest_embeddings import CustomRESTEmbeddings
+from embedding_cache import get_model_id
+from local_vector_store import LocalDatabase, use_local_database
+from stub_embedding_server import start_stub_server
+from synthetic_corpus import generate_corpus, SUPPORTED_FORMATS
+from utils import get_console_logger
+from config import NVIDIA_EMBED_MODEL
+
+logger = get_console_logger()
+
+COLLECTION_NAME = "BENCH_INGESTION"
+
+
+class TimedEmbeddings(Embeddings):
+    """
+    records the latency of every call to the wrapped model
+    """
+
+    def __init__(self, embed_model: Embeddings):
+        self.embed_model = embed_model
+        self.model_id = get_model_id(embed_model)
+        self.dimensions = getattr(embed_model, "dimensions", None)
+
+        # (latency, num. of texts, num. of chars)
+        self.calls = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time_start = time.perf_counter()
+        embeddings = self.embed_model.embed_documents(texts)
+
+        self.calls.append(
+            (time.perf_counter() - time_start, len(texts), sum(map(len, texts)))
+        )
+
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_model.embed_query(text)
+
+
+def stage_report(name, calls):
+    """
+    one line of the report, calls: list of (latency, chunks, bytes)
+    """
+    if len(calls) == 0:
+        return f"{name:<8} {'no calls':>10}"
+
+    latencies = np.array([call[0] for call in calls])
+    chunks = sum(call[1] for call in calls)
+    n_bytes = sum(call[2] for call in calls)
+
+    # busy time of the stage (the stages overlap in streaming mode)
+    busy_time = latencies.sum()
+
+    return (
+        f"{name:<8} {len(calls):>8} {chunks:>10} {busy_time:>10.2f} "
+        f"{chunks / busy_time:>10.1f} {n_bytes / 2**20 / busy_time:>8.2f} "
+        f"{1000 * np.percentile(latencies, 50):>10.1f} "
+        f"{1000 * np.percentile(latencies, 99):>10.1f}"
+    )
+
+
+def parse_args():
+    """
+    the settings of the benchmark, from the command line
+    """
+    parser = argparse.ArgumentParser(description="Offline ingestion benchmark.")
+
+    parser.add_argument("--files", type=int, default=12, help="Num. of files.")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per file.")
+    parser.add_argument("--words", type=int, default=400, help="Words per page.")
+    parser.add_argument(
+        "--formats",
+        type=str,
+        nargs="+",
+        choices=SUPPORTED_FORMATS,
+        default=SUPPORTED_FORMATS,
+        help="File formats of the corpus.",
+    )
+    parser.add_argument(
+        "--corpus-dir",
+        type=str,
+        default=None,
+        help="Dir for the corpus (default: a temporary dir).",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Parsing processes.")
+    parser.add_argument(
+        "--mode", type=str, choices=["normal", "streaming"], default="normal"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Stub embedding latency (sec.)."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Embedding requests in flight."
+    )
+    parser.add_argument("--dimensions", type=int, default=1024, help="Dimensions.")
+    parser.add_argument(
+        "--insert-latency",
+        type=float,
+        default=0.0,
+        help="Simulated DB time for each row inserted (sec.).",
+    )
+
+    return parser.parse_args()
+
+
+def run_load(args, files, embed_model):
+    """
+    load files in the local DB, in the mode selected by args
+
+    returns the num. of chunks and the timings of the files
+    """
+    timings = []
+
+    if args.mode == "streaming":
+        lengths = db_doc_loader_backend.manage_collection_streaming(
+            iter_chunks(files, workers=args.workers, timings=timings),
+            embed_model,
+            COLLECTION_NAME,
+            is_new_collection=True,
+        )
+        n_chunks = len(lengths)
+    else:
+        docs, timings = load_and_split_files(files, workers=args.workers)
+        db_doc_loader_backend.manage_collection(
+            docs, embed_model, COLLECTION_NAME, is_new_collection=True
+        )
+        n_chunks = len(docs)
+
+    return n_chunks, timings
+
+
+def main():
+    """
+    generate the corpus, load it and print the report
+    """
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = args.corpus_dir or tmp_dir
+
+        files = generate_corpus(
+            corpus_dir, args.files, args.pages, args.words, args.formats
+        )
+        corpus_bytes = sum(os.path.getsize(path) for path in files)
+
+        logger.info("")
+        logger.info(
+            "Corpus: %s files, %.1f MB, mode: %s, workers: %s",
+            len(files),
+            corpus_bytes / 2**20,
+            args.mode,
+            args.workers,
+        )
+        logger.info("")
+
+        server, url = start_stub_server(latency=args.latency)
+
+        embed_model = TimedEmbeddings(
+            CustomRESTEmbeddings(
+                api_url=url,
+                model=NVIDIA_EMBED_MODEL,
+                dimensions=args.dimensions,
+                max_concurrency=args.concurrency,
+            )
+        )
+
+        database = LocalDatabase(args.insert_latency)
+        use_local_database(database)
+
+        time_start = time.perf_counter()
+        n_chunks, timings = run_load(args, files, embed_model)
+        wall_time = time.perf_counter() - time_start
+
+        server.shutdown()
+
+        file_sizes = {path: os.path.getsize(path) for path in files}
+        parse_calls = [
+            (elapsed, chunks, file_sizes[path]) for path, chunks, elapsed in timings
+        ]
+
+    logger.info("")
+    logger.info(
+        "Total: %s chunks in %.2f sec., %.1f chunks/sec., %.2f MB/sec. (input files)",
+        n_chunks,
+        wall_time,
+        n_chunks / wall_time,
+        corpus_bytes / 2**20 / wall_time,
+    )
+    logger.info("Rows in the local DB: %s", len(database.tables[COLLECTION_NAME]))
+    logger.info("")
+    logger.info(
+        "%-8s %8s %10s %10s %10s %8s %10s %10s",
+        "stage",
+        "calls",
+        "chunks",
+        "busy sec.",
+        "chunks/s",
+        "MB/s",
+        "p50 ms",
+        "p99 ms",
+    )
+    logger.info(stage_report("parse", parse_calls))
+    logger.info(stage_report("embed", embed_model.calls))
+    logger.info(stage_report("insert", database.insert_calls))
+    logger.info("")
+    logger.info("parse MB/s: input files, embed and insert MB/s: text of the chunks")
+    logger.info("")
+
+
+# the guard is needed by the worker processes (--workers)
+if __name__ == "__main__":
+    main()
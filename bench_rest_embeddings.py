@@ -0,0 +1,92 @@
+"""
+Benchmark CustomRESTEmbeddings against a local stub server
+
+compares sequential requests with concurrent requests
+and checks that the output is the same (same order)
+
+Usage: python bench_rest_embeddings.py --texts 1000 --latency 0.05
+"""
+
+import argparse
+import time
+
+from custom_rest_embeddings import CustomRESTEmbeddings
+from stub_embedding_server import start_stub_server
+from utils import get_console_logger
+
+logger = get_console_logger()
+
+
+def main():
+    """
+    embed the same texts with each max_concurrency, against the stub server
+    """
+    parser = argparse.ArgumentParser(description="Benchmark REST embeddings.")
+
+    parser.add_argument("--texts", type=int, default=1000, help="Num. of texts.")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Stub latency per request (sec.)."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Values of max_concurrency to test.",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Stub answers 429 over this num. of requests in progress.",
+    )
+
+    args = parser.parse_args()
+
+    server, url = start_stub_server(
+        latency=args.latency, max_in_flight=args.max_in_flight
+    )
+
+    texts = [f"This is the text of the chunk number {i}." for i in range(args.texts)]
+
+    logger.info("")
+    logger.info("Embedding %s texts, stub latency %s sec.", args.texts, args.latency)
+    logger.info("")
+
+    reference = None
+
+    for max_concurrency in args.concurrency:
+        embed_model = CustomRESTEmbeddings(
+            api_url=url,
+            model="stub",
+            dimensions=1024,
+            max_concurrency=max_concurrency,
+        )
+
+        time_start = time.perf_counter()
+        embeddings = embed_model.embed_documents(texts)
+        elapsed = time.perf_counter() - time_start
+
+        if reference is None:
+            reference = embeddings
+
+        logger.info(
+            "max_concurrency: %2d, elapsed: %6.2f sec., %8.1f texts/sec., same output: %s",
+            max_concurrency,
+            elapsed,
+            len(texts) / elapsed,
+            embeddings == reference,
+        )
+        logger.info(
+            "final concurrency: %s, throttled requests (total): %s",
+            embed_model.resilience.limiter.limit,
+            server.num_throttled,
+        )
+
+    logger.info("")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
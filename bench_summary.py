@@ -0,0 +1,119 @@
+"""
+Benchmark the summary methods for the chunk headers
+
+times the local extractive summarizer on the summary windows of a document
+and, optionally (--llm N), N calls to the LLM summary engine
+
+Usage: python bench_summary.py --file ./books/manual.pdf --llm 5
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+from langchain.schema import Document
+
+from chunk_index_utils import get_recursive_text_splitter, load_and_split_file
+from extractive_summary import ExtractiveSummarizer
+from summary_engine import SummaryEngine
+from utils import get_console_logger
+from config import SUMMARY_WINDOW
+
+logger = get_console_logger()
+
+
+def synthetic_chunks(num_chunks):
+    """
+    chunks of random sentences, when no file is given
+    """
+    rnd = random.Random(1234)
+    words = (
+        "database vector index embedding model query table document chunk "
+        "search oracle loader summary performance memory network cluster"
+    ).split()
+
+    sentences = [
+        " ".join(rnd.choice(words) for _ in range(rnd.randint(8, 25))).capitalize()
+        + "."
+        for _ in range(num_chunks * 20)
+    ]
+
+    chunks = get_recursive_text_splitter().split_text(" ".join(sentences))
+
+    return [Document(page_content=chunk) for chunk in chunks[:num_chunks]]
+
+
+def time_summaries(summarizer, texts):
+    """
+    returns the elapsed time (sec.) of each summary
+    """
+    elapsed = []
+
+    for text in texts:
+        time_start = time.perf_counter()
+        summarizer.summarize(text)
+        elapsed.append(time.perf_counter() - time_start)
+
+    return elapsed
+
+
+def log_elapsed(name, elapsed):
+    """
+    print the stats of the timings
+    """
+    logger.info(
+        "%12s: %5d summaries, avg %9.2f ms, p50 %9.2f ms, p99 %9.2f ms, total %7.2f sec.",
+        name,
+        len(elapsed),
+        1000 * np.mean(elapsed),
+        1000 * np.percentile(elapsed, 50),
+        1000 * np.percentile(elapsed, 99),
+        sum(elapsed),
+    )
+
+
+def main():
+    """
+    time the summary methods on the summary windows of the chunks
+    """
+    parser = argparse.ArgumentParser(description="Benchmark summary methods.")
+
+    parser.add_argument("--file", type=str, default=None, help="Document to use.")
+    parser.add_argument(
+        "--chunks", type=int, default=500, help="Num. of synthetic chunks (no --file)."
+    )
+    parser.add_argument(
+        "--llm", type=int, default=0, help="Num. of LLM calls to time (0 = no LLM)."
+    )
+
+    args = parser.parse_args()
+
+    if args.file is not None:
+        docs = load_and_split_file(args.file)
+    else:
+        docs = synthetic_chunks(args.chunks)
+
+    # the same windows used for the chunk headers
+    k = SUMMARY_WINDOW
+    windows = [
+        " ".join(d.page_content for d in docs[max(0, i - k) : i + k + 1])
+        for i in range(len(docs))
+    ]
+
+    logger.info("")
+    logger.info("Summary windows: %s (window: %s chunks)", len(windows), 2 * k + 1)
+    logger.info("")
+
+    log_elapsed("extractive", time_summaries(ExtractiveSummarizer(), windows))
+
+    if args.llm > 0:
+        # no cache, to time the real calls
+        engine = SummaryEngine(cache_path="")
+        log_elapsed("llm", time_summaries(engine, windows[: args.llm]))
+
+    logger.info("")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Benchmark and compatibility check of the text splitters
+
+    * check: FastRecursiveTextSplitter must give the same chunks of the
+      LangChain RecursiveCharacterTextSplitter, on synthetic texts (and on
+      the PDF in --dir), for several chunk_size/chunk_overlap.
+      Exit code 1 if any chunk is different
+    * benchmark: time to split a big text (paragraphs, and a single line
+      of words, where the splitting goes down to the words), MB/s
+
+Usage: python bench_text_splitter.py --mb 2 --runs 3 --dir ./books
+"""
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from fast_text_splitter import FastRecursiveTextSplitter
+from synthetic_corpus import make_vocabulary, make_pages
+from utils import get_console_logger
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+
+logger = get_console_logger()
+
+# (chunk_size, chunk_overlap) used in the check
+SPLIT_SETTINGS = [
+    (CHUNK_SIZE, CHUNK_OVERLAP),
+    (1000, 0),
+    (500, 250),
+    (100, 20),
+    (20, 19),
+    (10, 0),
+]
+
+# custom separators checked too
+SEPARATOR_SETS = [None, ["\n\n", "\n"], ["\n", ". ", " ", ""]]
+
+# pieces of the random texts, to hit the corner cases
+# (runs of separators, leading/trailing whitespace, very long words)
+ODD_PIECES = ["\n\n\n", "\n \n", "  ", "\t", " \n", ". ", "é", "\n"]
+
+
+def synthetic_text(rng, vocabulary, n_pages, words_per_page):
+    """
+    text of n_pages pages of paragraphs
+    """
+    pages = make_pages(rng, vocabulary, n_pages, words_per_page)
+
+    return "\n\n".join("\n\n".join(paragraphs) for paragraphs in pages)
+
+
+def odd_text(rng, vocabulary, n_pieces):
+    """
+    random text of words, separators and long words
+    """
+    pieces = []
+    for _ in range(n_pieces):
+        p = rng.random()
+        if p < 0.5:
+            pieces.append(rng.choice(vocabulary) + " ")
+        elif p < 0.9:
+            pieces.append(rng.choice(ODD_PIECES))
+        else:
+            pieces.append("x" * rng.randint(1, 600))
+
+    return "".join(pieces)
+
+
+def check_texts(texts):
+    """
+    compare the chunks of the two splitters, returns the num. of
+    (text, settings) with different chunks
+    """
+    n_checks = 0
+    n_errors = 0
+
+    for name, text in texts:
+        for chunk_size, chunk_overlap in SPLIT_SETTINGS:
+            for separators in SEPARATOR_SETS:
+                for strip in [True, False]:
+                    kwargs = {
+                        "chunk_size": chunk_size,
+                        "chunk_overlap": chunk_overlap,
+                        "separators": separators,
+                        "strip_whitespace": strip,
+                    }
+                    expected = RecursiveCharacterTextSplitter(**kwargs).split_text(text)
+                    chunks = FastRecursiveTextSplitter(**kwargs).split_text(text)
+
+                    n_checks += 1
+                    if chunks != expected:
+                        n_errors += 1
+                        logger.error("Different chunks: %s %s", name, kwargs)
+
+    return n_checks, n_errors
+
+
+def load_pdf_texts(dir_path):
+    """
+    (name, text of the pages) of the PDF in dir_path
+    """
+    # the pypdf used by PyPDFLoader (only if --dir is given)
+    # pylint: disable=import-outside-toplevel
+    from pypdf import PdfReader
+
+    texts = []
+    for file_path in sorted(glob.glob(os.path.join(dir_path, "*.pdf"))):
+        reader = PdfReader(file_path)
+        for i, page in enumerate(reader.pages):
+            texts.append((f"{os.path.basename(file_path)} p. {i}", page.extract_text()))
+
+    return texts
+
+
+def time_split(splitter, text, runs):
+    """
+    best time (sec.) to split text, and the num. of chunks
+    """
+    times = []
+    for _ in range(runs):
+        time_start = time.perf_counter()
+        chunks = splitter.split_text(text)
+        times.append(time.perf_counter() - time_start)
+
+    return min(times), len(chunks)
+
+
+def benchmark_splitters(texts, runs):
+    """
+    time the two splitters on each (name, text) of texts
+    """
+    splitters = {
+        "langchain": RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+        ),
+        "fast": FastRecursiveTextSplitter(
+            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+        ),
+    }
+
+    logger.info("")
+    logger.info(
+        "%-12s %-10s %10s %10s %10s", "text", "splitter", "sec.", "MB/s", "chunks"
+    )
+
+    for text_name, text in texts:
+        elapsed = {}
+        for name, splitter in splitters.items():
+            elapsed[name], n_chunks = time_split(splitter, text, runs)
+
+            logger.info(
+                "%-12s %-10s %10.3f %10.1f %10s",
+                text_name,
+                name,
+                elapsed[name],
+                len(text) / 1e6 / elapsed[name],
+                n_chunks,
+            )
+
+        logger.info(
+            "%-12s speedup: %.1fx", text_name, elapsed["langchain"] / elapsed["fast"]
+        )
+
+
+def main():
+    """
+    check the chunks, then time the splitters on the big texts
+    """
+    parser = argparse.ArgumentParser(description="Text splitters benchmark.")
+
+    parser.add_argument("--mb", type=float, default=2, help="Size of the big text.")
+    parser.add_argument("--runs", type=int, default=3, help="Runs for each splitter.")
+    parser.add_argument(
+        "--texts", type=int, default=20, help="Num. of random texts checked."
+    )
+    parser.add_argument("--dir", type=str, default=None, help="PDF to check too.")
+
+    args = parser.parse_args()
+
+    # the splitting is deterministic, the texts too
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(rng)
+
+    texts = [("empty", ""), ("blank", " \n\n \n ")]
+    for i in range(args.texts):
+        texts.append(
+            (f"synthetic {i}", synthetic_text(rng, vocabulary, rng.randint(1, 5), 400))
+        )
+        texts.append((f"random {i}", odd_text(rng, vocabulary, rng.randint(1, 2000))))
+
+    if args.dir is not None:
+        texts.extend(load_pdf_texts(args.dir))
+
+    logger.info("")
+    logger.info("Checking the chunks on %s texts...", len(texts))
+
+    n_checks, n_errors = check_texts(texts)
+
+    logger.info("Checked: %s, different: %s", n_checks, n_errors)
+
+    # big texts for the benchmark
+    paragraphs = ""
+    while len(paragraphs) < args.mb * 1e6:
+        paragraphs += synthetic_text(rng, vocabulary, 50, 400) + "\n\n"
+    # no paragraphs and lines: split on the spaces
+    words = paragraphs.replace("\n", " ")
+
+    benchmark_splitters([("paragraphs", paragraphs), ("words", words)], args.runs)
+
+    logger.info("")
+
+    if n_errors > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
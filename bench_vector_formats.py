@@ -0,0 +1,237 @@
+"""
+Recall vs size of the vector formats (FLOAT64, FLOAT32, INT8, BINARY)
+
+vectors are quantized as in the loader (vector_quantization) and the
+top-k for a set of queries is compared with the exact top-k (FLOAT64, COSINE).
+BINARY uses HAMMING distance; "BINARY + rerank" takes rerank * k candidates
+by HAMMING and re-orders them with the full vectors (to be stored too).
+
+By default the vectors are synthetic (clustered, computed locally).
+With --dir the chunks of the files in the dir are embedded with the
+configured model (needs config_private) and a sample is used as queries.
+
+Usage: python bench_vector_formats.py --vectors 10000 --dimensions 1024
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+from vector_quantization import (
+    VECTOR_FORMATS,
+    quantize_int8,
+    quantize_binary,
+    get_vector_bytes,
+)
+from utils import get_console_logger
+
+logger = get_console_logger()
+
+# num. of bits set in each byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def make_synthetic_vectors(n_vectors, dimensions, n_clusters=50, seed=1234):
+    """
+    clustered vectors (real embeddings are far from uniform)
+    """
+    rng = np.random.default_rng(seed)
+
+    centers = rng.standard_normal((n_clusters, dimensions))
+    labels = rng.integers(0, n_clusters, n_vectors)
+
+    return centers[labels] + 0.8 * rng.standard_normal((n_vectors, dimensions))
+
+
+def embed_files(dir_path):
+    """
+    embed the chunks of the files in dir_path with the configured model
+    """
+    # pylint: disable=import-outside-toplevel
+    from chunk_index_utils import load_and_split_files
+    from db_doc_loader_backend import get_embed_model
+
+    files = sorted(
+        f
+        for ext in ["pdf", "docx", "md"]
+        for f in glob.glob(os.path.join(dir_path, f"*.{ext}"))
+    )
+    docs, _ = load_and_split_files(files)
+
+    embed_model = get_embed_model()
+
+    return np.array(embed_model.embed_documents([doc.page_content for doc in docs]))
+
+
+def normalize(vectors):
+    """
+    unit norm rows, for cosine similarity
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+
+    return vectors / norms
+
+
+def top_k_cosine(data, queries, k):
+    """
+    indexes of the top k by cosine similarity, for each query
+    """
+    scores = normalize(queries) @ normalize(data).T
+
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def top_k_hamming(data_bits, query_bits, k):
+    """
+    indexes of the top k by HAMMING distance, for each query
+    """
+    result = []
+    for query in query_bits:
+        distances = POPCOUNT[np.bitwise_xor(data_bits, query)].sum(axis=1)
+        result.append(np.argsort(distances, kind="stable")[:k])
+
+    return np.array(result)
+
+
+def recall(found, exact):
+    """
+    fraction of the exact top k found
+    """
+    hits = sum(len(set(f) & set(e)) for f, e in zip(found, exact))
+
+    return hits / exact.size
+
+
+def search_format(vector_format, data_vectors, query_vectors, k):
+    """
+    indexes of the top k for each query, with the vectors in vector_format
+    """
+    if vector_format in ("FLOAT64", "FLOAT32"):
+        dtype = np.float64 if vector_format == "FLOAT64" else np.float32
+
+        return top_k_cosine(data_vectors.astype(dtype), query_vectors.astype(dtype), k)
+
+    if vector_format == "INT8":
+        return top_k_cosine(
+            quantize_int8(data_vectors).astype(np.float32),
+            quantize_int8(query_vectors).astype(np.float32),
+            k,
+        )
+
+    return top_k_hamming(
+        quantize_binary(data_vectors), quantize_binary(query_vectors), k
+    )
+
+
+def search_binary_rerank(data_vectors, query_vectors, k, rerank):
+    """
+    BINARY for the candidates (rerank x k), full vectors to re-order them
+    """
+    candidates = top_k_hamming(
+        quantize_binary(data_vectors), quantize_binary(query_vectors), k * rerank
+    )
+
+    reranked = []
+    for query, query_candidates in zip(query_vectors, candidates):
+        order = top_k_cosine(data_vectors[query_candidates], query[None, :], k)[0]
+        reranked.append(query_candidates[order])
+
+    return np.array(reranked)
+
+
+def log_results(results, n_data, dims):
+    """
+    recall, size and time of each format
+    """
+    logger.info("")
+    logger.info(
+        "%-20s %10s %14s %14s %10s",
+        "format",
+        "recall",
+        "bytes/vector",
+        "total MB",
+        "sec.",
+    )
+    for name, value, elapsed in results:
+        vector_bytes = get_vector_bytes(dims, name.split()[0])
+
+        logger.info(
+            "%-20s %10.3f %14.0f %14.1f %10.2f",
+            name,
+            value,
+            vector_bytes,
+            vector_bytes * n_data / 2**20,
+            elapsed,
+        )
+    logger.info("")
+
+
+def main():
+    """
+    recall@k of each format, against the exact top k (FLOAT64)
+    """
+    parser = argparse.ArgumentParser(description="Recall vs size of vector formats.")
+
+    parser.add_argument("--vectors", type=int, default=10000, help="Num. of vectors.")
+    parser.add_argument("--queries", type=int, default=100, help="Num. of queries.")
+    parser.add_argument("--dimensions", type=int, default=1024, help="Dimensions.")
+    parser.add_argument("--k", type=int, default=10, help="Top k.")
+    parser.add_argument(
+        "--rerank", type=int, default=4, help="Candidates (x k) for BINARY + rerank."
+    )
+    parser.add_argument(
+        "--dir", type=str, default=None, help="Use the embeddings of these files."
+    )
+
+    args = parser.parse_args()
+
+    if args.dir is not None:
+        all_vectors = embed_files(args.dir)
+    else:
+        all_vectors = make_synthetic_vectors(
+            args.vectors + args.queries, args.dimensions
+        )
+
+    # the queries are held out from the data
+    permutation = np.random.default_rng(42).permutation(len(all_vectors))
+    n_queries = min(args.queries, len(all_vectors) // 10)
+
+    query_vectors = all_vectors[permutation[:n_queries]]
+    data_vectors = all_vectors[permutation[n_queries:]]
+
+    exact_top_k = top_k_cosine(data_vectors, query_vectors, args.k)
+
+    results = []
+
+    for vector_format in VECTOR_FORMATS.values():
+        time_start = time.perf_counter()
+        found = search_format(vector_format, data_vectors, query_vectors, args.k)
+        elapsed = time.perf_counter() - time_start
+
+        results.append((vector_format, recall(found, exact_top_k), elapsed))
+
+    time_start = time.perf_counter()
+    found = search_binary_rerank(data_vectors, query_vectors, args.k, args.rerank)
+    elapsed = time.perf_counter() - time_start
+
+    results.append(
+        (f"BINARY + rerank x{args.rerank}", recall(found, exact_top_k), elapsed)
+    )
+
+    logger.info("")
+    logger.info(
+        "%s vectors, %s dims., %s queries, recall@%s",
+        len(data_vectors),
+        data_vectors.shape[1],
+        n_queries,
+        args.k,
+    )
+    log_results(results, *data_vectors.shape)
+
+
+if __name__ == "__main__":
+    main()
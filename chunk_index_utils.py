@@ -9,73 +9,268 @@ Usage: contains the functions to split in chunks and create the index
 Update: started to add more "context engineering"
 """
 
+import multiprocessing
+import os
 import time
-from collections import defaultdict
-from tqdm import tqdm
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from langchain.schema import Document
-from langchain.prompts import PromptTemplate
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import PyPDFLoader, UnstructuredMarkdownLoader
-from langchain_community.chat_models.oci_generative_ai import ChatOCIGenAI
 from langchain_unstructured import UnstructuredLoader
 
-from utils import get_console_logger, remove_path_from_ref
+from utils import (
+    get_console_logger,
+    remove_path_from_ref,
+    compute_file_hash,
+    compute_text_hash,
+    check_value_in_list,
+)
 from config import (
     VERBOSE,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
+    TEXT_SPLITTER,
+    LOAD_WORKERS,
     ENABLE_SUMMARY,
     SUMMARY_WINDOW,
-    MODEL_4_SUMMARY,
-    ENDPOINT,
-    AUTH_TYPE,
+    SUMMARY_MODE,
+    SUMMARY_BLOCK_SIZE,
+    SUMMARY_DOC_LEVEL,
+    SUMMARY_STREAM_BATCH,
+    SUMMARY_METHOD,
 )
-from config_private import COMPARTMENT_ID
+from fast_text_splitter import FastRecursiveTextSplitter
+from summary_engine import get_summary_engine
+from extractive_summary import ExtractiveSummarizer
+from metrics import METRICS
+from profiling import worker_profiling
 
 logger = get_console_logger()
 
+# the worker processes are started fresh (not forked) on every platform:
+# they don't inherit the DB pool, the model clients and their threads
+WORKERS_START_METHOD = "spawn"
+
+
+def get_summarizer():
+    """
+    return the summarizer selected with SUMMARY_METHOD:
+        llm: OCI GenAI (summary engine)
+        extractive: local, sentences selected with TextRank
+    """
+    check_value_in_list(SUMMARY_METHOD, ["llm", "extractive"])
+
+    if SUMMARY_METHOD == "extractive":
+        return ExtractiveSummarizer()
+
+    return get_summary_engine()
+
 
 def generate_summary(text: str) -> str:
     """
     Given a text (set of chunks) generate a summary
     """
-    # to avoid to be throttled with on-demand
     if ENABLE_SUMMARY:
-        time.sleep(1)
-
-        # 1. Create prompt template that keeps same language
-        prompt_template = PromptTemplate(
-            input_variables=["text"],
-            template=(
-                "Read the following text and generate a brief summary in the **same language** of the original text.\n\n"
-                "Return ONLY the summary, do not add comments or any other text."
-                "Text:\n{text}\n\n"
-                "Summary:"
-            ),
-        )
-
-        # 2. Set up OCI LLM
-        llm = ChatOCIGenAI(
-            auth_type=AUTH_TYPE,
-            model_id=MODEL_4_SUMMARY,
-            service_endpoint=ENDPOINT,
-            compartment_id=COMPARTMENT_ID,
-        )
-        # 3. Set up LangChain chain
-        summary_chain = prompt_template | llm
-
-        # 4. Run the chain and return result
-        return summary_chain.invoke({"text": text}).content
+        return get_summarizer().summarize(text)
 
     # summary not enabled
     return ""
 
 
+def get_window_summaries(docs):
+    """
+    one summary for each chunk, built over a window of 2k + 1 chunks
+    around the chunk
+    """
+    # summary is built over 2k + 1 chunks
+    k = SUMMARY_WINDOW
+
+    context_texts = []
+    for i in range(len(docs)):
+        start = max(0, i - k)
+        end = min(len(docs), i + k + 1)
+        context_texts.append(" ".join(d.page_content for d in docs[start:end]))
+
+    return get_summarizer().summarize_many(context_texts)
+
+
+def get_block_summaries(docs, block_size=SUMMARY_BLOCK_SIZE):
+    """
+    one summary for each block of block_size consecutive chunks,
+    each chunk gets the summary of its block
+
+    returns the summaries for each chunk and the list of block summaries
+    """
+    block_texts = [
+        " ".join(d.page_content for d in docs[i : i + block_size])
+        for i in range(0, len(docs), block_size)
+    ]
+
+    block_summaries = get_summarizer().summarize_many(block_texts)
+
+    summaries = [block_summaries[i // block_size] for i in range(len(docs))]
+
+    return summaries, block_summaries
+
+
+def make_header_chunk(doc, doc_name, summary="", doc_summary=None):
+    """
+    return the chunk with the header (title and summaries) added
+
+    chunk_hash is computed on the text before the header: the summaries
+    change at every run and cover the neighbouring chunks too
+    """
+    # split to remove the extension
+    doc_title = doc_name.split(".")[0]
+
+    # generate the header
+    chunk_header = f"# Doc. title: {doc_title}\n"
+
+    if doc_summary is not None:
+        chunk_header += f"Doc. summary: {doc_summary}\n"
+
+    if ENABLE_SUMMARY:
+        # add to header
+        chunk_header += f"Summary: {summary}\n\n"
+
+    new_doc = Document(
+        page_content=chunk_header + doc.page_content,
+        metadata={
+            "source": doc_name,
+            "page_label": doc.metadata.get("page_label", None),
+            "chunk_hash": compute_text_hash(doc.page_content),
+        },
+    )
+    if VERBOSE:
+        logger.info(new_doc)
+
+    return new_doc
+
+
+def add_chunk_headers(docs, doc_name):
+    """
+    add to each chunk the header with title and summary
+
+    SUMMARY_MODE:
+        window: the summary is built over a window of 2k + 1 chunks
+        block: the summary is built once for each block of chunks
+    with SUMMARY_DOC_LEVEL (block mode) a summary of the whole document,
+    built from the block summaries, is added to the header
+    """
+    summaries = [""] * len(docs)
+    doc_summary = None
+
+    if ENABLE_SUMMARY and len(docs) > 0:
+        check_value_in_list(SUMMARY_MODE, ["window", "block"])
+
+        with METRICS.stage("summary", items=len(docs)):
+            if SUMMARY_MODE == "window":
+                summaries = get_window_summaries(docs)
+            else:
+                summaries, block_summaries = get_block_summaries(docs)
+
+                if SUMMARY_DOC_LEVEL:
+                    doc_summary = get_summarizer().summarize("\n".join(block_summaries))
+
+    processed_docs = []
+
+    for doc, summary in zip(docs, summaries):
+        processed_docs.append(make_header_chunk(doc, doc_name, summary, doc_summary))
+
+    return processed_docs
+
+
+def get_stream_summaries(pending, history, n):
+    """
+    summaries of the first n chunks of pending, as in add_chunk_headers
+
+    history: the chunks before pending (at least SUMMARY_WINDOW),
+    pending must contain the SUMMARY_WINDOW chunks after the n
+    (unless they are the last of the doc)
+    """
+    if SUMMARY_MODE == "window":
+        k = SUMMARY_WINDOW
+        window = list(history) + pending
+        offset = len(history)
+
+        context_texts = [
+            " ".join(d.page_content for d in window[max(0, j - k) : j + k + 1])
+            for j in range(offset, offset + n)
+        ]
+
+        return get_summarizer().summarize_many(context_texts)
+
+    summaries, _ = get_block_summaries(pending[:n])
+
+    return summaries
+
+
+def iter_chunk_headers(docs_iter, doc_name, batch_size=SUMMARY_STREAM_BATCH):
+    """
+    as add_chunk_headers, consuming and yielding the chunks one at a time
+
+    only batch_size chunks (+ the look-ahead of the window) are kept
+    in memory: they're summarized together. With SUMMARY_DOC_LEVEL
+    (block mode) the summary of the doc is needed for the first chunk,
+    the whole doc is buffered
+    """
+    if not ENABLE_SUMMARY:
+        for doc in docs_iter:
+            yield make_header_chunk(doc, doc_name)
+        return
+
+    check_value_in_list(SUMMARY_MODE, ["window", "block"])
+
+    if SUMMARY_MODE == "block" and SUMMARY_DOC_LEVEL:
+        yield from add_chunk_headers(list(docs_iter), doc_name)
+        return
+
+    if SUMMARY_MODE == "window":
+        look_ahead = SUMMARY_WINDOW
+    else:
+        # the blocks must be the same of add_chunk_headers
+        look_ahead = 0
+        batch_size = max(1, batch_size // SUMMARY_BLOCK_SIZE) * SUMMARY_BLOCK_SIZE
+
+    # chunks already yielded (for the windows) and chunks waiting
+    history = deque(maxlen=SUMMARY_WINDOW)
+    pending = []
+
+    def summarize_pending(n):
+        with METRICS.stage("summary", items=n):
+            summaries = get_stream_summaries(pending, history, n)
+
+        for doc, summary in zip(pending[:n], summaries):
+            yield make_header_chunk(doc, doc_name, summary)
+
+        history.extend(pending[:n])
+        del pending[:n]
+
+    for doc in docs_iter:
+        pending.append(doc)
+
+        if len(pending) >= batch_size + look_ahead:
+            yield from summarize_pending(batch_size)
+
+    # end of the doc
+    if len(pending) > 0:
+        yield from summarize_pending(len(pending))
+
+
 def get_recursive_text_splitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     """
-    return a recursive text splitter
+    return a recursive text splitter (TEXT_SPLITTER: fast or langchain,
+    same chunks)
     """
-    text_splitter = RecursiveCharacterTextSplitter(
+    check_value_in_list(TEXT_SPLITTER, ["fast", "langchain"])
+
+    if TEXT_SPLITTER == "fast":
+        splitter_class = FastRecursiveTextSplitter
+    else:
+        splitter_class = RecursiveCharacterTextSplitter
+
+    text_splitter = splitter_class(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         length_function=len,
@@ -84,158 +279,411 @@ def get_recursive_text_splitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERL
     return text_splitter
 
 
-def load_and_split_pdf(book_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+def iter_split_pages(pages, text_splitter):
     """
-    load a single book in pdf format
+    split the pages (or elements) yielded by a loader, one at a time
+
+    parse (reading the next page) and split are timed for each page
     """
-    text_splitter = get_recursive_text_splitter(chunk_size, chunk_overlap)
+    pages = iter(pages)
 
-    loader = PyPDFLoader(file_path=book_path)
+    while True:
+        with METRICS.stage("parse") as call:
+            page = next(pages, None)
+            call["items"] = 0 if page is None else 1
 
-    docs = loader.load_and_split(text_splitter=text_splitter)
+        if page is None:
+            return
 
-    chunk_header = ""
+        with METRICS.stage("split", items=1):
+            chunks = text_splitter.split_documents([page])
 
-    doc_name = remove_path_from_ref(book_path)
-    # split to remove the extension
-    doc_title = doc_name.split(".")[0]
+        yield from chunks
+
+
+def iter_load_and_split_pdf(
+    book_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+):
+    """
+    load a single book in pdf format, yields the chunks page by page
+    """
+    text_splitter = get_recursive_text_splitter(chunk_size, chunk_overlap)
+
+    loader = PyPDFLoader(file_path=book_path)
+
+    # pages read one at a time (lazy_load), not the whole doc
+    docs_iter = iter_split_pages(loader.lazy_load(), text_splitter)
 
     # modified (15/07/2025)
-    processed_docs = []
-    # summary is built over 2k + 1 chunks
-    k = SUMMARY_WINDOW
+    yield from iter_chunk_headers(docs_iter, remove_path_from_ref(book_path))
 
-    for i, doc in tqdm(enumerate(docs), total=len(docs), desc="Processing docs"):
-        # to generate a summary taking a window of 2k+1 chunks
-        start = max(0, i - k)
-        end = min(len(docs), i + k + 1)
-        context_docs = docs[start:end]
-        context_text = " ".join(d.page_content for d in context_docs)
-
-        # generate the header
-        chunk_header = f"# Doc. title: {doc_title}\n"
-
-        if ENABLE_SUMMARY:
-            # generate the summary of the window around doc
-            summary = generate_summary(context_text)
-            # add to header
-            chunk_header += f"Summary: {summary}\n\n"
-
-        new_doc = Document(
-            page_content=chunk_header + doc.page_content,
-            metadata={
-                "source": doc_name,
-                "page_label": doc.metadata.get("page_label", None),
-            },
-        )
-        if VERBOSE:
-            logger.info(new_doc)
 
-        processed_docs.append(new_doc)
+def load_and_split_pdf(book_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    load a single book in pdf format
+    """
+    processed_docs = list(iter_load_and_split_pdf(book_path, chunk_size, chunk_overlap))
 
-    logger.info("Loaded %s chunks...", len(docs))
+    logger.info("Loaded %s chunks...", len(processed_docs))
 
     return processed_docs
 
 
-def load_and_split_docx(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+def iter_element_pages(elements):
     """
-    To load docx files
+    group the elements yielded by a loader by page number,
+    yields (page, list of texts) for each run of elements of the same page
     """
-    loader = UnstructuredLoader(file_path)
-    docs = loader.load()
+    elements = iter(elements)
+    page = None
+    texts = []
 
-    # Raggruppa per numero di pagina (o altro metadato)
-    grouped_text = defaultdict(list)
+    while True:
+        with METRICS.stage("parse") as call:
+            element = next(elements, None)
+            call["items"] = 0 if element is None else 1
 
-    chunk_header = ""
+        if element is None:
+            break
 
-    if len(docs) > 0:
-        doc_name = remove_path_from_ref(file_path)
-        # split to remove the extension
-        doc_title = doc_name.split(".")[0]
-        chunk_header = f"# Doc. title: {doc_title}\n"
-
-    for doc in docs:
         # fallback to 0 if not available
-        page = doc.metadata.get("page_number", 0)
-        grouped_text[page].append(doc.page_content)
+        element_page = element.metadata.get("page_number", 0)
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap
-    )
+        if len(texts) > 0 and element_page != page:
+            yield page, texts
+            texts = []
 
-    final_chunks = []
+        page = element_page
+        texts.append(element.page_content)
+
+    if len(texts) > 0:
+        yield page, texts
+
+
+def iter_load_and_split_docx(
+    file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+):
+    """
+    To load docx files, yields the chunks page by page
+
+    the elements are grouped by page number (elements of a page are
+    contiguous in a docx)
+    """
+    loader = UnstructuredLoader(file_path)
+
+    doc_name = remove_path_from_ref(file_path)
+    # split to remove the extension
+    doc_title = doc_name.split(".")[0]
+    chunk_header = f"# Doc. title: {doc_title}\n"
+
+    splitter = get_recursive_text_splitter(chunk_size, chunk_overlap)
 
     # Per ogni pagina (o gruppo), unisci il testo e splitta
-    for page, texts in grouped_text.items():
-        full_text = "\n".join(texts)
-        splits = splitter.split_text(full_text)
+    for page, texts in iter_element_pages(loader.lazy_load()):
+        with METRICS.stage("split", items=len(texts)):
+            splits = splitter.split_text("\n".join(texts))
 
         for chunk in splits:
-            final_chunks.append(
-                Document(
-                    # add more context
-                    page_content=chunk_header + chunk,
-                    metadata={
-                        "source": doc_name,
-                        "page_label": str(page),
-                    },
-                )
+            yield Document(
+                # add more context
+                page_content=chunk_header + chunk,
+                metadata={
+                    "source": doc_name,
+                    "page_label": str(page),
+                    "chunk_hash": compute_text_hash(chunk),
+                },
             )
 
+
+def load_and_split_docx(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    To load docx files
+    """
+    final_chunks = list(iter_load_and_split_docx(file_path, chunk_size, chunk_overlap))
+
     logger.info("Loaded %s chunks...", len(final_chunks))
 
     return final_chunks
 
 
-def load_and_split_md(book_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+def iter_load_and_split_md(
+    book_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+):
     """
-    add a single document in markdown format
+    add a single document in markdown format, yields the chunks
+
+    (a md has no pages: the loader returns its text as one element)
     """
     text_splitter = get_recursive_text_splitter(chunk_size, chunk_overlap)
 
     loader = UnstructuredMarkdownLoader(book_path)
-    docs = loader.load_and_split(text_splitter=text_splitter)
 
-    chunk_header = ""
-    doc_name = remove_path_from_ref(book_path)
-    # split to remove the extension
-    doc_title = doc_name.split(".")[0]
+    docs_iter = iter_split_pages(loader.lazy_load(), text_splitter)
 
     # modified (15/07/2025)
-    processed_docs = []
-    # summary is built over 2k + 1 chunks
-    k = SUMMARY_WINDOW
+    yield from iter_chunk_headers(docs_iter, remove_path_from_ref(book_path))
 
-    for i, doc in tqdm(enumerate(docs), total=len(docs), desc="Processing docs"):
-        # to generate a summary taking a window of 2k+1 chunks
-        start = max(0, i - k)
-        end = min(len(docs), i + k + 1)
-        context_docs = docs[start:end]
-        context_text = " ".join(d.page_content for d in context_docs)
-
-        # generate the header
-        chunk_header = f"# Doc. title: {doc_title}\n"
-
-        if ENABLE_SUMMARY:
-            # generate the summary of the window around doc
-            summary = generate_summary(context_text)
-            # add to header
-            chunk_header += f"Summary: {summary}\n\n"
-
-        new_doc = Document(
-            page_content=chunk_header + doc.page_content,
-            metadata={
-                "source": doc_name,
-                "page_label": doc.metadata.get("page_label", None),
-            },
-        )
-        if VERBOSE:
-            logger.info(new_doc)
 
-        processed_docs.append(new_doc)
+def load_and_split_md(book_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    add a single document in markdown format
+    """
+    processed_docs = list(iter_load_and_split_md(book_path, chunk_size, chunk_overlap))
 
-    logger.info("Loaded %s chunks...", len(docs))
+    logger.info("Loaded %s chunks...", len(processed_docs))
 
     return processed_docs
+
+
+# file extension -> loader yielding the chunks
+STREAMING_LOADERS = {
+    ".pdf": iter_load_and_split_pdf,
+    ".docx": iter_load_and_split_docx,
+    ".md": iter_load_and_split_md,
+}
+
+
+def add_content_hashes(docs, doc_hash):
+    """
+    add to the metadata the hash of the document and of each chunk
+
+    used to detect changes and re-index only the chunks changed
+    (the loaders set chunk_hash on the text without the header)
+    """
+    for doc in docs:
+        doc.metadata["doc_hash"] = doc_hash
+        if "chunk_hash" not in doc.metadata:
+            doc.metadata["chunk_hash"] = compute_text_hash(doc.page_content)
+
+    return docs
+
+
+def load_and_split_file(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    load a single file, the loader is chosen from the file extension
+
+    the metadata of the chunks contain the hash of the file and of the chunk
+    """
+    _, file_ext = os.path.splitext(file_path)
+
+    if file_ext == ".pdf":
+        docs = load_and_split_pdf(file_path, chunk_size, chunk_overlap)
+    elif file_ext == ".docx":
+        docs = load_and_split_docx(file_path, chunk_size, chunk_overlap)
+    elif file_ext == ".md":
+        docs = load_and_split_md(file_path, chunk_size, chunk_overlap)
+    else:
+        logger.info("File type not supported, skipping %s", file_path)
+
+        return []
+
+    return add_content_hashes(docs, compute_file_hash(file_path))
+
+
+def iter_load_and_split_file(
+    file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+):
+    """
+    as load_and_split_file, yields the chunks page by page:
+    the memory used doesn't depend on the length of the file
+    """
+    _, file_ext = os.path.splitext(file_path)
+
+    if file_ext not in STREAMING_LOADERS:
+        logger.info("File type not supported, skipping %s", file_path)
+
+        return
+
+    doc_hash = compute_file_hash(file_path)
+
+    for doc in STREAMING_LOADERS[file_ext](file_path, chunk_size, chunk_overlap):
+        yield add_content_hashes([doc], doc_hash)[0]
+
+
+def record_file_metrics(file_path, n_chunks, elapsed):
+    """
+    record the stats of a file loaded in METRICS
+    """
+    n_bytes = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+
+    METRICS.record("file", elapsed, n_chunks, n_bytes)
+    METRICS.record_file(file_path, n_chunks, n_bytes, elapsed)
+
+
+def timed_load_and_split_file(file_path, chunk_size, chunk_overlap):
+    """
+    load a single file and measure the time spent
+
+    defined at module level to be usable in a process pool
+    """
+    logger.info("Chunking: %s", file_path)
+
+    time_start = time.perf_counter()
+    docs = load_and_split_file(file_path, chunk_size, chunk_overlap)
+    elapsed = time.perf_counter() - time_start
+
+    record_file_metrics(file_path, len(docs), elapsed)
+
+    return docs, elapsed
+
+
+def timed_load_and_split_file_task(file_path, chunk_size, chunk_overlap):
+    """
+    as timed_load_and_split_file, in a worker process:
+    returns also the metrics recorded, to be merged in the main process
+    """
+    METRICS.reset()
+
+    # profiled if the main process is profiling
+    with worker_profiling():
+        docs, elapsed = timed_load_and_split_file(file_path, chunk_size, chunk_overlap)
+
+    return docs, elapsed, METRICS.snapshot()
+
+
+def iter_load_and_split_files(
+    files_list, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, workers=LOAD_WORKERS
+):
+    """
+    load and split a list of files
+
+    yields (file_path, docs, elapsed) in the same order of files_list,
+    so that the result doesn't depend on the number of workers.
+    With workers > 1 files are parsed in a process pool, with at most
+    2 * workers files in flight (the workers import the __main__ module:
+    the scripts must have the if __name__ == "__main__" guard)
+    """
+    if workers <= 1:
+        for file_path in files_list:
+            docs, elapsed = timed_load_and_split_file(
+                file_path, chunk_size, chunk_overlap
+            )
+            yield file_path, docs, elapsed
+        return
+
+    files_iter = iter(files_list)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(WORKERS_START_METHOD),
+    ) as executor:
+        pending = deque()
+
+        def submit_next():
+            file_path = next(files_iter, None)
+            if file_path is not None:
+                future = executor.submit(
+                    timed_load_and_split_file_task,
+                    file_path,
+                    chunk_size,
+                    chunk_overlap,
+                )
+                pending.append((file_path, future))
+
+        for _ in range(2 * workers):
+            submit_next()
+
+        while pending:
+            file_path, future = pending.popleft()
+            docs, elapsed, worker_metrics = future.result()
+            METRICS.merge(worker_metrics)
+            submit_next()
+
+            yield file_path, docs, elapsed
+
+
+def load_and_split_files(
+    files_list, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, workers=LOAD_WORKERS
+):
+    """
+    load and split a list of files
+
+    returns the list of all the chunks (in the order of files_list)
+    and the list of timings: (file_path, num. of chunks, elapsed secs.)
+    """
+    docs = []
+    timings = []
+
+    for file_path, file_docs, elapsed in iter_load_and_split_files(
+        files_list, chunk_size, chunk_overlap, workers
+    ):
+        docs += file_docs
+        timings.append((file_path, len(file_docs), elapsed))
+
+    return docs, timings
+
+
+def iter_chunks(
+    files_list,
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+    workers=LOAD_WORKERS,
+    timings=None,
+):
+    """
+    yields the chunks of all the files, one at a time
+
+    with workers <= 1 the files are read page by page (memory doesn't
+    depend on the length of the files), otherwise each file is loaded
+    by a worker process.
+    If a list is passed as timings, (file_path, num. of chunks, elapsed secs.)
+    is appended for each file
+    """
+    if workers <= 1:
+        for file_path in files_list:
+            logger.info("Chunking: %s", file_path)
+
+            docs_iter = iter_load_and_split_file(file_path, chunk_size, chunk_overlap)
+            n_chunks = 0
+            # only the time spent loading, not the time of the consumer
+            elapsed = 0.0
+
+            while True:
+                time_start = time.perf_counter()
+                doc = next(docs_iter, None)
+                elapsed += time.perf_counter() - time_start
+
+                if doc is None:
+                    break
+
+                n_chunks += 1
+                yield doc
+
+            record_file_metrics(file_path, n_chunks, elapsed)
+
+            if timings is not None:
+                timings.append((file_path, n_chunks, elapsed))
+        return
+
+    for file_path, docs, elapsed in iter_load_and_split_files(
+        files_list, chunk_size, chunk_overlap, workers
+    ):
+        if timings is not None:
+            timings.append((file_path, len(docs), elapsed))
+
+        yield from docs
+
+
+def log_timings(timings):
+    """
+    print the time spent on each file, slowest first
+    """
+    if len(timings) == 0:
+        return
+
+    total_time = sum(elapsed for _, _, elapsed in timings)
+
+    logger.info("")
+    logger.info("Time spent per file (slowest first):")
+    for file_path, n_chunks, elapsed in sorted(
+        timings, key=lambda t: t[2], reverse=True
+    ):
+        logger.info(
+            "%8.2f sec. (%5.1f%%) %6d chunks  %s",
+            elapsed,
+            100.0 * elapsed / total_time if total_time > 0 else 0.0,
+            n_chunks,
+            file_path,
+        )
+    logger.info("Total parsing time: %.2f sec.", total_time)
+    logger.info("")
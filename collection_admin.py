@@ -0,0 +1,817 @@
+"""
+Administration of the collections: plain SQL with python-oracledb
+
+list, analyze, delete documents and chunks, vector indexes, registry of
+the collections, document catalog, drop. Only oracledb is needed (no
+LangChain, no NumPy): used by the db_* admin commands, that must start
+fast, and by OracleVS4DBLoading
+"""
+
+import os
+import json
+import re
+import time
+from collections import Counter
+import oracledb
+from oracledb import Connection, DB_TYPE_RAW, DB_TYPE_LONG
+
+from utils import get_console_logger, debug_bool
+from config import DELETE_BATCH_SIZE
+from config import (
+    VECTOR_INDEX_TARGET_ACCURACY,
+    HNSW_NEIGHBORS,
+    HNSW_EF_CONSTRUCTION,
+    IVF_PARTITIONS,
+    VECTOR_INDEX_PARALLEL,
+)
+
+logger = get_console_logger()
+
+VERBOSE = debug_bool(os.environ.get("DEBUG", "False"))
+
+# table recording, for each collection, the embedding model and dimensions
+REGISTRY_TABLE = "DOC_LOADER_COLLECTIONS"
+
+# document catalog of a collection: {collection}_CATALOG
+# a row with doc_hash NULL is a document being loaded (pending): its
+# chunks are committed in more transactions, the hash is set in the last
+CATALOG_SUFFIX = "_CATALOG"
+
+# doc_hash of the documents loaded without it (catalog rebuilt from the
+# chunks): loaded, but the content can't be compared
+UNKNOWN_HASH = "unknown"
+
+# ORA-00942: table or view does not exist, ORA-00955: name already used
+ORA_TABLE_NOT_EXISTS = 942
+ORA_NAME_ALREADY_USED = 955
+
+
+def get_collection_vector_format(connection: Connection, collection_name: str):
+    """
+    return the format of the vector column of the collection
+    (None if the collection doesn't exist)
+    """
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            SELECT COUNT(*)
+            FROM user_tables
+            WHERE table_name = :table_name
+            """,
+            table_name=collection_name.upper(),
+        )
+        if cur.fetchone()[0] == 0:
+            return None
+
+        # the format declared in the DDL, from the dictionary
+        cur.execute(
+            """
+            SELECT DBMS_METADATA.GET_DDL('TABLE', :table_name)
+            FROM dual
+            """,
+            table_name=collection_name.upper(),
+        )
+        ddl = cur.fetchone()[0].read()
+
+    # e.g. "EMBEDDING" VECTOR(1024, INT8, DENSE)
+    match = re.search(r"VECTOR\s*\(\s*[\d*]+\s*,\s*(\w+)", ddl, re.IGNORECASE)
+
+    if match is None:
+        # VECTOR(*, *): the insert converts to the column format
+        return "FLOAT32"
+
+    return match.group(1).upper()
+
+
+def list_collections(connection: Connection):
+    """
+    return a list of all collections (tables) with a type vector
+    in the schema in use
+    """
+
+    query = """
+            SELECT DISTINCT table_name
+            FROM user_tab_columns
+            WHERE data_type = 'VECTOR'
+            ORDER by table_name ASC
+            """
+
+    with connection.cursor() as cursor:
+        cursor.execute(query)
+
+        rows = cursor.fetchall()
+
+        list_collections = []
+        for row in rows:
+            list_collections.append(row[0])
+
+    return list_collections
+
+
+def list_books_in_collection(connection: Connection, collection_name: str):
+    """ "
+    get the list of books name in the collection
+
+    taken from the document catalog, if the collection has one
+    (without the documents pending, not completely loaded),
+    otherwise from metadata (expect metadata contains source)
+    """
+    try:
+        return [
+            entry["doc_name"]
+            for entry in get_catalog(connection, collection_name)
+            if entry["doc_hash"] is not None
+        ]
+    except oracledb.DatabaseError as e:
+        if e.args[0].code != ORA_TABLE_NOT_EXISTS:
+            raise
+
+    # no catalog: full scan of the collection
+    query = f"""
+            SELECT DISTINCT json_value(METADATA, '$.source') AS books
+            FROM {collection_name}
+            ORDER by books ASC
+            """
+    with connection.cursor() as cursor:
+        cursor.execute(query)
+
+        rows = cursor.fetchall()
+
+        list_books = []
+        for row in rows:
+            list_books.append(row[0])
+
+    return list_books
+
+
+def analyze_collection(
+    connection: Connection,
+    collection_name: str,
+    sample_percent: float = None,
+    max_sources: int = 20,
+) -> str:
+    """
+    analyze a collection and return a text containing a short report
+
+    everything is computed in the DB with aggregate SQL, no row is fetched.
+    With sample_percent (0-100) only a sample of the blocks is read and
+    the counts are estimated, to get the report fast on big collections
+    """
+    table_source = collection_name
+    scale = 1.0
+    if sample_percent is not None and 0 < sample_percent < 100:
+        table_source += f" SAMPLE BLOCK ({sample_percent})"
+        scale = 100.0 / sample_percent
+
+    dim_counter = Counter()
+    format_counter = Counter()
+
+    with connection.cursor() as cur:
+        # the vector columns of the table
+        cur.execute(
+            """
+            SELECT column_name
+            FROM user_tab_columns
+            WHERE table_name = :table_name AND data_type = 'VECTOR'
+            """,
+            table_name=collection_name.upper(),
+        )
+        vector_columns = [row[0] for row in cur.fetchall()]
+
+        # dimensions and formats of the vectors
+        for column in vector_columns:
+            cur.execute(
+                f"""
+                SELECT VECTOR_DIMENSION_COUNT({column}) AS dims,
+                       VECTOR_DIMENSION_FORMAT({column}) AS fmt,
+                       COUNT(*)
+                FROM {table_source}
+                GROUP BY VECTOR_DIMENSION_COUNT({column}),
+                         VECTOR_DIMENSION_FORMAT({column})
+                """
+            )
+            for dims, fmt, count in cur.fetchall():
+                dim_counter[dims] += round(count * scale)
+                format_counter[fmt] += round(count * scale)
+
+        # count and distribution of the lengths of the chunks
+        cur.execute(
+            f"""
+            SELECT COUNT(*), AVG(len), MIN(len), MAX(len),
+                   PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY len),
+                   PERCENTILE_CONT(0.9) WITHIN GROUP (ORDER BY len),
+                   PERCENTILE_CONT(0.99) WITHIN GROUP (ORDER BY len)
+            FROM (SELECT DBMS_LOB.GETLENGTH(text) AS len FROM {table_source})
+            """
+        )
+        records, avg_len, min_len, max_len, p50, p90, p99 = cur.fetchone()
+
+        # num. of chunks for each document
+        cur.execute(
+            f"""
+            SELECT json_value(METADATA, '$.source') AS source, COUNT(*) AS chunks
+            FROM {table_source}
+            GROUP BY json_value(METADATA, '$.source')
+            ORDER BY chunks DESC, source ASC
+            """
+        )
+        source_counts = cur.fetchall()
+
+    def fmt_len(value):
+        return "n.a." if value is None else str(int(round(value)))
+
+    # output
+    report = f"Analyzed collection: {collection_name}\n"
+    if scale > 1:
+        report += f"Estimated from a {sample_percent}% sample of blocks\n"
+    report += f"Total chunks: {round(records * scale)}\n"
+    report += f"Vector dimensions seen (count): {dict(dim_counter)}\n"
+    report += f"Vector formats seen (count): {dict(format_counter)}\n"
+    report += (
+        f"Chunk length (chars): avg {fmt_len(avg_len)}, min {fmt_len(min_len)}, "
+        f"max {fmt_len(max_len)}, p50 {fmt_len(p50)}, p90 {fmt_len(p90)}, "
+        f"p99 {fmt_len(p99)}\n"
+    )
+    report += f"Documents: {len(source_counts)}\n"
+    report += "Chunks per document (count):"
+    for source, count in source_counts[:max_sources]:
+        report += f"\n  {source}: {round(count * scale)}"
+    if len(source_counts) > max_sources:
+        report += f"\n  ... and {len(source_counts) - max_sources} more"
+
+    return report
+
+
+def delete_documents(
+    connection: Connection,
+    collection_name: str,
+    doc_names: list,
+    batch_size: int = DELETE_BATCH_SIZE,
+) -> dict:
+    """
+    doc_names: list of names of docs to drop
+
+    the names are bound as a collection (SYS.ODCIVARCHAR2LIST) and
+    all the chunks of up to batch_size docs are deleted with a single
+    statement, everything in one transaction. The chunks are counted
+    per doc before the delete (one row per doc, not one per chunk)
+
+    returns a dict: doc_name -> num. of chunks deleted
+    """
+    names_type = connection.gettype("SYS.ODCIVARCHAR2LIST")
+
+    where = """
+            WHERE json_value(METADATA, '$.source') IN
+                (SELECT column_value FROM TABLE(:docs))
+            """
+    count_sql = f"""
+                SELECT json_value(METADATA, '$.source'), COUNT(*)
+                FROM {collection_name}
+                {where}
+                GROUP BY json_value(METADATA, '$.source')
+                """
+    delete_sql = f"DELETE FROM {collection_name} {where}"
+
+    # without duplicates, keeping the order
+    unique_names = list(dict.fromkeys(doc_names))
+    deleted = Counter({doc_name: 0 for doc_name in unique_names})
+
+    try:
+        with connection.cursor() as cur:
+            for i in range(0, len(unique_names), batch_size):
+                batch = unique_names[i : i + batch_size]
+                docs = names_type.newobject(batch)
+
+                if VERBOSE:
+                    logger.info("Drop %s", batch)
+                    logger.info(delete_sql)
+
+                # in the same transaction of the delete
+                cur.execute(count_sql, docs=docs)
+                counts = dict(cur.fetchall())
+
+                cur.execute(delete_sql, docs=docs)
+
+                if cur.rowcount != sum(counts.values()):
+                    # chunks added by another session in the meantime
+                    logger.warning(
+                        "Deleted %s chunks, %s counted",
+                        cur.rowcount,
+                        sum(counts.values()),
+                    )
+                deleted.update(counts)
+
+        delete_from_catalog(connection, collection_name, unique_names)
+
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+
+    return dict(deleted)
+
+
+def get_chunk_hashes(
+    connection: Connection, collection_name: str, doc_name: str
+) -> list:
+    """
+    return the chunks of a document as a list of
+    (id, chunk_hash, doc_hash), hashes taken from metadata
+    """
+    sql = f"""
+          SELECT id,
+                 json_value(METADATA, '$.chunk_hash'),
+                 json_value(METADATA, '$.doc_hash')
+          FROM {collection_name}
+          WHERE json_value(METADATA, '$.source') = :doc
+          """
+
+    with connection.cursor() as cur:
+        cur.execute(sql, doc=doc_name)
+
+        rows = cur.fetchall()
+
+    return rows
+
+
+def delete_chunks(connection: Connection, collection_name: str, ids: list):
+    """
+    delete chunks given their ids (primary key), no commit
+    """
+    if len(ids) == 0:
+        return
+
+    with connection.cursor() as cur:
+        cur.setinputsizes(DB_TYPE_RAW)
+        cur.executemany(
+            f"DELETE FROM {collection_name} WHERE id = :1",
+            [(chunk_id,) for chunk_id in ids],
+        )
+
+
+def update_chunks_metadata(
+    connection: Connection, collection_name: str, ids: list, metadatas: list
+):
+    """
+    replace the metadata of chunks given their ids, no commit
+    """
+    if len(ids) == 0:
+        return
+
+    with connection.cursor() as cur:
+        cur.setinputsizes(DB_TYPE_LONG, DB_TYPE_RAW)
+        cur.executemany(
+            f"UPDATE {collection_name} SET metadata = :1 WHERE id = :2",
+            [
+                (json.dumps(metadata), chunk_id)
+                for chunk_id, metadata in zip(ids, metadatas)
+            ],
+        )
+
+
+def create_vector_index(
+    connection: Connection,
+    collection_name: str,
+    index_type: str = "HNSW",
+    distance: str = "COSINE",
+    target_accuracy: int = VECTOR_INDEX_TARGET_ACCURACY,
+    neighbors: int = HNSW_NEIGHBORS,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+    partitions: int = IVF_PARTITIONS,
+    parallel: int = VECTOR_INDEX_PARALLEL,
+) -> dict:
+    """
+    create a vector index on the embeddings of the collection
+
+    index_type: HNSW (in-memory graph, needs VECTOR_MEMORY_SIZE)
+        with neighbors and ef_construction, or IVF (partitions,
+        None to let the DB choose)
+    to be built after the bulk load: the inserts are much slower
+    with the index in place
+
+    returns a dict with index_name, build_time (sec.), size_bytes
+    """
+    index_type = index_type.upper()
+    index_name = f"{collection_name}_{index_type}_IDX".upper()
+
+    if index_type == "HNSW":
+        organization = "INMEMORY NEIGHBOR GRAPH"
+        params = f"TYPE HNSW, NEIGHBORS {neighbors}, EFCONSTRUCTION {ef_construction}"
+    elif index_type == "IVF":
+        organization = "NEIGHBOR PARTITIONS"
+        params = "TYPE IVF"
+        if partitions is not None:
+            params += f", NEIGHBOR PARTITIONS {partitions}"
+    else:
+        raise ValueError(f"Unsupported index type: {index_type}")
+
+    ddl = f"""
+          CREATE VECTOR INDEX {index_name}
+          ON {collection_name} (embedding)
+          ORGANIZATION {organization}
+          DISTANCE {distance}
+          WITH TARGET ACCURACY {target_accuracy}
+          PARAMETERS ({params})
+          """
+    if parallel is not None:
+        ddl += f" PARALLEL {parallel}"
+
+    if VERBOSE:
+        logger.info(ddl)
+
+    time_start = time.perf_counter()
+
+    with connection.cursor() as cur:
+        cur.execute(ddl)
+
+    build_time = time.perf_counter() - time_start
+
+    return {
+        "index_name": index_name,
+        "build_time": build_time,
+        "size_bytes": get_vector_index_size(connection, index_name),
+    }
+
+
+def get_vector_index_size(connection: Connection, index_name: str):
+    """
+    size (bytes) of a vector index, best effort (None if not available):
+    HNSW from the vector memory pool, IVF from the segments
+    of its tables
+    """
+    queries = [
+        # HNSW: in-memory graph
+        """
+        SELECT SUM(allocated_bytes)
+        FROM v$vector_graph_index
+        WHERE owner = SYS_CONTEXT('USERENV', 'CURRENT_SCHEMA')
+          AND index_name = :name
+        """,
+        # IVF: centroids and partitions tables (VECTOR$<index>$...)
+        """
+        SELECT SUM(bytes)
+        FROM user_segments
+        WHERE segment_name = :name
+           OR segment_name LIKE 'VECTOR$' || :name || '$%'
+        """,
+    ]
+
+    with connection.cursor() as cur:
+        for query in queries:
+            try:
+                cur.execute(query, name=index_name.upper())
+                size_bytes = cur.fetchone()[0]
+            except oracledb.DatabaseError:
+                # e.g. no privileges on v$ views
+                continue
+
+            if size_bytes:
+                return int(size_bytes)
+
+    return None
+
+
+def list_vector_indexes(connection: Connection, collection_name: str):
+    """
+    return the vector indexes of the collection,
+    as a list of (index_name, index_subtype, status)
+    """
+    query = """
+            SELECT index_name, index_subtype, status
+            FROM user_indexes
+            WHERE table_name = :table_name AND index_type = 'VECTOR'
+            ORDER BY index_name
+            """
+
+    with connection.cursor() as cur:
+        cur.execute(query, table_name=collection_name.upper())
+
+        rows = cur.fetchall()
+
+    return rows
+
+
+def drop_vector_index(connection: Connection, index_name: str):
+    """
+    drop a vector index
+    """
+    with connection.cursor() as cur:
+        cur.execute(f"DROP INDEX {index_name}")
+
+
+def create_registry(connection: Connection):
+    """
+    create the registry of the collections, if it doesn't exist
+    """
+    ddl = f"""
+          CREATE TABLE {REGISTRY_TABLE} (
+              collection_name VARCHAR2(128) PRIMARY KEY,
+              embed_model VARCHAR2(256) NOT NULL,
+              dimensions NUMBER NOT NULL,
+              projection BLOB,
+              created_at TIMESTAMP DEFAULT SYSTIMESTAMP
+          )
+          """
+
+    with connection.cursor() as cur:
+        try:
+            cur.execute(ddl)
+        except oracledb.DatabaseError as e:
+            if e.args[0].code != ORA_NAME_ALREADY_USED:
+                raise
+
+
+def register_collection(
+    connection: Connection,
+    collection_name: str,
+    embed_model_id: str,
+    dimensions: int,
+    projection: bytes = None,
+):
+    """
+    record the embedding model and dimensions used for the collection
+    (and the PCA projection, if the vectors are projected), and commit
+    """
+    create_registry(connection)
+
+    sql = f"""
+          MERGE INTO {REGISTRY_TABLE} r
+          USING (SELECT :name AS collection_name FROM dual) s
+          ON (r.collection_name = s.collection_name)
+          WHEN MATCHED THEN UPDATE SET
+              r.embed_model = :model, r.dimensions = :dims,
+              r.projection = :projection, r.created_at = SYSTIMESTAMP
+          WHEN NOT MATCHED THEN INSERT
+              (collection_name, embed_model, dimensions, projection)
+              VALUES (:name, :model, :dims, :projection)
+          """
+
+    with connection.cursor() as cur:
+        cur.setinputsizes(projection=oracledb.DB_TYPE_BLOB)
+        cur.execute(
+            sql,
+            name=collection_name.upper(),
+            model=embed_model_id,
+            dims=dimensions,
+            projection=projection,
+        )
+
+    connection.commit()
+
+
+def get_collection_info(connection: Connection, collection_name: str):
+    """
+    return the embedding model, dimensions and projection recorded
+    for the collection, as a dict (None if not recorded)
+    """
+    sql = f"""
+          SELECT embed_model, dimensions, projection
+          FROM {REGISTRY_TABLE}
+          WHERE collection_name = :name
+          """
+
+    with connection.cursor() as cur:
+        try:
+            cur.execute(sql, name=collection_name.upper())
+        except oracledb.DatabaseError as e:
+            if e.args[0].code == ORA_TABLE_NOT_EXISTS:
+                return None
+            raise
+
+        row = cur.fetchone()
+
+    if row is None:
+        return None
+
+    embed_model, dimensions, projection = row
+
+    return {
+        "embed_model": embed_model,
+        "dimensions": int(dimensions),
+        "projection": projection.read() if projection is not None else None,
+    }
+
+
+def drop_collection(connection: Connection, collection_name: str):
+    """
+    drop a collection (its document catalog and its entry in the registry)
+    """
+    sql = f"DROP TABLE {collection_name}"
+
+    cur = connection.cursor()
+
+    cur.execute(sql)
+
+    try:
+        cur.execute(f"DROP TABLE {get_catalog_name(collection_name)}")
+    except oracledb.DatabaseError as e:
+        if e.args[0].code != ORA_TABLE_NOT_EXISTS:
+            raise
+
+    try:
+        cur.execute(
+            f"DELETE FROM {REGISTRY_TABLE} WHERE collection_name = :name",
+            name=collection_name.upper(),
+        )
+        connection.commit()
+    except oracledb.DatabaseError as e:
+        if e.args[0].code != ORA_TABLE_NOT_EXISTS:
+            raise
+
+
+def get_catalog_name(collection_name: str) -> str:
+    """
+    name of the document catalog of the collection
+    """
+    return f"{collection_name}{CATALOG_SUFFIX}".upper()
+
+
+def create_catalog(connection: Connection, collection_name: str) -> bool:
+    """
+    create the document catalog of the collection, if it doesn't exist:
+    one row for each document (name, content hash, num. of chunks,
+    load time, embedding model), so that listing the documents and
+    checking for duplicates don't scan the collection.
+    A new catalog of a collection with documents is filled from them
+
+    returns True if the catalog has been created
+    """
+    ddl = f"""
+          CREATE TABLE {get_catalog_name(collection_name)} (
+              doc_name VARCHAR2(1024) PRIMARY KEY,
+              doc_hash VARCHAR2(64),
+              chunk_count NUMBER NOT NULL,
+              loaded_at TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL,
+              embed_model VARCHAR2(256)
+          )
+          """
+
+    with connection.cursor() as cur:
+        try:
+            cur.execute(ddl)
+        except oracledb.DatabaseError as e:
+            if e.args[0].code != ORA_NAME_ALREADY_USED:
+                raise
+            return False
+
+    rebuild_catalog(connection, collection_name)
+
+    return True
+
+
+def rebuild_catalog(connection: Connection, collection_name: str) -> int:
+    """
+    fill the document catalog from the chunks in the collection
+    (one full scan), and commit. To be used for collections loaded
+    before the catalog existed, or to repair it
+
+    returns the num. of documents in the catalog
+    """
+    catalog_name = get_catalog_name(collection_name)
+
+    info = get_collection_info(connection, collection_name)
+    embed_model = info["embed_model"] if info is not None else None
+
+    with connection.cursor() as cur:
+        cur.execute(f"DELETE FROM {catalog_name}")
+        cur.execute(
+            f"""
+            INSERT INTO {catalog_name} (doc_name, doc_hash, chunk_count, embed_model)
+            SELECT source, NVL(MAX(doc_hash), :unknown), COUNT(*), :model
+            FROM (SELECT json_value(METADATA, '$.source') AS source,
+                         json_value(METADATA, '$.doc_hash') AS doc_hash
+                  FROM {collection_name})
+            WHERE source IS NOT NULL
+            GROUP BY source
+            """,
+            model=embed_model,
+            unknown=UNKNOWN_HASH,
+        )
+        n_docs = cur.rowcount
+
+    connection.commit()
+
+    return n_docs
+
+
+def update_catalog(
+    connection: Connection,
+    collection_name: str,
+    entries: list,
+    increment: bool = False,
+):
+    """
+    add or update documents in the catalog, no commit
+
+    entries: list of (doc_name, doc_hash, chunk_count, embed_model),
+        doc_hash None for a document pending
+    increment: chunk_count is added to the one recorded (e.g. a document
+        loaded in more windows), otherwise it replaces it
+    """
+    if len(entries) == 0:
+        return
+
+    new_count = "c.chunk_count + s.chunk_count" if increment else "s.chunk_count"
+
+    sql = f"""
+          MERGE INTO {get_catalog_name(collection_name)} c
+          USING (SELECT :1 AS doc_name, :2 AS doc_hash, :3 AS chunk_count,
+                        :4 AS embed_model FROM dual) s
+          ON (c.doc_name = s.doc_name)
+          WHEN MATCHED THEN UPDATE SET
+              c.doc_hash = s.doc_hash, c.chunk_count = {new_count},
+              c.embed_model = s.embed_model, c.loaded_at = SYSTIMESTAMP
+          WHEN NOT MATCHED THEN INSERT
+              (doc_name, doc_hash, chunk_count, embed_model)
+              VALUES (s.doc_name, s.doc_hash, s.chunk_count, s.embed_model)
+          """
+
+    with connection.cursor() as cur:
+        cur.executemany(sql, entries)
+
+
+def delete_from_catalog(connection: Connection, collection_name: str, doc_names):
+    """
+    remove documents from the catalog (if the collection has one), no commit
+    """
+    if len(doc_names) == 0:
+        return
+
+    with connection.cursor() as cur:
+        try:
+            cur.executemany(
+                f"DELETE FROM {get_catalog_name(collection_name)} WHERE doc_name = :1",
+                [(doc_name,) for doc_name in doc_names],
+            )
+        except oracledb.DatabaseError as e:
+            if e.args[0].code != ORA_TABLE_NOT_EXISTS:
+                raise
+
+
+def get_catalog(connection: Connection, collection_name: str) -> list:
+    """
+    return the documents in the catalog, ordered by name, as a list of
+    dict (doc_name, doc_hash, chunk_count, loaded_at, embed_model)
+
+    raise oracledb.DatabaseError (ORA-00942) if there is no catalog
+    """
+    sql = f"""
+          SELECT doc_name, doc_hash, chunk_count, loaded_at, embed_model
+          FROM {get_catalog_name(collection_name)}
+          ORDER BY doc_name
+          """
+
+    with connection.cursor() as cur:
+        cur.execute(sql)
+
+        rows = cur.fetchall()
+
+    return [
+        {
+            "doc_name": doc_name,
+            "doc_hash": doc_hash,
+            "chunk_count": int(chunk_count),
+            "loaded_at": loaded_at,
+            "embed_model": embed_model,
+        }
+        for doc_name, doc_hash, chunk_count, loaded_at, embed_model in rows
+    ]
+
+
+def get_document_hash(connection: Connection, collection_name: str, doc_name: str):
+    """
+    return (found, doc_hash) for a document: a lookup on the catalog,
+    if the collection has one, otherwise on the collection
+    (doc_hash None: document pending, not completely loaded)
+    """
+    with connection.cursor() as cur:
+        try:
+            cur.execute(
+                f"""
+                SELECT doc_hash
+                FROM {get_catalog_name(collection_name)}
+                WHERE doc_name = :doc
+                """,
+                doc=doc_name,
+            )
+        except oracledb.DatabaseError as e:
+            if e.args[0].code != ORA_TABLE_NOT_EXISTS:
+                raise
+
+            cur.execute(
+                f"""
+                SELECT NVL(json_value(METADATA, '$.doc_hash'), :unknown)
+                FROM {collection_name}
+                WHERE json_value(METADATA, '$.source') = :doc
+                FETCH FIRST 1 ROWS ONLY
+                """,
+                doc=doc_name,
+                unknown=UNKNOWN_HASH,
+            )
+
+        row = cur.fetchone()
+
+    if row is None:
+        return False, None
+
+    return True, row[0]
@@ -16,13 +16,57 @@ ENDPOINT = f"https://inference.generativeai.{REGION}.oci.oraclecloud.com"
 # changed for embed v4
 CHUNK_SIZE = 2000
 CHUNK_OVERLAP = 100
+# fast: single-pass splitter on offsets (fast_text_splitter), same chunks
+# langchain: RecursiveCharacterTextSplitter
+TEXT_SPLITTER = "fast"
+
+# number of processes used to parse and split files
+# in the batch loaders (1 = no process pool)
+LOAD_WORKERS = 1
+
+# streaming mode for batch loading: chunks are embedded and inserted
+# in windows of this size, with at most STREAMING_MAX_PENDING windows
+# waiting between the parsing and the embed/insert stages
+STREAMING_WINDOW_SIZE = 128
+STREAMING_MAX_PENDING = 2
+
+# checkpoint mode (--manifest): the manifest is written every
+# CHECKPOINT_SAVE_EVERY batches and at the end of each file
+# (on resume, the batches not recorded are deleted and loaded again)
+CHECKPOINT_SAVE_EVERY = 10
 
 # we're taking K docs on each side to create a summary
 # to be put in the chunk header
 MODEL_4_SUMMARY = "meta.llama-3.3-70b-instruct"
 # can be disabled, it can takes time
 ENABLE_SUMMARY = False
+# llm: summary generated by MODEL_4_SUMMARY
+# extractive: local, top sentences (TextRank), no network calls
+SUMMARY_METHOD = "llm"
+EXTRACTIVE_SUMMARY_SENTENCES = 3
 SUMMARY_WINDOW = 2
+# window: one LLM call per chunk, over 2 * SUMMARY_WINDOW + 1 chunks
+# block: one LLM call per block of SUMMARY_BLOCK_SIZE chunks
+# (far fewer calls and input tokens, windows overlap almost entirely)
+SUMMARY_MODE = "window"
+SUMMARY_BLOCK_SIZE = 10
+# block mode: add also a summary of the whole doc (one more call)
+SUMMARY_DOC_LEVEL = False
+# streaming loaders: chunks summarized together, besides the look-ahead
+# of the window (a multiple of SUMMARY_BLOCK_SIZE in block mode).
+# Memory doesn't depend on the length of the doc, except with
+# SUMMARY_DOC_LEVEL (the whole doc is buffered)
+SUMMARY_STREAM_BATCH = 40
+# summary requests in parallel and rate limit (token bucket)
+# for OCI on-demand: the limit is per tenancy, with --workers N
+# each process has its own limiter (divide the rate by N)
+SUMMARY_MAX_CONCURRENCY = 4
+SUMMARY_REQUESTS_PER_MINUTE = 60
+SUMMARY_BURST = 5
+# retries (exp. backoff) when throttled
+SUMMARY_MAX_RETRIES = 6
+# summaries cached by hash of the text ("" to disable)
+SUMMARY_CACHE_PATH = "summary_cache.sqlite"
 
 VERBOSE = False
 
@@ -39,13 +83,105 @@ OCI_EMBED_MODEL = "cohere.embed-multilingual-v3.0"
 # EMBED_MODEL_TYPE = "NVIDIA"
 NVIDIA_EMBED_MODEL_URL = "http://130.61.225.137:8000/v1/embeddings"
 NVIDIA_EMBED_MODEL = "nvidia/llama-3.2-nv-embedqa-1b-v2"
+# max num. of embedding requests in flight to the NIM server
+NVIDIA_EMBED_MAX_CONCURRENCY = 4
 
 # OCI_EMBED_MODEL = "cohere.embed-v4.0"
+
+# dimensions of the vectors (None: native size of the model)
+# NVIDIA: native (Matryoshka) dims, one of 384, 512, 768, 1024, 2048
+# OCI: PCA projection, fitted on the first EMBED_PCA_FIT_SAMPLES chunks
+# of a new collection and stored with it
+# model and dimensions are recorded for each collection (DOC_LOADER_COLLECTIONS)
+EMBED_DIMENSIONS = None
+EMBED_PCA_FIT_SAMPLES = 2000
+
+# limits of the embedding models, for each request:
+# max_texts: num. of texts
+# max_text_tokens: tokens of a single text (longer are truncated/rejected)
+# max_request_tokens: total tokens
+# texts are packed in requests by estimated tokens, up to these limits
+EMBED_MODEL_LIMITS = {
+    "cohere.embed-multilingual-v3.0": {
+        "max_texts": 96,
+        "max_text_tokens": 512,
+        "max_request_tokens": 96 * 512,
+    },
+    "cohere.embed-v4.0": {
+        "max_texts": 96,
+        "max_text_tokens": 128000,
+        "max_request_tokens": 128000,
+    },
+    "nvidia/llama-3.2-nv-embedqa-1b-v2": {
+        "max_texts": 64,
+        "max_text_tokens": 8192,
+        "max_request_tokens": 64 * 1024,
+    },
+}
+# for models not in the list
+DEFAULT_EMBED_MODEL_LIMITS = {
+    "max_texts": 10,
+    "max_text_tokens": 512,
+    "max_request_tokens": 10 * 512,
+}
+# to estimate the num. of tokens from the length
+CHARS_PER_TOKEN = 4
+
+# resilience of the embedding calls (NIM and OCI)
+# retries with exp. backoff (sec.) on 429, 5xx, connection errors
+EMBED_MAX_TRIES = 8
+EMBED_RETRY_BASE_DELAY = 1.0
+EMBED_RETRY_MAX_DELAY = 60.0
+# circuit breaker: open after N calls failed, retry after (sec.)
+EMBED_BREAKER_FAILURES = 5
+EMBED_BREAKER_RECOVERY = 60
+# when throttled the concurrency is halved, then increased by 1
+# every N successful requests
+EMBED_CONCURRENCY_INCREASE_EVERY = 20
+
+# persistent cache for embeddings (SQLite file)
+# identical texts are not embedded again on re-loads
+EMBED_CACHE_ENABLED = True
+EMBED_CACHE_PATH = "embed_cache.sqlite"
+# max size of the vectors stored, LRU eviction over this size
+EMBED_CACHE_MAX_MB = 2048
+
 # Oracle VS
+# format of the vectors in new collections:
+# 64 (FLOAT64), 32 (FLOAT32), 8 (INT8), 1 (BINARY)
+# INT8 is 4x smaller than FLOAT32, BINARY 32x (searches need HAMMING distance)
 EMBEDDINGS_BITS = 32
 
 # Vector Store
 VECTOR_STORE_TYPE = "23AI"
 
+# insert with array binding (executemany) instead of LangChain add_documents
+USE_BULK_INSERT = True
+# num. of chunks embedded and inserted in a single round trip
+BULK_INSERT_BATCH_SIZE = 256
+# commit every N batches
+BULK_COMMIT_EVERY = 10
+# num. of documents deleted with a single statement
+DELETE_BATCH_SIZE = 1000
+
+# vector index, built after the batch loading (HNSW, IVF or None)
+# inserts are much slower with the index in place
+VECTOR_INDEX_TYPE = "HNSW"
+VECTOR_INDEX_TARGET_ACCURACY = 95
+# HNSW (in memory, needs VECTOR_MEMORY_SIZE in the DB)
+HNSW_NEIGHBORS = 32
+HNSW_EF_CONSTRUCTION = 200
+# IVF: None to let the DB choose the num. of partitions
+IVF_PARTITIONS = None
+# parallel degree of the index build (None: default)
+VECTOR_INDEX_PARALLEL = None
+
 # to enable ADB connection
 ADB = True
+
+# connections are taken from a session pool, reused in the process
+# (avoids a new TLS handshake + authentication for every call)
+DB_POOL_ENABLED = True
+DB_POOL_MIN = 1
+DB_POOL_MAX = 8
+DB_POOL_INCREMENT = 1
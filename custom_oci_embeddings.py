@@ -0,0 +1,51 @@
+"""
+OCI GenAI Embeddings with adaptive batching
+
+License: MIT
+"""
+
+from typing import Any, List
+from pydantic import PrivateAttr
+from langchain_community.embeddings import OCIGenAIEmbeddings
+
+from embedding_batcher import make_model_batches
+from embedding_resilience import ResilientCaller
+
+
+class CustomOCIGenAIEmbeddings(OCIGenAIEmbeddings):
+    """
+    OCIGenAIEmbeddings sending requests packed by estimated tokens,
+    up to the limits configured for the model (see embedding_batcher)
+
+    batch_size is the max num. of texts in a request
+
+    requests are retried when throttled (or on errors) and protected by
+    a circuit breaker (see embedding_resilience)
+    """
+
+    _resilience: Any = PrivateAttr(default=None)
+
+    def _get_resilience(self) -> ResilientCaller:
+        """
+        created at the first call (pydantic model)
+        """
+        if self._resilience is None:
+            self._resilience = ResilientCaller(f"OCI {self.model_id}")
+
+        return self._resilience
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed a list of documents, one request for each batch
+        """
+        embeddings: List[List[float]] = []
+
+        # each batch has at most batch_size texts: one request
+        for start, end in make_model_batches(
+            texts, self.model_id, max_texts=self.batch_size
+        ):
+            embeddings.extend(
+                self._get_resilience().call(super().embed_documents, texts[start:end])
+            )
+
+        return embeddings
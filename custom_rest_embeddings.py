@@ -4,9 +4,14 @@ Custom class to support Embeddings model deployed using NVIDIA E.
 License: MIT
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from langchain_core.embeddings import Embeddings
 import requests
+from requests.adapters import HTTPAdapter
+
+from embedding_batcher import make_model_batches, get_model_limits
+from embedding_resilience import ResilientCaller
 
 ALLOWED_DIMS = {384, 512, 768, 1024, 2048}
 
@@ -19,7 +24,15 @@ class CustomRESTEmbeddings(Embeddings):
         https://docs.api.nvidia.com/nim/reference/nvidia-llama-3_2-nv-embedqa-1b-v2-infer
     """
 
-    def __init__(self, api_url: str, model: str, batch_size: int = 10, dimensions=2048):
+    def __init__(
+        self,
+        api_url: str,
+        model: str,
+        batch_size: int = None,
+        dimensions=2048,
+        max_concurrency: int = 1,
+        timeout: int = 30,
+    ):
         """
         Init
 
@@ -27,13 +40,31 @@ class CustomRESTEmbeddings(Embeddings):
         args:
             api_url: the endpoint
             model: the model id string
-            batch_size
+            batch_size: max num. of texts in a request
+                (None: the limit configured for the model)
             dimensions: dim of the embedding vector
+            max_concurrency: max num. of requests in flight
+            timeout: timeout (sec.) of a single request
         """
         self.api_url = api_url
         self.model = model
+        if batch_size is None:
+            batch_size = get_model_limits(model)["max_texts"]
         self.batch_size = batch_size
         self.dimensions = dimensions
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+
+        # keep-alive session, the pool is sized for the requests in flight
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # retries, circuit breaker, concurrency reduced when throttled
+        self.resilience = ResilientCaller(
+            f"NIM {model}", max_concurrency=self.max_concurrency
+        )
 
         # Validation at init time (optional)
         if self.dimensions is not None and self.dimensions not in ALLOWED_DIMS:
@@ -41,6 +72,42 @@ class CustomRESTEmbeddings(Embeddings):
                 f"Invalid dimensions {self.dimensions!r}: must be one of {sorted(ALLOWED_DIMS)}"
             )
 
+    def _embed_batch(
+        self, batch: List[str], input_type: str, truncate: str
+    ) -> List[List[float]]:
+        """
+        Embed a single batch, retried if throttled or on errors
+        """
+        return self.resilience.call(self._post_batch, batch, input_type, truncate)
+
+    def _post_batch(
+        self, batch: List[str], input_type: str, truncate: str
+    ) -> List[List[float]]:
+        """
+        Embed a single batch (one request)
+        """
+        resp = self.session.post(
+            self.api_url,
+            json={
+                "model": self.model,
+                "input": batch,
+                "input_type": input_type,
+                "truncate": truncate,
+                "dimensions": self.dimensions,
+            },
+            timeout=self.timeout,
+        )
+        resp.raise_for_status()
+        data = resp.json().get("data", [])
+
+        if len(data) != len(batch):
+            raise ValueError(f"Expected {len(batch)} embeddings, got {len(data)}")
+
+        # the server returns the index of each input, don't rely on the order
+        data = sorted(data, key=lambda item: item.get("index", 0))
+
+        return [item["embedding"] for item in data]
+
     def embed_documents(
         self,
         texts: List[str],
@@ -50,29 +117,39 @@ class CustomRESTEmbeddings(Embeddings):
     ) -> List[List[float]]:
         """
         Embed a list of documents using batching.
-        """
-        all_embeddings: List[List[float]] = []
 
-        for i in range(0, len(texts), self.batch_size):
-            batch = texts[i : i + self.batch_size]
-            # process a single batch
-            resp = requests.post(
-                self.api_url,
-                json={
-                    "model": self.model,
-                    "input": batch,
-                    "input_type": input_type,
-                    "truncate": truncate,
-                    "dimensions": self.dimensions,
-                },
-                timeout=30,
+        texts are packed in requests by estimated tokens, up to the
+        limits configured for the model (see embedding_batcher).
+        With max_concurrency > 1 up to max_concurrency batches are sent
+        in parallel; the output is always in the same order of texts
+        """
+        batches = [
+            texts[start:end]
+            for start, end in make_model_batches(
+                texts, self.model, max_texts=self.batch_size
             )
-            resp.raise_for_status()
-            data = resp.json().get("data", [])
+        ]
+
+        if self.max_concurrency == 1 or len(batches) <= 1:
+            results = [
+                self._embed_batch(batch, input_type, truncate) for batch in batches
+            ]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_concurrency, len(batches))
+            ) as executor:
+                # map returns the results in the order of batches
+                results = list(
+                    executor.map(
+                        lambda batch: self._embed_batch(batch, input_type, truncate),
+                        batches,
+                    )
+                )
+
+        all_embeddings: List[List[float]] = []
 
-            if len(data) != len(batch):
-                raise ValueError(f"Expected {len(batch)} embeddings, got {len(data)}")
-            all_embeddings.extend(item["embedding"] for item in data)
+        for batch_embeddings in results:
+            all_embeddings.extend(batch_embeddings)
         return all_embeddings
 
     def embed_query(self, text: str) -> List[float]:
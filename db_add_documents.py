@@ -1,5 +1,8 @@
 """
 Load additional docs in an existing collection
+
+with --sync documents already loaded are re-indexed if changed
+(only the chunks changed are embedded again)
 """
 
 import sys
@@ -12,66 +15,193 @@ from db_doc_loader_backend import (
     get_list_collections,
     get_books,
     manage_collection,
-    get_embed_model,
+    get_embed_model_for_collection,
+    sync_documents_in_collection,
+    build_vector_index,
 )
-from chunk_index_utils import load_and_split_pdf, load_and_split_docx
+from db_connection import log_db_pool_stats
+from embedding_cache import log_cache_stats
+from metrics import write_metrics
+from profiling import start_profiling, stop_profiling, PROFILE_MODES
+from chunk_index_utils import load_and_split_files, log_timings
 from utils import get_console_logger
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from config import CHUNK_SIZE, CHUNK_OVERLAP, LOAD_WORKERS
 
-# handle input for collection_name from command line
 logger = get_console_logger()
 
-parser = argparse.ArgumentParser(description="Document batch loading.")
 
-parser.add_argument(
-    "collection_name", type=str, help="collection name to add documents to."
-)
-parser.add_argument("books_dir", type=str, help="Dir with the books to load.")
+def parse_args():
+    """
+    handle input for collection_name from command line
+    """
+    parser = argparse.ArgumentParser(description="Document batch loading.")
+
+    parser.add_argument(
+        "collection_name", type=str, help="collection name to add documents to."
+    )
+    parser.add_argument("books_dir", type=str, help="Dir with the books to load.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=LOAD_WORKERS,
+        help="Num. of processes used to parse and split the books.",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Re-index the documents changed, replacing only the chunks changed.",
+    )
+    parser.add_argument(
+        "--index",
+        type=str.upper,
+        choices=["HNSW", "IVF", "NONE"],
+        default="NONE",
+        help="Build a vector index after the loading, if the collection has none.",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=str,
+        default=None,
+        help="Write the run report (stages, counters, files) in this JSON file.",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        type=str,
+        default=None,
+        help="Write the metrics in the Prometheus text format in this file.",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Profile the loading, per stage, and write the output in this dir.",
+    )
+    parser.add_argument(
+        "--profile-mode",
+        type=str,
+        choices=PROFILE_MODES,
+        default="sample",
+        help="sample: stacks sampled (low overhead), cprofile: pstats per stage.",
+    )
+
+    return parser.parse_args()
+
+
+def sync_books(args):
+    """
+    all the documents in the dir, changes detected using hashes
+    """
+    collection_name = args.collection_name
+    books_dir = args.books_dir
+
+    sync_books_list = (
+        glob(books_dir + "/*.pdf")
+        + glob(books_dir + "/*.docx")
+        + glob(books_dir + "/*.md")
+    )
+
+    embed_model = get_embed_model_for_collection(collection_name)
+
+    sync_documents_in_collection(
+        sync_books_list,
+        embed_model,
+        collection_name,
+        CHUNK_SIZE,
+        CHUNK_OVERLAP,
+        workers=args.workers,
+    )
+
+    log_cache_stats(embed_model)
+
+    if args.index != "NONE":
+        build_vector_index(collection_name, args.index)
+
+
+def add_books(args):
+    """
+    load the documents of the dir not yet in the collection
+    """
+    collection_name = args.collection_name
+    books_dir = args.books_dir
+
+    # check for existing documents in collection
+    books_list = get_books(collection_name)
+
+    # added docx (21/03)
+    new_books_list = (
+        glob(books_dir + "/*.pdf")
+        + glob(books_dir + "/*.docx")
+        + glob(books_dir + "/*.md")
+    )
 
-args = parser.parse_args()
-collection_name = args.collection_name
-BOOKS_DIR = args.books_dir
+    logger.info("")
 
-# check if collection exist
-collection_list = get_list_collections()
+    books_to_load = []
 
-if collection_name not in collection_list:
-    logger.info("")
-    logger.error("Collection %s doesn't exist, exiting!", collection_name)
-    logger.info("")
+    for book_pathname in new_books_list:
+        # check if already loaded
+
+        # strips path
+        if os.path.basename(book_pathname) not in books_list:
+            logger.info("Loading %s", book_pathname)
+
+            books_to_load.append(book_pathname)
+        else:
+            logger.info("Document %s already loaded, skipping...", book_pathname)
+
+    docs, timings = load_and_split_files(
+        books_to_load, CHUNK_SIZE, CHUNK_OVERLAP, workers=args.workers
+    )
+
+    log_timings(timings)
+
+    # embed and save to  DB
+    if len(docs) > 0:
+        embed_model = get_embed_model_for_collection(collection_name)
+
+        manage_collection(docs, embed_model, collection_name, is_new_collection=False)
+
+        log_cache_stats(embed_model)
+
+        if args.index != "NONE":
+            build_vector_index(collection_name, args.index)
 
-    sys.exit(-1)
 
-# check for existing documents in collection
-books_list = get_books(collection_name)
+def main():
+    """
+    load (or sync) the books in an existing collection
+    """
+    args = parse_args()
 
-# added docx (21/03)
-new_books_list = glob(BOOKS_DIR + "/*.pdf") + glob(BOOKS_DIR + "/*.docx")
+    profiler = start_profiling(args.profile, args.profile_mode)
 
-logger.info("")
+    # the profile and the metrics are written also if the load fails
+    try:
+        collection_name = args.collection_name
 
-docs = []
+        # check if collection exist
+        collection_list = get_list_collections()
 
-for book_pathname in new_books_list:
-    # check if already loaded
+        if collection_name not in collection_list:
+            logger.info("")
+            logger.error("Collection %s doesn't exist, exiting!", collection_name)
+            logger.info("")
 
-    # strips path
-    if os.path.basename(book_pathname) not in books_list:
-        logger.info("Loading %s", book_pathname)
+            sys.exit(-1)
 
-        # get the file extension
-        _, file_ext = os.path.splitext(book_pathname)
+        if args.sync:
+            sync_books(args)
+        else:
+            add_books(args)
 
-        if file_ext == ".pdf":
-            docs += load_and_split_pdf(book_pathname, CHUNK_SIZE, CHUNK_OVERLAP)
-        if file_ext == ".docx":
-            docs += load_and_split_docx(book_pathname, CHUNK_SIZE, CHUNK_OVERLAP)
+        log_db_pool_stats()
 
-    else:
-        logger.info("Document %s already loaded, skipping...", book_pathname)
+    finally:
+        stop_profiling(profiler)
+        write_metrics(args.metrics_json, args.metrics_prom)
 
-# embed and save to  DB
-if len(docs) > 0:
-    embed_model = get_embed_model()
 
-    manage_collection(docs, embed_model, collection_name, is_new_collection=False)
+# the guard is needed by the worker processes (--workers): they import
+# this module, it must not run the loading again
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,8 @@ Analyze a collection
 
 import argparse
 
-from db_doc_loader_backend import get_db_connection
-from oraclevs_4_db_loading import OracleVS4DBLoading
+from db_connection import get_db_connection
+import collection_admin
 
 from utils import get_console_logger
 
@@ -15,12 +15,20 @@ logger = get_console_logger()
 parser = argparse.ArgumentParser(description="Analyzew a collection.")
 
 parser.add_argument("collection_name", type=str, help="collection name.")
+parser.add_argument(
+    "--sample",
+    type=float,
+    default=None,
+    help="Percentage (0-100) of blocks to sample, to get an estimate fast.",
+)
 
 args = parser.parse_args()
 collection_name = args.collection_name
 
 with get_db_connection() as conn:
-    report = OracleVS4DBLoading.analyze_collection(conn, collection_name)
+    report = collection_admin.analyze_collection(
+        conn, collection_name, sample_percent=args.sample
+    )
 
 logger.info("")
 print("")
@@ -2,113 +2,277 @@
 Batch loading
 
 Create a new collection and load a set of pdf
-Can be used ONLY for a new collection.
+Can be used ONLY for a new collection
+(or to resume an interrupted load, with --manifest)
 
 sept 2024: refactored to reduce dependencies
 """
 
-import os
 import sys
 import argparse
 from glob import glob
 
-from chunk_index_utils import load_and_split_pdf, load_and_split_docx, load_and_split_md
+from chunk_index_utils import load_and_split_files, iter_chunks, log_timings
 from db_doc_loader_backend import (
     get_list_collections,
     get_embed_model,
     manage_collection,
+    manage_collection_streaming,
+    manage_collection_with_checkpoint,
+    build_vector_index,
 )
+from ingestion_manifest import IngestionManifest
 
-from utils import get_console_logger, compute_stats
-from config import CHUNK_SIZE, CHUNK_OVERLAP, EMBED_MODEL_TYPE
+from db_connection import log_db_pool_stats
+from embedding_cache import log_cache_stats
+from metrics import write_metrics
+from profiling import start_profiling, stop_profiling, PROFILE_MODES
+from utils import get_console_logger, compute_length_stats
+from config import CHUNK_SIZE, CHUNK_OVERLAP, EMBED_MODEL_TYPE, LOAD_WORKERS
+from config import EMBED_DIMENSIONS, VECTOR_INDEX_TYPE
 
+logger = get_console_logger()
 
-#
-# Main
-#
 
-# handle input for new_collection_name from command line
-parser = argparse.ArgumentParser(description="Document batch loading.")
+def parse_args():
+    """
+    handle input for new_collection_name from command line
+    """
+    parser = argparse.ArgumentParser(description="Document batch loading.")
 
-parser.add_argument("new_collection_name", type=str, help="New collection name.")
-parser.add_argument("books_dir", type=str, help="Dir with the books to load.")
+    parser.add_argument("new_collection_name", type=str, help="New collection name.")
+    parser.add_argument("books_dir", type=str, help="Dir with the books to load.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=LOAD_WORKERS,
+        help="Num. of processes used to parse and split the books.",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Embed and load the chunks in windows while the books are parsed.",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Checkpoint manifest (JSON): records the progress, re-run to resume.",
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        default=EMBED_DIMENSIONS,
+        help="Dimensions of the vectors (default: native size of the model).",
+    )
+    parser.add_argument(
+        "--index",
+        type=str.upper,
+        choices=["HNSW", "IVF", "NONE"],
+        default=VECTOR_INDEX_TYPE or "NONE",
+        help="Vector index built after the loading.",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=str,
+        default=None,
+        help="Write the run report (stages, counters, files) in this JSON file.",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        type=str,
+        default=None,
+        help="Write the metrics in the Prometheus text format in this file.",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="Profile the loading, per stage, and write the output in this dir.",
+    )
+    parser.add_argument(
+        "--profile-mode",
+        type=str,
+        choices=PROFILE_MODES,
+        default="sample",
+        help="sample: stacks sampled (low overhead), cprofile: pstats per stage.",
+    )
 
-args = parser.parse_args()
+    return parser.parse_args()
 
-new_collection_name = args.new_collection_name
-BOOKS_DIR = args.books_dir
 
-logger = get_console_logger()
+def load_books(args, books_list, embed_model, manifest):
+    """
+    load the books in the new collection, in the mode selected by args
+
+    returns the list of the lengths of the chunks loaded
+    """
+    new_collection_name = args.new_collection_name
+
+    if manifest is not None:
+        # progress is recorded in the manifest, after every batch
+        logger.info(
+            "Loading documents in collection %s with checkpoints in %s ...",
+            new_collection_name,
+            args.manifest,
+        )
+        timings = []
+
+        lengths = manage_collection_with_checkpoint(
+            books_list,
+            embed_model,
+            new_collection_name,
+            manifest,
+            CHUNK_SIZE,
+            CHUNK_OVERLAP,
+            workers=args.workers,
+            timings=timings,
+        )
+
+        log_timings(timings)
+    elif args.streaming:
+        # chunks are embedded and loaded while the books are parsed
+        logger.info("Streaming documents in collection %s ...", new_collection_name)
+        timings = []
+
+        lengths = manage_collection_streaming(
+            iter_chunks(
+                books_list,
+                CHUNK_SIZE,
+                CHUNK_OVERLAP,
+                workers=args.workers,
+                timings=timings,
+            ),
+            embed_model,
+            new_collection_name,
+            is_new_collection=True,
+        )
 
-logger.info("")
-logger.info("Batch loading books in collection %s ...", new_collection_name)
-logger.info("")
+        log_timings(timings)
+    else:
+        docs, timings = load_and_split_files(
+            books_list, CHUNK_SIZE, CHUNK_OVERLAP, workers=args.workers
+        )
 
-# init models
-embed_model = get_embed_model(EMBED_MODEL_TYPE)
+        log_timings(timings)
 
-# check that the collection doesn't exist yet
-collection_list = get_list_collections()
+        if len(docs) > 0:
+            logger.info("")
+            logger.info(
+                "Embedding and loading documents in collection %s ...",
+                new_collection_name,
+            )
+            manage_collection(
+                docs, embed_model, new_collection_name, is_new_collection=True
+            )
+
+        lengths = [len(doc.page_content) for doc in docs]
+
+    return lengths
+
+
+def log_length_stats(lengths):
+    """
+    print the statistics on the chunks' lengths
+    """
+    mean, stdev, perc_75 = compute_length_stats(lengths)
 
-if new_collection_name in collection_list:
     logger.info("")
-    logger.error("Error: collection %s already exist!", new_collection_name)
-    logger.error("Exiting !")
+    logger.info("Statistics on the distribution of chunks' lengths:")
+    logger.info("Total num. of chunks loaded: %s", len(lengths))
+    logger.info("Avg. length: %s (chars)", mean)
+    logger.info("Std dev: %s (chars)", stdev)
+    logger.info("75-perc: %s (chars)", perc_75)
     logger.info("")
 
-    sys.exit(-1)
 
-logger.info("")
+def main():
+    """
+    load the books in a new collection
+    """
+    args = parse_args()
 
-# the list of books to be loaded
-books_list = glob(BOOKS_DIR + "/*.pdf") + glob(BOOKS_DIR + "/*.docx") + glob(BOOKS_DIR + "/*.md")
+    profiler = start_profiling(args.profile, args.profile_mode)
 
-logger.info("These books will be loaded:")
-for book in books_list:
-    logger.info(book)
+    # the profile and the metrics are written also if the load fails
+    try:
+        new_collection_name = args.new_collection_name
+        books_dir = args.books_dir
 
-logger.info("")
+        logger.info("")
+        logger.info("Batch loading books in collection %s ...", new_collection_name)
+        logger.info("")
 
-logger.info("Parameters used for chunking:")
-logger.info("Chunk size: %s chars", CHUNK_SIZE)
-logger.info("Chunk overlap: %s chars", CHUNK_OVERLAP)
-logger.info("")
+        # init models
+        embed_model = get_embed_model(EMBED_MODEL_TYPE, dimensions=args.dimensions)
 
-docs = []
+        manifest = None
+        if args.manifest is not None:
+            manifest = IngestionManifest(args.manifest, new_collection_name)
 
-for book in books_list:
-    logger.info("Chunking: %s", book)
-    # get the file extension
-    _, file_ext = os.path.splitext(book)
+        # check that the collection doesn't exist yet
+        collection_list = get_list_collections()
 
-    if file_ext == ".pdf":
-        docs += load_and_split_pdf(book, CHUNK_SIZE, CHUNK_OVERLAP)
-    if file_ext == ".docx":
-        docs += load_and_split_docx(book, CHUNK_SIZE, CHUNK_OVERLAP)
-    if file_ext == ".md":
-        docs += load_and_split_md(book, CHUNK_SIZE, CHUNK_OVERLAP)
+        # an existing collection is ok only if we're resuming a previous run
+        is_resuming = manifest is not None and manifest.exists()
 
+        if new_collection_name in collection_list and not is_resuming:
+            logger.info("")
+            logger.error("Error: collection %s already exist!", new_collection_name)
+            logger.error("Exiting !")
+            logger.info("")
 
-if len(docs) > 0:
-    logger.info("")
-    logger.info(
-        "Embedding and loading documents in collection %s ...", new_collection_name
-    )
-    manage_collection(docs, embed_model, new_collection_name, is_new_collection=True)
+            sys.exit(-1)
 
-    logger.info("Loading completed.")
-    logger.info("")
+        logger.info("")
 
-    mean, stdev, perc_75 = compute_stats(docs)
+        # the list of books to be loaded
+        books_list = (
+            glob(books_dir + "/*.pdf")
+            + glob(books_dir + "/*.docx")
+            + glob(books_dir + "/*.md")
+        )
 
-    logger.info("")
-    logger.info("Statistics on the distribution of chunks' lengths:")
-    logger.info("Total num. of chunks loaded: %s", len(docs))
-    logger.info("Avg. length: %s (chars)", mean)
-    logger.info("Std dev: %s (chars)", stdev)
-    logger.info("75-perc: %s (chars)", perc_75)
-    logger.info("")
+        logger.info("These books will be loaded:")
+        for book in books_list:
+            logger.info(book)
 
-else:
-    logger.info("No document to load!")
-    logger.info("")
+        logger.info("")
+
+        logger.info("Parameters used for chunking:")
+        logger.info("Chunk size: %s chars", CHUNK_SIZE)
+        logger.info("Chunk overlap: %s chars", CHUNK_OVERLAP)
+        logger.info("Parsing workers: %s", args.workers)
+        logger.info("")
+
+        lengths = load_books(args, books_list, embed_model, manifest)
+
+        log_cache_stats(embed_model)
+        log_db_pool_stats()
+
+        if len(lengths) > 0:
+            logger.info("Loading completed.")
+            logger.info("")
+
+            log_length_stats(lengths)
+
+            # built once, after the bulk load
+            if args.index != "NONE":
+                build_vector_index(new_collection_name, args.index)
+
+        else:
+            logger.info("No document to load!")
+            logger.info("")
+
+    finally:
+        stop_profiling(profiler)
+        write_metrics(args.metrics_json, args.metrics_prom)
+
+
+#
+# Main
+#
+# the guard is needed by the worker processes (--workers): they import
+# this module, it must not run the loading again
+if __name__ == "__main__":
+    main()
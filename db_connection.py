@@ -0,0 +1,173 @@
+"""
+Connection to the DB: session pool or single connections
+
+only python-oracledb and the config are needed, so that the commands
+that just run SQL (db_list_collections, ...) start fast
+"""
+
+import threading
+import time
+import oracledb
+
+from utils import get_console_logger
+
+from config_private import DB_USER, DB_PWD, DSN, TNS_ADMIN, WALLET_PWD
+from config import ADB, DB_POOL_ENABLED, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_INCREMENT
+
+logger = get_console_logger()
+
+
+# session pool shared by all the calls in the process
+_db_pool = None
+_db_pool_lock = threading.Lock()
+# time spent waiting in acquire()
+_db_pool_waits = {"acquired": 0, "total_wait": 0.0, "max_wait": 0.0}
+
+
+def get_connection_params():
+    """
+    return the params to connect to the db
+    """
+    # common params
+    conn_parms = {"user": DB_USER, "password": DB_PWD, "dsn": DSN, "retry_count": 3}
+
+    if ADB:
+        # connection to ADB, needs wallet
+        conn_parms.update(
+            {
+                "config_dir": TNS_ADMIN,
+                "wallet_location": TNS_ADMIN,
+                "wallet_password": WALLET_PWD,
+            }
+        )
+
+    return conn_parms
+
+
+def get_db_pool():
+    """
+    return the session pool, created at the first call
+    """
+    global _db_pool
+
+    with _db_pool_lock:
+        if _db_pool is None:
+            logger.info("")
+            logger.info(
+                "Creating session pool as USER: %s to DSN: %s (min: %s, max: %s)",
+                DB_USER,
+                DSN,
+                DB_POOL_MIN,
+                DB_POOL_MAX,
+            )
+
+            try:
+                _db_pool = oracledb.create_pool(
+                    min=DB_POOL_MIN,
+                    max=DB_POOL_MAX,
+                    increment=DB_POOL_INCREMENT,
+                    getmode=oracledb.POOL_GETMODE_WAIT,
+                    **get_connection_params(),
+                )
+            except oracledb.Error as e:
+                logger.error("Session pool creation failed: %s", str(e))
+                raise
+
+    return _db_pool
+
+
+def close_db_pool():
+    """
+    close the session pool, if it has been created
+    """
+    global _db_pool
+
+    with _db_pool_lock:
+        if _db_pool is not None:
+            _db_pool.close()
+            _db_pool = None
+
+
+def get_db_connection():
+    """
+    get a connection to db
+
+    if DB_POOL_ENABLED the connection is taken from the session pool
+    and is released to the pool when closed (end of with block)
+    """
+    if DB_POOL_ENABLED:
+        pool = get_db_pool()
+
+        time_start = time.perf_counter()
+        try:
+            conn = pool.acquire()
+        except oracledb.Error as e:
+            logger.error("Database connection failed: %s", str(e))
+            raise
+        wait = time.perf_counter() - time_start
+
+        with _db_pool_lock:
+            _db_pool_waits["acquired"] += 1
+            _db_pool_waits["total_wait"] += wait
+            _db_pool_waits["max_wait"] = max(_db_pool_waits["max_wait"], wait)
+
+        return conn
+
+    logger.info("")
+    logger.info("Connecting as USER: %s to DSN: %s", DB_USER, DSN)
+
+    try:
+        return oracledb.connect(**get_connection_params())
+    except oracledb.Error as e:
+        logger.error("Database connection failed: %s", str(e))
+        raise
+
+
+def get_db_pool_stats():
+    """
+    return the statistics of the session pool (empty if not created)
+
+    opened: sessions open, busy: sessions in use,
+    wait times are the times spent in acquire (sec.)
+    """
+    with _db_pool_lock:
+        if _db_pool is None:
+            return {}
+
+        acquired = _db_pool_waits["acquired"]
+
+        return {
+            "min": _db_pool.min,
+            "max": _db_pool.max,
+            "opened": _db_pool.opened,
+            "busy": _db_pool.busy,
+            "acquired": acquired,
+            "avg_wait": _db_pool_waits["total_wait"] / acquired if acquired else 0.0,
+            "max_wait": _db_pool_waits["max_wait"],
+        }
+
+
+def log_db_pool_stats():
+    """
+    print the statistics of the session pool, if used
+    """
+    stats = get_db_pool_stats()
+
+    if not stats:
+        return
+
+    logger.info("")
+    logger.info(
+        "DB session pool: min %s, max %s, opened %s, busy %s",
+        stats["min"],
+        stats["max"],
+        stats["opened"],
+        stats["busy"],
+    )
+    logger.info(
+        "Acquired: %s, avg. wait: %.3f sec., max wait: %.3f sec.",
+        stats["acquired"],
+        stats["avg_wait"],
+        stats["max_wait"],
+    )
+    logger.info("")
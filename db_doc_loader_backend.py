@@ -5,60 +5,63 @@ to separate UI logic from backend logic
 """
 
 import os
+import queue
+from itertools import chain
+from collections import Counter, defaultdict
+from functools import partial
 import tempfile
-import oracledb
+import threading
 
+import oracledb
 from langchain_community.vectorstores.utils import DistanceStrategy
-from langchain_community.embeddings import OCIGenAIEmbeddings
-from oraclevs_4_db_loading import OracleVS4DBLoading
+from oraclevs_4_db_loading import OracleVS4DBLoading, DEFAULT_QUERY, get_chunk_ids
 from translations import translations
-from utils import get_console_logger, check_value_in_list
-from custom_rest_embeddings import CustomRESTEmbeddings
-from chunk_index_utils import load_and_split_pdf, load_and_split_docx, load_and_split_md
+from utils import get_console_logger, check_value_in_list, compute_file_hash
 
-from config_private import DB_USER, DB_PWD, DSN, TNS_ADMIN, WALLET_PWD, COMPARTMENT_ID
-from config import ENDPOINT, OCI_EMBED_MODEL, ADB, CHUNK_SIZE, CHUNK_OVERLAP
+from db_connection import get_db_connection
+from embedding_batcher import get_model_limits
+from embedding_cache import (
+    CachedEmbeddings,
+    InstrumentedEmbeddings,
+    log_cache_stats,
+    get_model_id,
+)
+from metrics import METRICS
+from profiling import profile_run
+from embedding_projection import ProjectedEmbeddings, PCAProjection
+
+from config_private import COMPARTMENT_ID
+from config import ENDPOINT, OCI_EMBED_MODEL, CHUNK_SIZE, CHUNK_OVERLAP
 from config import (
     EMBED_MODEL_TYPE,
     NVIDIA_EMBED_MODEL,
     NVIDIA_EMBED_MODEL_URL,
+    NVIDIA_EMBED_MAX_CONCURRENCY,
     AUTH_TYPE,
+    EMBED_CACHE_ENABLED,
+    EMBED_DIMENSIONS,
+    EMBED_PCA_FIT_SAMPLES,
+    USE_BULK_INSERT,
+    BULK_INSERT_BATCH_SIZE,
+    LOAD_WORKERS,
+    STREAMING_WINDOW_SIZE,
+    STREAMING_MAX_PENDING,
+    VECTOR_INDEX_TYPE,
 )
 
 logger = get_console_logger()
 
 
-def get_db_connection():
-    """
-    get a connection to db
-    """
-
-    # common params
-    conn_parms = {"user": DB_USER, "password": DB_PWD, "dsn": DSN, "retry_count": 3}
-
-    if ADB:
-        # connection to ADB, needs wallet
-        conn_parms.update(
-            {
-                "config_dir": TNS_ADMIN,
-                "wallet_location": TNS_ADMIN,
-                "wallet_password": WALLET_PWD,
-            }
-        )
-
-    logger.info("")
-    logger.info("Connecting as USER: %s to DSN: %s", DB_USER, DSN)
-
-    try:
-        return oracledb.connect(**conn_parms)
-    except oracledb.Error as e:
-        logger.error("Database connection failed: %s", str(e))
-        raise
-
-
-def get_embed_model(model_type="OCI"):
+def get_embed_model(
+    model_type="OCI", use_cache=EMBED_CACHE_ENABLED, dimensions=EMBED_DIMENSIONS
+):
     """
     get the Embeddings Model
+
+    with use_cache the model is wrapped by the persistent embeddings cache
+    dimensions: None for the native size of the model. For OCI the vectors
+    are reduced with a PCA projection (ProjectedEmbeddings), to be fitted or
+    loaded (see prepare_embed_model_for_collection)
     """
     check_value_in_list(model_type, ["OCI", "NVIDIA"])
 
@@ -67,26 +70,267 @@ def get_embed_model(model_type="OCI"):
     if model_type == "OCI":
         EMBED_MODEL_ID = OCI_EMBED_MODEL
 
-        embed_model = OCIGenAIEmbeddings(
+        # imported here: the OCI SDK is slow to import
+        # pylint: disable=import-outside-toplevel
+        from custom_oci_embeddings import CustomOCIGenAIEmbeddings
+
+        embed_model = CustomOCIGenAIEmbeddings(
             auth_type=AUTH_TYPE,
             model_id=OCI_EMBED_MODEL,
             service_endpoint=ENDPOINT,
             compartment_id=COMPARTMENT_ID,
+            batch_size=get_model_limits(OCI_EMBED_MODEL)["max_texts"],
         )
     elif model_type == "NVIDIA":
         EMBED_MODEL_ID = NVIDIA_EMBED_MODEL
 
+        # pylint: disable=import-outside-toplevel
+        from custom_rest_embeddings import CustomRESTEmbeddings
+
+        # NIM supports smaller dimensions natively
+        extra_args = {"dimensions": dimensions} if dimensions is not None else {}
+
         embed_model = CustomRESTEmbeddings(
-            api_url=NVIDIA_EMBED_MODEL_URL, model=NVIDIA_EMBED_MODEL
+            api_url=NVIDIA_EMBED_MODEL_URL,
+            model=NVIDIA_EMBED_MODEL,
+            max_concurrency=NVIDIA_EMBED_MAX_CONCURRENCY,
+            **extra_args,
         )
 
     logger.info("")
     logger.info("Using embedding model: %s", EMBED_MODEL_ID)
+    if dimensions is not None:
+        logger.info("Dimensions: %s", dimensions)
     logger.info("")
 
+    # only the requests to the model are timed, not the cache hits
+    embed_model = InstrumentedEmbeddings(embed_model)
+
+    if use_cache:
+        embed_model = CachedEmbeddings(embed_model)
+
+    if model_type == "OCI" and dimensions is not None:
+        # outside of the cache, that keeps the full vectors
+        embed_model = ProjectedEmbeddings(embed_model, dimensions)
+
     return embed_model
 
 
+def prepare_embed_model_for_collection(
+    conn, collection_name, embed_model, sample_docs=None
+):
+    """
+    check that embed_model is the one recorded for the collection and
+    load its PCA projection, so that loads and queries can't mismatch.
+
+    For a new collection, model and dimensions are recorded (the PCA
+    projection, if needed, is fitted on the first EMBED_PCA_FIT_SAMPLES
+    of sample_docs)
+
+    raise ValueError if the model or the dimensions don't match
+    returns the dimensions of the vectors (None if not recorded)
+    """
+    model_id = get_model_id(embed_model)
+    is_projected = isinstance(embed_model, ProjectedEmbeddings)
+
+    is_new = (
+        OracleVS4DBLoading.get_collection_vector_format(conn, collection_name) is None
+    )
+    info = OracleVS4DBLoading.get_collection_info(conn, collection_name)
+
+    if not is_new and info is None:
+        logger.warning(
+            "Collection %s has no embedding model recorded, can't check it",
+            collection_name,
+        )
+        return None
+
+    if not is_new:
+        if info["embed_model"] != model_id:
+            raise ValueError(
+                f"Collection {collection_name} uses {info['embed_model']}, "
+                f"not {model_id}"
+            )
+        if is_projected:
+            if info["projection"] is None:
+                raise ValueError(
+                    f"Collection {collection_name} has no PCA projection, "
+                    "load it with EMBED_DIMENSIONS = None"
+                )
+            embed_model.set_projection(PCAProjection.from_bytes(info["projection"]))
+
+        dimensions = len(embed_model.embed_query(DEFAULT_QUERY))
+
+        if dimensions != info["dimensions"]:
+            raise ValueError(
+                f"Collection {collection_name} has {info['dimensions']} dims., "
+                f"the model returns {dimensions}"
+            )
+        return dimensions
+
+    # new collection
+    if is_projected and embed_model.projection is None:
+        if not sample_docs:
+            raise ValueError("Chunks needed to fit the PCA projection")
+
+        embed_model.fit(
+            [doc.page_content for doc in sample_docs[:EMBED_PCA_FIT_SAMPLES]]
+        )
+
+    dimensions = len(embed_model.embed_query(DEFAULT_QUERY))
+
+    OracleVS4DBLoading.register_collection(
+        conn,
+        collection_name,
+        model_id,
+        dimensions,
+        embed_model.projection.to_bytes() if is_projected else None,
+    )
+    logger.info(
+        "Collection %s registered: %s, %s dims.", collection_name, model_id, dimensions
+    )
+
+    return dimensions
+
+
+def get_embed_model_for_collection(
+    collection_name, model_type=EMBED_MODEL_TYPE, use_cache=EMBED_CACHE_ENABLED
+):
+    """
+    get the Embeddings Model with the dimensions (and PCA projection)
+    recorded for the collection, e.g. to embed the queries
+    """
+    with get_db_connection() as conn:
+        info = OracleVS4DBLoading.get_collection_info(conn, collection_name)
+
+        dimensions = None
+        if info is not None and (
+            model_type == "NVIDIA" or info["projection"] is not None
+        ):
+            dimensions = info["dimensions"]
+
+        embed_model = get_embed_model(model_type, use_cache, dimensions)
+
+        prepare_embed_model_for_collection(conn, collection_name, embed_model)
+
+    return embed_model
+
+
+def get_vector_store(conn, collection_name, embed_model, sample_docs=None):
+    """
+    return the OracleVS4DBLoading for the collection, created if needed
+
+    the embedding model is checked (or recorded) before
+    (see prepare_embed_model_for_collection)
+    """
+    dimensions = prepare_embed_model_for_collection(
+        conn, collection_name, embed_model, sample_docs
+    )
+
+    # the table is created here, if it doesn't exist
+    # (BINARY collections are searched with HAMMING, see OracleVS4DBLoading)
+    v_store = OracleVS4DBLoading(
+        client=conn,
+        table_name=collection_name,
+        distance_strategy=DistanceStrategy.COSINE,
+        embedding_function=embed_model,
+        embedding_dim=dimensions,
+    )
+
+    # filled from the chunks, for collections loaded without catalog
+    if OracleVS4DBLoading.create_catalog(conn, collection_name):
+        logger.info("Document catalog created for %s", collection_name)
+
+    return v_store
+
+
+def buffer_pca_sample(conn, collection_name, embed_model, items, get_docs):
+    """
+    read items (windows of chunks, files) until there are
+    EMBED_PCA_FIT_SAMPLES chunks to fit the PCA projection of a new
+    collection (only if embed_model needs one)
+
+    returns the chunks read and an iterator on all the items
+    """
+    items = iter(items)
+    buffered = []
+    sample_docs = []
+
+    needs_fit = (
+        isinstance(embed_model, ProjectedEmbeddings)
+        and embed_model.projection is None
+        and OracleVS4DBLoading.get_collection_vector_format(conn, collection_name)
+        is None
+    )
+
+    if needs_fit:
+        for item in items:
+            buffered.append(item)
+            sample_docs.extend(get_docs(item))
+
+            if len(sample_docs) >= EMBED_PCA_FIT_SAMPLES:
+                break
+
+    return sample_docs, chain(buffered, items)
+
+
+def update_document_catalog(
+    conn, collection_name, docs, embed_model, complete_docs=None, previous_counts=None
+):
+    """
+    record the documents of the chunks in docs in the catalog
+    of the collection (name, hash, num. of chunks), no commit:
+    to be called in the transaction of the chunks (see before_commit
+    of add_documents_to_store), so that a crash can't leave chunks
+    committed without their documents in the catalog
+
+    complete_docs: names of the documents loaded completely (default: all),
+        the others are recorded as pending, without hash: get_books and
+        the sync ignore them, a new load deletes their chunks
+    previous_counts: chunks of the documents committed before docs (Counter)
+    """
+    counts = Counter(doc.metadata.get("source") for doc in docs)
+    hashes = {doc.metadata.get("source"): doc.metadata.get("doc_hash") for doc in docs}
+    model_id = get_model_id(embed_model)
+
+    if previous_counts is None:
+        previous_counts = Counter()
+
+    entries = [
+        (
+            doc_name,
+            (
+                hashes[doc_name]
+                if complete_docs is None or doc_name in complete_docs
+                else None
+            ),
+            previous_counts[doc_name] + n_chunks,
+            model_id,
+        )
+        for doc_name, n_chunks in counts.items()
+        if doc_name is not None
+    ]
+
+    OracleVS4DBLoading.update_catalog(conn, collection_name, entries)
+
+
+def delete_pending_documents(conn, collection_name, doc_names):
+    """
+    delete the chunks of the documents pending in the catalog (their
+    load has been interrupted), before loading them again
+    """
+    pending = [
+        doc_name
+        for doc_name in doc_names
+        if OracleVS4DBLoading.get_document_hash(conn, collection_name, doc_name)
+        == (True, None)
+    ]
+
+    if len(pending) > 0:
+        logger.info("Documents not completely loaded, reloading: %s", pending)
+        OracleVS4DBLoading.delete_documents(conn, collection_name, pending)
+
+
 # to handle multilingual use the dictionary in translations.py
 def translate(text, v_lang):
     """
@@ -117,6 +361,20 @@ def get_books(collection_name):
     return list_books_in_collection
 
 
+def is_book_in_collection(collection_name, doc_name):
+    """
+    check if a book is in the collection (lookup on the document catalog)
+
+    a book pending (load interrupted) is not: it is loaded again
+    """
+    with get_db_connection() as conn:
+        found, doc_hash = OracleVS4DBLoading.get_document_hash(
+            conn, collection_name, doc_name
+        )
+
+    return found and doc_hash is not None
+
+
 def write_temporary_file(v_tmp_dir_name, v_uploaded_file):
     """
     Write the uploaded file as a temporary file
@@ -130,71 +388,182 @@ def write_temporary_file(v_tmp_dir_name, v_uploaded_file):
 
 
 def load_uploaded_file_in_vector_store(
-    v_uploaded_file, collection_name, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    v_uploaded_file,
+    collection_name,
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+    profile_dir=None,
+    profile_mode="sample",
 ):
     """
     load the uploaded file in the Vector Store and index
 
     this handles also the check to see if the file alredy exists
+    profile_dir: if given, the loading is profiled (see profiling.py)
     """
-    embed_model = get_embed_model(EMBED_MODEL_TYPE)
+    with profile_run(profile_dir, profile_mode):
+        is_existing_collection = collection_name in get_list_collections()
 
-    result_status = ""
+        if is_existing_collection:
+            # same dimensions (and projection) used for the collection
+            embed_model = get_embed_model_for_collection(collection_name)
+        else:
+            embed_model = get_embed_model(EMBED_MODEL_TYPE)
 
-    # write a temporary file with the content
-    with tempfile.TemporaryDirectory() as tmp_dir_name:
-        temp_file_path = write_temporary_file(tmp_dir_name, v_uploaded_file)
+        result_status = ""
 
-        # split in docs and prepare for loading
-        _, file_ext = os.path.splitext(temp_file_path)
+        # write a temporary file with the content
+        with tempfile.TemporaryDirectory() as tmp_dir_name:
+            temp_file_path = write_temporary_file(tmp_dir_name, v_uploaded_file)
 
-        docs = []
+            # split in docs and prepare for loading
+            # imported here: the loaders (PyPDF, unstructured) are slow to import
+            # pylint: disable=import-outside-toplevel
+            from chunk_index_utils import load_and_split_file
 
-        if file_ext == ".pdf":
-            docs += load_and_split_pdf(temp_file_path, chunk_size, chunk_overlap)
-        if file_ext == ".docx":
-            docs += load_and_split_docx(temp_file_path, chunk_size, chunk_overlap)
+            docs = load_and_split_file(temp_file_path, chunk_size, chunk_overlap)
 
-    # check if collection exists
-    if collection_name in get_list_collections():
-        # existing collection
+        # check if collection exists
+        if is_existing_collection:
+            # existing collection
 
-        # check that the book has not already been loaded
-        if v_uploaded_file.name not in get_books(collection_name):
-            # add books to existing
-            logger.info(
-                "Add book %s to an existing collection...", v_uploaded_file.name
-            )
-            manage_collection(
-                docs, embed_model, collection_name, is_new_collection=False
-            )
+            # check that the book has not already been loaded
+            if not is_book_in_collection(collection_name, v_uploaded_file.name):
+                # add books to existing
+                logger.info(
+                    "Add book %s to an existing collection...", v_uploaded_file.name
+                )
+                manage_collection(
+                    docs, embed_model, collection_name, is_new_collection=False
+                )
 
-            result_status = "OK"
+                result_status = "OK"
+            else:
+                logger.info("Book %s already in collection...", v_uploaded_file.name)
+
+                result_status = "KO"
         else:
-            logger.info("Book %s already in collection...", v_uploaded_file.name)
+            # new collection
+            # this way it is safe that the collection doesn't exists
+            logger.info("Creating the collection and adding documents...")
+            logger.info("Add book %s to new collection...", v_uploaded_file.name)
 
-            result_status = "KO"
-    else:
-        # new collection
-        # this way it is safe that the collection doesn't exists
-        logger.info("Creating the collection and adding documents...")
-        logger.info("Add book %s to new collection...", v_uploaded_file.name)
+            manage_collection(
+                docs, embed_model, collection_name, is_new_collection=True
+            )
 
-        manage_collection(docs, embed_model, collection_name, is_new_collection=True)
+            result_status = "OK"
 
-        result_status = "OK"
+        log_cache_stats(embed_model)
 
-    return result_status
+        return result_status
 
 
 def delete_documents_in_collection(collection_name, doc_names):
     """
     drop documents in the given collection
+
+    returns a dict: doc_name -> num. of chunks deleted
     """
     if len(doc_names) > 0:
         with get_db_connection() as conn:
             logger.info("Delete docs: %s in collection %s", doc_names, collection_name)
-            OracleVS4DBLoading.delete_documents(conn, collection_name, doc_names)
+            deleted = OracleVS4DBLoading.delete_documents(
+                conn, collection_name, doc_names
+            )
+
+        for doc_name, n_chunks in deleted.items():
+            logger.info("Deleted %s chunks for %s", n_chunks, doc_name)
+
+        return deleted
+
+    return {}
+
+
+def build_vector_index(collection_name, index_type=VECTOR_INDEX_TYPE):
+    """
+    create the vector index of the collection, if it doesn't have one,
+    and report build time and size
+
+    to be called after the bulk load. A failure is logged and doesn't
+    fail the load (the collection can be searched without the index)
+    returns the dict from create_vector_index (None if not built)
+    """
+    if index_type is None:
+        return None
+
+    with get_db_connection() as conn:
+        existing = OracleVS4DBLoading.list_vector_indexes(conn, collection_name)
+
+        if len(existing) > 0:
+            logger.info(
+                "Collection %s has already the vector index %s, skipping...",
+                collection_name,
+                existing[0][0],
+            )
+            return None
+
+        # BINARY vectors support only HAMMING (and JACCARD)
+        vector_format = OracleVS4DBLoading.get_collection_vector_format(
+            conn, collection_name
+        )
+        distance = "HAMMING" if vector_format == "BINARY" else "COSINE"
+
+        logger.info(
+            "Building %s vector index on %s (%s)...",
+            index_type,
+            collection_name,
+            distance,
+        )
+        try:
+            result = OracleVS4DBLoading.create_vector_index(
+                conn, collection_name, index_type, distance=distance
+            )
+        except oracledb.DatabaseError as e:
+            logger.error(
+                "Vector index on %s not built: %s", collection_name, str(e).strip()
+            )
+            if index_type.upper() == "HNSW":
+                logger.error(
+                    "HNSW indexes need the vector pool: set VECTOR_MEMORY_SIZE "
+                    "in the DB, or use IVF (--index IVF, VECTOR_INDEX_TYPE)"
+                )
+            logger.error("The documents are loaded, the index can be built later")
+            return None
+
+    METRICS.record("index_build", result["build_time"])
+
+    size_bytes = result["size_bytes"]
+    logger.info(
+        "Vector index %s built in %.1f sec., size: %s",
+        result["index_name"],
+        result["build_time"],
+        f"{size_bytes / 2**20:.1f} MB" if size_bytes is not None else "n.a.",
+    )
+
+    return result
+
+
+def add_documents_to_store(v_store, docs, before_commit=None):
+    """
+    embed and insert docs, using array binding if USE_BULK_INSERT
+
+    INT8 and BINARY collections always use array binding:
+    the vectors are quantized before the insert
+    before_commit: called before every commit of the chunks, as
+    before_commit(docs_inserted, is_last) (see bulk_add_documents)
+    """
+    if USE_BULK_INSERT or v_store.vector_format in ("INT8", "BINARY"):
+        v_store.bulk_add_documents(docs, before_commit=before_commit)
+    else:
+        # add_documents commits once, at the end
+        if before_commit is not None:
+            before_commit(docs, True)
+
+        with METRICS.stage("add_documents", items=len(docs)):
+            v_store.add_documents(docs)
+
+    METRICS.increment("chunks_loaded", len(docs))
 
 
 def manage_collection(docs, embed_model, collection_name, is_new_collection):
@@ -206,23 +575,473 @@ def manage_collection(docs, embed_model, collection_name, is_new_collection):
             logger.info(
                 "Creating collection '%s' and adding documents...", collection_name
             )
-            OracleVS4DBLoading.from_documents(
-                docs,
-                embed_model,
-                client=conn,
-                table_name=collection_name,
-                distance_strategy=DistanceStrategy.COSINE,
-            )
         else:
             logger.info(
                 "Updating existing collection '%s' with new documents...",
                 collection_name,
             )
-            v_store = OracleVS4DBLoading(
-                client=conn,
-                table_name=collection_name,
-                distance_strategy=DistanceStrategy.COSINE,
-                embedding_function=embed_model,
+        v_store = get_vector_store(conn, collection_name, embed_model, docs)
+
+        if not is_new_collection:
+            delete_pending_documents(
+                conn, collection_name, {doc.metadata.get("source") for doc in docs}
             )
-            v_store.add_documents(docs)
+
+        def record_in_catalog(docs_inserted, is_last):
+            # pending until the last commit
+            update_document_catalog(
+                conn,
+                collection_name,
+                docs_inserted,
+                embed_model,
+                complete_docs=None if is_last else (),
+            )
+
+        add_documents_to_store(v_store, docs, before_commit=record_in_catalog)
+
         logger.info("Operation completed for collection: %s", collection_name)
+
+
+def manage_collection_streaming(
+    docs_iter,
+    embed_model,
+    collection_name,
+    is_new_collection,
+    window_size=STREAMING_WINDOW_SIZE,
+    max_pending=STREAMING_MAX_PENDING,
+):
+    """
+    Create or update a collection consuming the chunks from an iterator.
+
+    Chunks are embedded and inserted in windows of window_size chunks.
+    A producer thread reads docs_iter and fills a queue of at most
+    max_pending windows: when embed + insert is slower than parsing
+    the producer blocks, so memory stays bounded by the window size.
+
+    The chunks of a document must be contiguous (as from iter_chunks):
+    a window is queued with the source of the chunk after it, so that a
+    document is recorded complete in the catalog only in the transaction
+    of its last window (pending before, see update_document_catalog)
+
+    returns the list of the lengths of the chunks loaded (for stats)
+    """
+    windows = queue.Queue(maxsize=max_pending)
+    stop_event = threading.Event()
+    producer_errors = []
+
+    def put_window(window):
+        # retry with timeout, to stop if the consumer has failed
+        while not stop_event.is_set():
+            try:
+                windows.put(window, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            window = []
+            for doc in docs_iter:
+                if len(window) == window_size:
+                    # (window, source of the next chunk)
+                    if not put_window((window, doc.metadata.get("source"))):
+                        return
+                    window = []
+
+                window.append(doc)
+
+            if len(window) > 0:
+                put_window((window, None))
+        except Exception as e:
+            producer_errors.append(e)
+        finally:
+            # end of stream
+            put_window(None)
+
+    lengths = []
+
+    producer_thread = threading.Thread(target=producer, daemon=True)
+    producer_thread.start()
+
+    try:
+        with get_db_connection() as conn:
+            v_store = None
+
+            # the windows until the end of stream (None)
+            sample_docs, windows_iter = buffer_pca_sample(
+                conn,
+                collection_name,
+                embed_model,
+                iter(windows.get, None),
+                lambda item: item[0],
+            )
+
+            # chunks committed, for each document
+            loaded_counts = Counter()
+
+            def record_in_catalog(docs_inserted, is_last, complete_docs):
+                update_document_catalog(
+                    conn,
+                    collection_name,
+                    docs_inserted,
+                    embed_model,
+                    complete_docs=complete_docs if is_last else (),
+                    previous_counts=loaded_counts,
+                )
+
+            for window, next_source in windows_iter:
+                sources = {doc.metadata.get("source") for doc in window}
+
+                if v_store is None:
+                    # created at the first window, to avoid
+                    # creating an empty collection
+                    if is_new_collection:
+                        logger.info(
+                            "Creating collection '%s' and adding documents...",
+                            collection_name,
+                        )
+                    v_store = get_vector_store(
+                        conn, collection_name, embed_model, sample_docs or window
+                    )
+
+                if not is_new_collection:
+                    # the documents starting in this window
+                    delete_pending_documents(
+                        conn, collection_name, sources - set(loaded_counts)
+                    )
+
+                # the last document can continue in the next window
+                add_documents_to_store(
+                    v_store,
+                    window,
+                    before_commit=partial(
+                        record_in_catalog, complete_docs=sources - {next_source}
+                    ),
+                )
+                loaded_counts.update(doc.metadata.get("source") for doc in window)
+
+                lengths += [len(doc.page_content) for doc in window]
+
+                logger.info("Loaded %s chunks...", len(lengths))
+    finally:
+        stop_event.set()
+
+    producer_thread.join()
+
+    if len(producer_errors) > 0:
+        raise producer_errors[0]
+
+    logger.info("Operation completed for collection: %s", collection_name)
+
+    return lengths
+
+
+def manage_collection_with_checkpoint(
+    files_list,
+    embed_model,
+    collection_name,
+    manifest,
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+    workers=LOAD_WORKERS,
+    batch_size=BULK_INSERT_BATCH_SIZE,
+    timings=None,
+):
+    """
+    Load files in a collection, recording the progress in the manifest.
+
+    Files already completed (same content hash) are skipped, a file
+    partially loaded restarts after the last batch recorded as inserted.
+    The chunks have deterministic ids (file name, chunk index): the ones
+    of the batches not recorded (committed before a crash, or not yet
+    saved in the manifest) are deleted before being inserted again, so
+    a re-run never loads a chunk twice (a changed file is deleted and
+    reloaded). The manifest is written before the collection is created.
+
+    manifest: IngestionManifest
+    returns the list of the lengths of the chunks loaded in this run
+    """
+    files_to_load = []
+    file_hashes = {}
+
+    for file_path in files_list:
+        file_hash = compute_file_hash(file_path)
+
+        if manifest.is_completed(file_path, file_hash):
+            logger.info("Document %s already loaded, skipping...", file_path)
+        else:
+            files_to_load.append(file_path)
+            file_hashes[file_path] = file_hash
+
+    lengths = []
+
+    if len(files_to_load) == 0:
+        return lengths
+
+    # a run interrupted from now on can be resumed
+    if not manifest.exists():
+        manifest.save()
+
+    # pylint: disable=import-outside-toplevel
+    from chunk_index_utils import iter_load_and_split_files
+
+    with get_db_connection() as conn:
+        v_store = None
+
+        sample_docs, files_iter = buffer_pca_sample(
+            conn,
+            collection_name,
+            embed_model,
+            iter_load_and_split_files(
+                files_to_load, chunk_size, chunk_overlap, workers
+            ),
+            lambda item: item[1],
+        )
+
+        for file_path, docs, elapsed in files_iter:
+            if timings is not None:
+                timings.append((file_path, len(docs), elapsed))
+
+            if v_store is None:
+                # at the first file, a new collection is created
+                v_store = get_vector_store(
+                    conn, collection_name, embed_model, sample_docs or docs
+                )
+
+            doc_name = os.path.basename(file_path)
+            chunk_ids = get_chunk_ids(doc_name, len(docs))
+
+            file_hash = file_hashes[file_path]
+            previous = manifest.get(file_path)
+            start_batch = manifest.batches_inserted(file_path, file_hash, len(docs))
+
+            # before mark_parsed: the previous entry says what can be in the DB
+            if previous is not None:
+                if previous["hash"] == file_hash and previous["chunks"] == len(docs):
+                    logger.info("Resuming %s from batch %s...", file_path, start_batch)
+
+                    # the batches after the last one recorded
+                    OracleVS4DBLoading.delete_chunks(
+                        conn,
+                        collection_name,
+                        chunk_ids[start_batch * previous["batch_size"] :],
+                    )
+                    conn.commit()
+                else:
+                    # changed since the previous run: remove what was loaded
+                    logger.info("Document %s changed, reloading...", file_path)
+                    OracleVS4DBLoading.delete_documents(
+                        conn, collection_name, [doc_name]
+                    )
+
+            manifest.mark_parsed(file_path, file_hash, len(docs), batch_size)
+            file_batch_size = manifest.get(file_path)["batch_size"]
+
+            n_batches = (len(docs) + file_batch_size - 1) // file_batch_size
+
+            for i in range(start_batch, n_batches):
+                start, end = i * file_batch_size, (i + 1) * file_batch_size
+                batch = docs[start:end]
+
+                embeddings = embed_model.embed_documents(
+                    [doc.page_content for doc in batch]
+                )
+                manifest.mark_embedded(file_path)
+
+                is_last = i == n_batches - 1
+
+                # the document is pending in the catalog until its last batch
+                v_store.insert_embedded_documents(
+                    batch,
+                    embeddings,
+                    chunk_ids[start:end],
+                    before_commit=partial(
+                        update_document_catalog,
+                        conn,
+                        collection_name,
+                        docs[:end],
+                        embed_model,
+                        complete_docs=None if is_last else (),
+                    ),
+                )
+                manifest.mark_batch_inserted(file_path, completed=is_last)
+                METRICS.increment("chunks_loaded", len(batch))
+
+                lengths += [len(doc.page_content) for doc in batch]
+
+            if n_batches == 0:
+                # no chunks, nothing to resume
+                manifest.mark_batch_inserted(file_path, completed=True)
+
+            logger.info("Loaded %s chunks...", len(lengths))
+
+    logger.info("Operation completed for collection: %s", collection_name)
+
+    return lengths
+
+
+def finish_document_sync(
+    conn, collection_name, embed_model, docs, changes, docs_inserted, is_last
+):
+    """
+    before_commit of the new chunks of a document synced (see
+    sync_documents_in_collection): at the intermediate commits the
+    document is pending in the catalog, with the last one the chunks
+    removed are deleted, the metadata of the kept ones is updated and
+    the document is recorded complete
+
+    changes: (kept_ids, kept_metadatas, removed_ids)
+    """
+    kept_ids, kept_metadatas, removed_ids = changes
+
+    if not is_last:
+        doc_name = docs[0].metadata.get("source")
+        update_document_catalog(
+            conn,
+            collection_name,
+            docs_inserted,
+            embed_model,
+            complete_docs=(),
+            previous_counts=Counter({doc_name: len(kept_ids) + len(removed_ids)}),
+        )
+        return
+
+    OracleVS4DBLoading.delete_chunks(conn, collection_name, removed_ids)
+    OracleVS4DBLoading.update_chunks_metadata(
+        conn, collection_name, kept_ids, kept_metadatas
+    )
+    update_document_catalog(conn, collection_name, docs, embed_model)
+
+
+def sync_documents_in_collection(
+    files_list,
+    embed_model,
+    collection_name,
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+    workers=LOAD_WORKERS,
+):
+    """
+    Incremental sync of files in an existing collection.
+
+    Chunks are matched with the ones in the collection using the hash of
+    their text (chunk_hash in metadata): only new or changed chunks are
+    embedded and inserted, chunks no longer present are deleted and the
+    metadata of the unchanged ones is updated (e.g. page label).
+    Files complete in the catalog with the same content hash (doc_hash)
+    are skipped before being parsed (and summarized): a sync with no
+    change reads only the files. Documents missing from the catalog or
+    pending (a load interrupted) are completed.
+
+    returns a dict: doc_name -> (chunks kept, added, removed)
+    """
+    results = {}
+
+    # pylint: disable=import-outside-toplevel
+    from chunk_index_utils import iter_load_and_split_files
+
+    with get_db_connection() as conn:
+        # filled from the chunks, for collections loaded without catalog:
+        # from now on a document missing from it is not (fully) loaded
+        if OracleVS4DBLoading.create_catalog(conn, collection_name):
+            logger.info("Document catalog created for %s", collection_name)
+
+        files_to_sync = []
+
+        for file_path in files_list:
+            doc_name = os.path.basename(file_path)
+
+            # pending documents have no hash
+            _, catalog_hash = OracleVS4DBLoading.get_document_hash(
+                conn, collection_name, doc_name
+            )
+            if catalog_hash == compute_file_hash(file_path):
+                logger.info("Document %s unchanged, skipping...", doc_name)
+                continue
+
+            files_to_sync.append(file_path)
+
+        v_store = None
+
+        sample_docs, files_iter = buffer_pca_sample(
+            conn,
+            collection_name,
+            embed_model,
+            iter_load_and_split_files(
+                files_to_sync, chunk_size, chunk_overlap, workers
+            ),
+            lambda item: item[1],
+        )
+
+        for file_path, docs, _ in files_iter:
+            if v_store is None:
+                v_store = get_vector_store(
+                    conn, collection_name, embed_model, sample_docs or docs
+                )
+
+            doc_name = os.path.basename(file_path)
+            existing = OracleVS4DBLoading.get_chunk_hashes(
+                conn, collection_name, doc_name
+            )
+
+            # same file and same chunks: only the catalog is missing or pending
+            if (
+                len(docs) > 0
+                and all(row[2] == docs[0].metadata["doc_hash"] for row in existing)
+                and Counter(row[1] for row in existing)
+                == Counter(doc.metadata["chunk_hash"] for doc in docs)
+            ):
+                update_document_catalog(conn, collection_name, docs, embed_model)
+                conn.commit()
+
+                logger.info("Document %s loaded, recorded in the catalog", doc_name)
+                results[doc_name] = (len(docs), 0, 0)
+                continue
+
+            # ids of the chunks in the collection, for each chunk hash
+            ids_by_hash = defaultdict(list)
+            for chunk_id, chunk_hash, _ in existing:
+                ids_by_hash[chunk_hash].append(chunk_id)
+
+            kept_ids = []
+            kept_metadatas = []
+            new_docs = []
+
+            for doc in docs:
+                ids = ids_by_hash.get(doc.metadata["chunk_hash"])
+
+                if ids:
+                    kept_ids.append(ids.pop())
+                    kept_metadatas.append(doc.metadata)
+                else:
+                    new_docs.append(doc)
+
+            removed_ids = [chunk_id for ids in ids_by_hash.values() for chunk_id in ids]
+
+            finish = partial(
+                finish_document_sync,
+                conn,
+                collection_name,
+                embed_model,
+                docs,
+                (kept_ids, kept_metadatas, removed_ids),
+            )
+
+            # new chunks first: if interrupted, the next sync completes the work
+            if len(new_docs) > 0:
+                add_documents_to_store(v_store, new_docs, before_commit=finish)
+            else:
+                finish([], True)
+                conn.commit()
+
+            logger.info(
+                "Synced %s: %s chunks unchanged, %s added, %s removed",
+                doc_name,
+                len(kept_ids),
+                len(new_docs),
+                len(removed_ids),
+            )
+            results[doc_name] = (len(kept_ids), len(new_docs), len(removed_ids))
+
+    return results
@@ -6,8 +6,8 @@ beware: check what you're doing
 
 import argparse
 
-from db_doc_loader_backend import get_db_connection
-from oraclevs_4_db_loading import OracleVS4DBLoading
+from db_connection import get_db_connection
+import collection_admin
 
 from utils import get_console_logger
 
@@ -31,7 +31,7 @@ logger.info("Dropping collection: %s", collection_name)
 logger.info("")
 
 with get_db_connection() as conn:
-    OracleVS4DBLoading.drop_collection(conn, collection_name)
+    collection_admin.drop_collection(conn, collection_name)
 
 logger.info("Collection dropped !")
 logger.info("")
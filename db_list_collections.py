@@ -2,8 +2,8 @@
 Print the list of collections in the schema
 """
 
-from db_doc_loader_backend import get_db_connection
-from oraclevs_4_db_loading import OracleVS4DBLoading
+from db_connection import get_db_connection
+import collection_admin
 
 from utils import get_console_logger
 
@@ -11,7 +11,7 @@ from utils import get_console_logger
 logger = get_console_logger()
 
 with get_db_connection() as conn:
-    coll_list = OracleVS4DBLoading.list_collections(conn)
+    coll_list = collection_admin.list_collections(conn)
 
 logger.info("")
 logger.info("List of collections:")
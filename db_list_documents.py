@@ -4,8 +4,8 @@ Print the list of documents in the collection
 
 import argparse
 
-from db_doc_loader_backend import get_db_connection
-from oraclevs_4_db_loading import OracleVS4DBLoading
+from db_connection import get_db_connection
+import collection_admin
 
 from utils import get_console_logger
 
@@ -20,7 +20,7 @@ args = parser.parse_args()
 collection_name = args.collection_name
 
 with get_db_connection() as conn:
-    docs_list = OracleVS4DBLoading.list_books_in_collection(conn, collection_name)
+    docs_list = collection_admin.list_books_in_collection(conn, collection_name)
 
 logger.info("")
 logger.info("List of documents in collection %s", collection_name)
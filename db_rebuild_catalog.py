@@ -0,0 +1,39 @@
+"""
+Rebuild the document catalog of a collection from its chunks
+
+for collections loaded before the catalog existed, or to repair it
+"""
+
+import argparse
+
+from db_connection import get_db_connection
+import collection_admin
+
+from utils import get_console_logger
+
+logger = get_console_logger()
+
+parser = argparse.ArgumentParser(description="Rebuild the document catalog.")
+
+parser.add_argument("collection_name", type=str, help="collection name.")
+
+args = parser.parse_args()
+collection_name = args.collection_name
+
+logger.info("")
+logger.info("Rebuilding the document catalog of %s ...", collection_name)
+
+with get_db_connection() as conn:
+    if not collection_admin.create_catalog(conn, collection_name):
+        # already there: filled again
+        collection_admin.rebuild_catalog(conn, collection_name)
+
+    catalog = collection_admin.get_catalog(conn, collection_name)
+
+logger.info("")
+logger.info(
+    "%s documents, %s chunks",
+    len(catalog),
+    sum(entry["chunk_count"] for entry in catalog),
+)
+logger.info("")
@@ -0,0 +1,94 @@
+"""
+Adaptive batching for the embedding requests
+
+Texts are packed in requests by estimated num. of tokens, up to the
+limits of the model (EMBED_MODEL_LIMITS in config.py): short chunks go in
+few, big requests, long chunks in smaller ones, so we always send the
+fewest requests that are still accepted by the model.
+"""
+
+import math
+
+from utils import get_console_logger
+from config import EMBED_MODEL_LIMITS, DEFAULT_EMBED_MODEL_LIMITS, CHARS_PER_TOKEN
+
+logger = get_console_logger()
+
+# to warn only once for texts too long
+_warned_too_long = set()
+
+
+def get_model_limits(model_id: str) -> dict:
+    """
+    return the limits for the model (defaults if not configured)
+    """
+    limits = dict(DEFAULT_EMBED_MODEL_LIMITS)
+    limits.update(EMBED_MODEL_LIMITS.get(model_id, {}))
+
+    return limits
+
+
+def estimate_tokens(text: str, chars_per_token: float = CHARS_PER_TOKEN) -> int:
+    """
+    estimate of the num. of tokens of a text, from its length
+    """
+    return max(1, math.ceil(len(text) / chars_per_token))
+
+
+def make_batches(texts, max_texts: int, max_request_tokens: int, max_text_tokens=None):
+    """
+    split texts in consecutive batches, each one with at most max_texts texts
+    and max_request_tokens estimated tokens
+
+    returns the list of (start, end) indexes of the batches, in order
+    """
+    batches = []
+    start = 0
+    batch_tokens = 0
+    n_too_long = 0
+
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+
+        if max_text_tokens is not None and tokens > max_text_tokens:
+            # it will be truncated (or rejected) by the model
+            n_too_long += 1
+            tokens = max_text_tokens
+
+        if i > start and (
+            i - start >= max_texts or batch_tokens + tokens > max_request_tokens
+        ):
+            batches.append((start, i))
+            start = i
+            batch_tokens = 0
+
+        batch_tokens += tokens
+
+    if start < len(texts):
+        batches.append((start, len(texts)))
+
+    if n_too_long > 0 and max_text_tokens not in _warned_too_long:
+        _warned_too_long.add(max_text_tokens)
+        logger.warning(
+            "%s texts longer than %s tokens (estimated) for the model",
+            n_too_long,
+            max_text_tokens,
+        )
+
+    return batches
+
+
+def make_model_batches(texts, model_id: str, max_texts=None):
+    """
+    split texts in batches using the limits configured for the model
+
+    max_texts: optional override of the max num. of texts per request
+    """
+    limits = get_model_limits(model_id)
+
+    return make_batches(
+        texts,
+        max_texts if max_texts is not None else limits["max_texts"],
+        limits["max_request_tokens"],
+        limits["max_text_tokens"],
+    )
@@ -0,0 +1,391 @@
+"""
+Persistent cache for embeddings
+
+Wraps any LangChain Embeddings model: vectors are stored in a local
+SQLite file, keyed by the hash of (model id, dimensions, input type, text),
+so identical texts are never embedded twice, even across runs.
+
+Vectors are stored as float32 blobs. When the file grows over the max size
+the least recently used entries are evicted.
+
+The connection to a cache file is shared by all the models using it in
+the process, with the num. of entries and bytes stored (counted when the
+file is opened, then updated on insert and delete)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from utils import get_console_logger
+from metrics import METRICS
+from config import EMBED_CACHE_PATH, EMBED_CACHE_MAX_MB
+
+logger = get_console_logger()
+
+# max num. of keys in a single SQL statement
+SQL_BATCH_SIZE = 500
+# after eviction the size is reduced to this fraction of the max size
+EVICTION_TARGET = 0.9
+
+
+class CacheStore:
+    """
+    the SQLite file of a cache, shared in the process
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+
+        # the models can be used from different threads (streaming mode)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)"
+        )
+        self.conn.commit()
+
+        # counted only here, then kept up to date
+        # (approximate if the file is written by other processes)
+        self.total_bytes, self.num_entries = self.conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM embeddings"
+        ).fetchone()
+
+    def close(self):
+        """
+        close the connection
+        """
+        with self.lock:
+            self.conn.close()
+
+
+_cache_stores = {}
+_cache_stores_lock = threading.Lock()
+
+
+def get_cache_store(cache_path: str) -> CacheStore:
+    """
+    return the store of the cache file, opened once in the process
+    """
+    key = os.path.abspath(cache_path)
+
+    with _cache_stores_lock:
+        if key not in _cache_stores:
+            _cache_stores[key] = CacheStore(cache_path)
+
+        return _cache_stores[key]
+
+
+def close_cache_stores():
+    """
+    close all the cache files opened
+    """
+    with _cache_stores_lock:
+        for store in _cache_stores.values():
+            store.close()
+        _cache_stores.clear()
+
+
+def get_model_id(embed_model):
+    """
+    return the id of the model wrapped (OCI and NVIDIA use different fields)
+    """
+    for field in ["model_id", "model"]:
+        value = getattr(embed_model, field, None)
+        if value:
+            return str(value)
+
+    return type(embed_model).__name__
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings model with a persistent, content-addressed cache
+    """
+
+    def __init__(
+        self,
+        embed_model: Embeddings,
+        cache_path: str = EMBED_CACHE_PATH,
+        max_size_mb: int = EMBED_CACHE_MAX_MB,
+    ):
+        """
+        Init
+
+        args:
+            embed_model: the embeddings model to wrap
+            cache_path: path of the SQLite file
+            max_size_mb: max size of the vectors stored (MB)
+        """
+        self.embed_model = embed_model
+        self.model_id = get_model_id(embed_model)
+        self.dimensions = getattr(embed_model, "dimensions", None)
+        self.cache_path = cache_path
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        # one connection for each file, shared in the process
+        self._cache_store = get_cache_store(cache_path)
+        self._lock = self._cache_store.lock
+        self._conn = self._cache_store.conn
+
+    def _key(self, text: str, input_type: str, kwargs: dict = None) -> bytes:
+        """
+        the key identifies the text and everything that changes the vector
+        (also the args passed to the model)
+        """
+        prefix = f"{self.model_id}|{self.dimensions}|{input_type}|"
+        if kwargs:
+            prefix += json.dumps(kwargs, sort_keys=True, default=str) + "|"
+
+        return hashlib.sha256((prefix + text).encode("utf-8")).digest()
+
+    def _lookup(self, keys: List[bytes]) -> dict:
+        """
+        return the vectors found in the cache, as a dict key -> vector
+        """
+        found = {}
+        now = time.time()
+
+        with self._lock:
+            for i in range(0, len(keys), SQL_BATCH_SIZE):
+                batch = keys[i : i + SQL_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(batch))
+
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            # refresh for LRU
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+            self._conn.commit()
+
+        return found
+
+    def _store(self, keys: List[bytes], vectors: List[List[float]]):
+        """
+        store new vectors and evict if the max size is exceeded
+        """
+        now = time.time()
+        rows = [
+            (key, array("f", vector).tobytes(), now)
+            for key, vector in zip(keys, vectors)
+        ]
+        rows_bytes = sum(len(row[1]) for row in rows)
+
+        with self._lock:
+            # keys stored in the meantime (by another thread) are kept
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_access) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+            inserted = cursor.rowcount if cursor.rowcount >= 0 else len(rows)
+            self._cache_store.num_entries += inserted
+            self._cache_store.total_bytes += rows_bytes * inserted // max(1, len(rows))
+
+            self._evict()
+
+    def _evict(self):
+        """
+        remove the least recently used entries, if needed
+        (called holding the lock)
+        """
+        total_bytes = self._cache_store.total_bytes
+        num_entries = self._cache_store.num_entries
+
+        if total_bytes <= self.max_size_bytes or num_entries == 0:
+            return
+
+        avg_bytes = total_bytes / num_entries
+        to_remove = int(
+            (total_bytes - EVICTION_TARGET * self.max_size_bytes) / avg_bytes
+        )
+        to_remove = min(num_entries, max(1, to_remove))
+
+        # only the rows removed are read (index on last_access)
+        removed_bytes, removed = self._conn.execute(
+            """
+            SELECT COALESCE(SUM(LENGTH(vector)), 0), COUNT(*) FROM (
+                SELECT vector FROM embeddings ORDER BY last_access ASC LIMIT ?
+            )
+            """,
+            (to_remove,),
+        ).fetchone()
+
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?
+            )
+            """,
+            (to_remove,),
+        )
+        self._conn.commit()
+
+        self._cache_store.total_bytes -= removed_bytes
+        self._cache_store.num_entries -= removed
+        self.evicted += removed
+
+    def _embed(self, texts: List[str], input_type: str, embed_func, kwargs=None):
+        """
+        embed texts, calling embed_func only for the texts not in cache
+        """
+        keys = [self._key(text, input_type, kwargs) for text in texts]
+
+        found = self._lookup(keys)
+
+        # texts to embed, without duplicates
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        METRICS.increment("embed_cache_hits", len(texts) - len(missing))
+        METRICS.increment("embed_cache_misses", len(missing))
+
+        if len(missing) > 0:
+            new_vectors = embed_func(list(missing.values()))
+            new_keys = list(missing.keys())
+
+            self._store(new_keys, new_vectors)
+            found.update(zip(new_keys, new_vectors))
+
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """
+        Embed a list of documents
+
+        kwargs are passed to the model (and are part of the cache key)
+        """
+        return self._embed(
+            texts,
+            "passage",
+            lambda texts: self.embed_model.embed_documents(texts, **kwargs),
+            kwargs,
+        )
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        """
+        Embed the query (a str)
+        """
+        return self._embed(
+            [text],
+            "query",
+            lambda texts: [self.embed_model.embed_query(t, **kwargs) for t in texts],
+            kwargs,
+        )[0]
+
+    def get_stats(self) -> dict:
+        """
+        return the statistics on the use of the cache
+        """
+        with self._lock:
+            total_bytes = self._cache_store.total_bytes
+            num_entries = self._cache_store.num_entries
+
+        requests_total = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests_total if requests_total > 0 else 0.0,
+            "evicted": self.evicted,
+            "entries": num_entries,
+            "size_mb": total_bytes / (1024 * 1024),
+        }
+
+    def log_stats(self):
+        """
+        print the statistics on the use of the cache
+        """
+        stats = self.get_stats()
+
+        logger.info("")
+        logger.info("Embeddings cache: %s", self.cache_path)
+        logger.info(
+            "Hits: %s, misses: %s, hit rate: %.1f%%",
+            stats["hits"],
+            stats["misses"],
+            100.0 * stats["hit_rate"],
+        )
+        logger.info(
+            "Entries: %s, size: %.1f MB, evicted: %s",
+            stats["entries"],
+            stats["size_mb"],
+            stats["evicted"],
+        )
+        logger.info("")
+
+
+class InstrumentedEmbeddings(Embeddings):
+    """
+    Embeddings model recording the calls in METRICS (stage embed)
+    """
+
+    def __init__(self, embed_model: Embeddings):
+        self.embed_model = embed_model
+        self.model_id = get_model_id(embed_model)
+        self.dimensions = getattr(embed_model, "dimensions", None)
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """
+        Embed a list of documents
+        """
+        with METRICS.stage("embed", items=len(texts), n_bytes=sum(map(len, texts))):
+            return self.embed_model.embed_documents(texts, **kwargs)
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        """
+        Embed the query (a str)
+        """
+        with METRICS.stage("embed_query", items=1, n_bytes=len(text)):
+            return self.embed_model.embed_query(text, **kwargs)
+
+
+def log_cache_stats(embed_model):
+    """
+    print the cache statistics, if the model is cached
+    (also when wrapped, e.g. by ProjectedEmbeddings)
+    """
+    while not isinstance(embed_model, CachedEmbeddings) and hasattr(
+        embed_model, "embed_model"
+    ):
+        embed_model = embed_model.embed_model
+
+    if isinstance(embed_model, CachedEmbeddings):
+        embed_model.log_stats()
@@ -0,0 +1,158 @@
+"""
+Client side reduction of the dimensions of the embeddings
+
+For models without native support for smaller dimensions (OCI Cohere)
+the vectors are projected with PCA (NumPy), fitted on a sample of the
+chunks of the first load of the collection. The projection is stored
+with the collection (see OracleVS4DBLoading.register_collection),
+so that the following loads and the queries use the same one.
+"""
+
+import io
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import get_model_id
+from utils import get_console_logger
+
+logger = get_console_logger()
+
+
+class PCAProjection:
+    """
+    linear projection on the first principal components
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray):
+        """
+        mean: (dims in,), components: (dims out, dims in)
+        """
+        self.mean = mean
+        self.components = components
+
+    @property
+    def dimensions(self) -> int:
+        """
+        num. of dimensions of the projected vectors
+        """
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, vectors, dimensions: int):
+        """
+        compute the projection on the first dimensions components
+        """
+        vectors = np.asarray(vectors, dtype=np.float64)
+        n_samples, n_dims = vectors.shape
+
+        if dimensions > n_dims:
+            raise ValueError(f"Can't project {n_dims} dims. to {dimensions}")
+        if n_samples <= dimensions:
+            # centered, the sample has rank < n_samples: the components
+            # over it would be arbitrary
+            raise ValueError(
+                f"PCA projection to {dimensions} dims. needs more than "
+                f"{dimensions} vectors, got {n_samples}"
+            )
+
+        mean = vectors.mean(axis=0)
+        centered = vectors - mean
+
+        # eigenvectors of the covariance, eigh returns them by increasing variance
+        _, eigenvectors = np.linalg.eigh(centered.T @ centered)
+
+        return cls(mean, eigenvectors[:, ::-1][:, :dimensions].T)
+
+    def transform(self, vectors) -> np.ndarray:
+        """
+        project the vectors and normalize them (unit norm, for COSINE)
+        """
+        projected = (np.asarray(vectors, dtype=np.float64) - self.mean) @ (
+            self.components.T
+        )
+
+        norms = np.linalg.norm(projected, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+
+        return projected / norms
+
+    def to_bytes(self) -> bytes:
+        """
+        serialize (npz), to store it in the DB
+        """
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            mean=self.mean.astype(np.float32),
+            components=self.components.astype(np.float32),
+        )
+
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """
+        deserialize a projection saved with to_bytes
+        """
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls(arrays["mean"], arrays["components"])
+
+
+class ProjectedEmbeddings(Embeddings):
+    """
+    Embeddings model returning vectors reduced to dimensions with PCA
+
+    it wraps the (cached) model: the cache keeps the full vectors.
+    The projection must be fitted (fit) or loaded (set_projection)
+    before embedding
+    """
+
+    def __init__(self, embed_model: Embeddings, dimensions: int):
+        self.embed_model = embed_model
+        self.model_id = get_model_id(embed_model)
+        self.dimensions = dimensions
+        self.projection = None
+
+    def fit(self, texts: List[str]):
+        """
+        fit the projection on the embeddings of texts
+        """
+        logger.info(
+            "Fitting PCA projection to %s dims. on %s chunks...",
+            self.dimensions,
+            len(texts),
+        )
+        vectors = self.embed_model.embed_documents(texts)
+
+        self.projection = PCAProjection.fit(vectors, self.dimensions)
+
+    def set_projection(self, projection: PCAProjection):
+        """
+        use a projection already fitted (e.g. read from the DB)
+        """
+        if projection.dimensions != self.dimensions:
+            raise ValueError(
+                f"Projection has {projection.dimensions} dims., "
+                f"expected {self.dimensions}"
+            )
+        self.projection = projection
+
+    def _project(self, vectors) -> List[List[float]]:
+        if self.projection is None:
+            raise ValueError("PCA projection not fitted or loaded")
+
+        return self.projection.transform(vectors).tolist()
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """
+        Embed a list of documents
+        """
+        return self._project(self.embed_model.embed_documents(texts, **kwargs))
+
+    def embed_query(self, text: str, **kwargs) -> List[float]:
+        """
+        Embed the query (a str)
+        """
+        return self._project([self.embed_model.embed_query(text, **kwargs)])[0]
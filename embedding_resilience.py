@@ -0,0 +1,249 @@
+"""
+Resilience layer for the embedding backends (NVIDIA NIM, OCI GenAI)
+
+    * retries with exponential backoff and full jitter on throttling (429),
+      server errors (5xx) and connection errors, honouring Retry-After
+    * a circuit breaker: after EMBED_BREAKER_FAILURES calls failed (retries
+      exhausted) calls fail fast for EMBED_BREAKER_RECOVERY sec.
+    * adaptive concurrency (AIMD): the num. of requests in flight is halved
+      when throttled and slowly increased again after successes, to keep
+      the max sustainable throughput instead of failing
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import backoff
+from circuitbreaker import CircuitBreaker
+
+from utils import get_console_logger
+from config import (
+    EMBED_MAX_TRIES,
+    EMBED_RETRY_BASE_DELAY,
+    EMBED_RETRY_MAX_DELAY,
+    EMBED_BREAKER_FAILURES,
+    EMBED_BREAKER_RECOVERY,
+    EMBED_CONCURRENCY_INCREASE_EVERY,
+)
+
+logger = get_console_logger()
+
+# min. interval (sec.) between two decreases of the concurrency
+DECREASE_COOLDOWN = 1.0
+
+
+def get_status_code(e: Exception):
+    """
+    HTTP status of the error: requests (response.status_code) or OCI (status)
+    """
+    response = getattr(e, "response", None)
+    if response is not None and getattr(response, "status_code", None) is not None:
+        return response.status_code
+
+    status = getattr(e, "status", None)
+
+    return status if isinstance(status, int) else None
+
+
+def is_throttling_error(e: Exception) -> bool:
+    """
+    True if the backend is throttling us (429)
+    """
+    return get_status_code(e) == 429
+
+
+def is_retryable_error(e: Exception) -> bool:
+    """
+    True for throttling, server errors and connection errors/timeouts
+    """
+    status = get_status_code(e)
+
+    if status is not None:
+        return status == 429 or status >= 500
+
+    # no HTTP status: connection errors and timeouts (requests, OCI)
+    if type(e).__name__ in {
+        "ConnectionError",
+        "ConnectTimeout",
+        "ReadTimeout",
+        "Timeout",
+        "RequestException",
+    }:
+        return True
+
+    # errors wrapped by LangChain keep only the message
+    return "429" in str(e) or "TooManyRequests" in str(e)
+
+
+def get_retry_after(e: Exception):
+    """
+    seconds to wait from the Retry-After header (None if not present)
+    """
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or getattr(e, "headers", None) or {}
+
+    value = None
+    for key, header_value in dict(headers).items():
+        if key.lower() == "retry-after":
+            value = header_value
+
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # HTTP date
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    limits the requests in flight, the limit adapts to throttling (AIMD):
+    halved on throttling, +1 every increase_every successes
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        increase_every: int = EMBED_CONCURRENCY_INCREASE_EVERY,
+        name: str = "",
+    ):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.increase_every = increase_every
+        self.name = name
+
+        self.in_flight = 0
+        self.successes = 0
+        self.last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+        return False
+
+    def on_throttle(self):
+        """
+        multiplicative decrease
+        """
+        with self._cond:
+            now = time.monotonic()
+
+            # requests in flight are throttled together: decrease once
+            if now - self.last_decrease > DECREASE_COOLDOWN and self.limit > 1:
+                self.limit = max(1, self.limit // 2)
+                logger.info(
+                    "%s throttled, concurrency reduced to %s", self.name, self.limit
+                )
+            self.last_decrease = now
+            self.successes = 0
+
+    def on_success(self):
+        """
+        additive increase
+        """
+        with self._cond:
+            self.successes += 1
+
+            if self.successes >= self.increase_every and self.limit < self.max_limit:
+                self.limit += 1
+                self.successes = 0
+                self._cond.notify()
+
+
+class ResilientCaller:
+    """
+    calls a backend function with retries, circuit breaker and
+    adaptive concurrency
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 1,
+        max_tries: int = EMBED_MAX_TRIES,
+        base_delay: float = EMBED_RETRY_BASE_DELAY,
+        max_delay: float = EMBED_RETRY_MAX_DELAY,
+        failure_threshold: int = EMBED_BREAKER_FAILURES,
+        recovery_timeout: int = EMBED_BREAKER_RECOVERY,
+    ):
+        self.name = name
+        self.max_tries = max_tries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.limiter = AdaptiveConcurrencyLimiter(max_concurrency, name=name)
+
+        # a failure for the breaker is a call failed after all the retries
+        breaker = CircuitBreaker(
+            failure_threshold=failure_threshold,
+            recovery_timeout=recovery_timeout,
+            expected_exception=lambda _, value: is_retryable_error(value),
+            name=name,
+        )
+        self._call = breaker(self._call_with_retry)
+
+    def _call_with_retry(self, func, *args, **kwargs):
+        """
+        call func, retrying on retryable errors
+        """
+        wait_gen = backoff.expo(factor=self.base_delay, max_value=self.max_delay)
+        # advance past the initial yield
+        next(wait_gen)
+
+        for attempt in range(1, self.max_tries + 1):
+            with self.limiter:
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    if is_throttling_error(e):
+                        self.limiter.on_throttle()
+
+                    if attempt == self.max_tries or not is_retryable_error(e):
+                        raise
+
+                    wait = get_retry_after(e)
+                    if wait is None:
+                        wait = backoff.full_jitter(next(wait_gen))
+
+                    logger.info(
+                        "%s: %s, retry %s in %.1f sec...",
+                        self.name,
+                        type(e).__name__,
+                        attempt,
+                        wait,
+                    )
+                else:
+                    self.limiter.on_success()
+                    return result
+
+            # waiting outside of the limiter, not holding a slot
+            time.sleep(wait)
+
+        return None
+
+    def call(self, func, *args, **kwargs):
+        """
+        call func with the resilience policies
+
+        raise CircuitBreakerError if the circuit is open
+        """
+        return self._call(func, *args, **kwargs)
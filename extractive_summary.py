@@ -0,0 +1,126 @@
+"""
+Local extractive summarizer
+
+Builds the summary choosing the most representative sentences of the text
+(TextRank over TF-IDF sentence vectors, computed with NumPy).
+No network calls: used for the chunk headers when the LLM is too slow
+or too expensive (SUMMARY_METHOD = "extractive").
+"""
+
+import re
+
+import numpy as np
+from tqdm import tqdm
+
+from config import EXTRACTIVE_SUMMARY_SENTENCES
+
+# end of sentence (. ! ?) followed by spaces, or a new line
+SENTENCE_SPLIT_REGEX = re.compile(r"(?<=[.!?])\s+|\n+")
+WORD_REGEX = re.compile(r"\w+", re.UNICODE)
+
+# sentences shorter than this (chars) are ignored
+MIN_SENTENCE_LENGTH = 20
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+
+
+def split_sentences(text):
+    """
+    split the text in sentences, dropping the too short ones
+    """
+    sentences = [s.strip() for s in SENTENCE_SPLIT_REGEX.split(text)]
+
+    return [s for s in sentences if len(s) >= MIN_SENTENCE_LENGTH]
+
+
+def compute_tfidf(sentences):
+    """
+    return the matrix (num. sentences x vocabulary) of normalized
+    TF-IDF vectors of the sentences
+    """
+    vocabulary = {}
+    rows = []
+    cols = []
+
+    for i, sentence in enumerate(sentences):
+        for word in WORD_REGEX.findall(sentence.lower()):
+            rows.append(i)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+
+    tf = np.zeros((len(sentences), len(vocabulary)))
+    np.add.at(tf, (rows, cols), 1.0)
+
+    # smoothed idf, as in scikit-learn
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1.0
+
+    tfidf = tf * idf
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+
+    return tfidf / norms
+
+
+def rank_sentences(tfidf):
+    """
+    TextRank: PageRank over the graph of cosine similarities
+    """
+    n = tfidf.shape[0]
+
+    similarity = tfidf @ tfidf.T
+    np.fill_diagonal(similarity, 0.0)
+
+    # row-stochastic transition matrix (isolated sentences jump anywhere)
+    row_sums = similarity.sum(axis=1, keepdims=True)
+    transition = np.where(
+        row_sums > 0, similarity / np.maximum(row_sums, 1e-12), 1.0 / n
+    )
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(MAX_ITERATIONS):
+        new_scores = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+
+        if np.abs(new_scores - scores).sum() < TOLERANCE:
+            return new_scores
+        scores = new_scores
+
+    return scores
+
+
+def extractive_summary(text, max_sentences=EXTRACTIVE_SUMMARY_SENTENCES):
+    """
+    return the summary of text: the max_sentences top ranked sentences,
+    in the order in which they appear in the text
+    """
+    sentences = split_sentences(text)
+
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+
+    scores = rank_sentences(compute_tfidf(sentences))
+
+    top = np.sort(np.argsort(-scores, kind="stable")[:max_sentences])
+
+    return " ".join(sentences[i] for i in top)
+
+
+class ExtractiveSummarizer:
+    """
+    same interface of the SummaryEngine, for the chunk headers
+    """
+
+    def __init__(self, max_sentences=EXTRACTIVE_SUMMARY_SENTENCES):
+        self.max_sentences = max_sentences
+
+    def summarize(self, text: str) -> str:
+        """
+        return the summary of text
+        """
+        return extractive_summary(text, self.max_sentences)
+
+    def summarize_many(self, texts: list, desc: str = "Summaries") -> list:
+        """
+        return the summaries of texts, in the same order (with a progress bar)
+        """
+        return [self.summarize(text) for text in tqdm(texts, desc=desc)]
@@ -0,0 +1,166 @@
+"""
+Fast version of the LangChain RecursiveCharacterTextSplitter
+
+same chunks of RecursiveCharacterTextSplitter (same separators, chunk_size,
+chunk_overlap, separator kept at the start of the pieces, strip), but
+the pieces are never built and joined again: they're offsets in the
+text (computed once for each separator level, at C speed), the chunks
+are found by bisection on the offsets and each one is sliced from the
+text once (LangChain creates a string for every piece, at every level,
+and merges them one at a time in Python).
+
+Settings not supported by the fast path (regex separators, a length
+function other than len, keep_separator False or "end") use the
+LangChain implementation.
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, compress
+from operator import add, sub
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+class FastRecursiveTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    RecursiveCharacterTextSplitter working on offsets
+    """
+
+    def _is_fast_path(self) -> bool:
+        """
+        True if the settings are supported by the offsets implementation
+        """
+        return (
+            self._length_function is len
+            and not self._is_separator_regex
+            and self._keep_separator in (True, "start")
+        )
+
+    def split_text(self, text: str) -> list:
+        if not self._is_fast_path():
+            return super().split_text(text)
+
+        chunks = []
+        self._split_offsets(text, 0, len(text), 0, chunks)
+
+        return chunks
+
+    def _split_offsets(self, text, start, end, sep_index, chunks):
+        """
+        split text[start:end] using the separators from sep_index on,
+        appending the chunks
+        """
+        separators = self._separators
+
+        # the first separator found in the text ("" always matches)
+        separator = separators[-1]
+        next_index = len(separators)
+        for i in range(sep_index, len(separators)):
+            if separators[i] == "":
+                separator = ""
+                break
+            if text.find(separators[i], start, end) != -1:
+                separator = separators[i]
+                next_index = i + 1
+                break
+
+        bounds = self._get_bounds(text, start, end, separator)
+        n_pieces = len(bounds) - 1
+
+        # pieces not shorter than chunk_size are split again,
+        # the runs of pieces between them are merged
+        big_pieces = compress(
+            range(n_pieces),
+            map(self._chunk_size.__le__, map(sub, bounds[1:], bounds[:-1])),
+        )
+
+        run_start = 0
+        for k in big_pieces:
+            if k > run_start:
+                self._merge_pieces(text, bounds, run_start, k, chunks)
+
+            if next_index >= len(separators):
+                chunks.append(text[bounds[k] : bounds[k + 1]])
+            else:
+                self._split_offsets(text, bounds[k], bounds[k + 1], next_index, chunks)
+            run_start = k + 1
+
+        if n_pieces > run_start:
+            self._merge_pieces(text, bounds, run_start, n_pieces, chunks)
+
+    @staticmethod
+    def _get_bounds(text, start, end, separator):
+        """
+        offsets where the pieces of text[start:end] start (+ end): each piece
+        starts with the separator (as re.split with the separator kept
+        at the start), no empty pieces
+        """
+        if separator == "":
+            return list(range(start, end + 1))
+
+        lengths = list(map(len, text[start:end].split(separator)))
+        sep_len = len(separator)
+
+        # separator j is after the parts 0..j and j separators
+        positions = map(
+            add,
+            accumulate(lengths[:-1]),
+            range(start, start + sep_len * (len(lengths) - 1), sep_len),
+        )
+
+        bounds = [start]
+        bounds.extend(positions)
+        bounds.append(end)
+
+        # text starting with the separator: no empty first piece
+        if len(bounds) > 2 and bounds[1] == start:
+            del bounds[0]
+
+        return bounds
+
+    def _merge_pieces(self, text, bounds, first, last, chunks):
+        """
+        merge the pieces first..last - 1 in chunks of at most chunk_size chars,
+        with chunk_overlap
+
+        same result of TextSplitter._merge_splits (with "" as separator,
+        pieces shorter than chunk_size), but the pieces are contiguous:
+        the length of the pieces i..j - 1 is bounds[j] - bounds[i], so the
+        end of a chunk and the start of the next one are found by bisection
+        """
+        chunk_size = self._chunk_size
+        chunk_overlap = self._chunk_overlap
+
+        # the current chunk is the pieces first..k - 1
+        k = first + 1
+        while True:
+            # add the pieces while they fit
+            k = bisect_right(bounds, bounds[first] + chunk_size, k, last + 1) - 1
+
+            if k == last:
+                self._add_chunk(text, bounds[first], bounds[last], chunks)
+                return
+
+            self._add_chunk(text, bounds[first], bounds[k], chunks)
+
+            # drop pieces from the start until the rest is within chunk_overlap
+            # and the next piece fits
+            first = bisect_left(
+                bounds,
+                max(bounds[k] - chunk_overlap, bounds[k + 1] - chunk_size),
+                first,
+                k,
+            )
+            k += 1
+
+    def _add_chunk(self, text, start, end, chunks):
+        """
+        append text[start:end] (stripped, if not empty)
+        """
+        chunk = text[start:end]
+
+        if self._strip_whitespace:
+            chunk = chunk.strip()
+
+        if chunk != "":
+            chunks.append(chunk)
@@ -0,0 +1,157 @@
+"""
+Checkpoint manifest for batch loading
+
+A local JSON file recording, for each file loaded in a collection,
+the hash of its content, the num. of chunks and the state of the loading:
+    parsed: the file has been split in chunks
+    embedded: the embeddings of a batch have been computed
+    inserted: all the chunks have been inserted (file completed)
+
+The manifest is written when a file is parsed, every save_every batches
+inserted and when a file is completed, so that a batch load interrupted
+can be resumed after the last batch recorded (the batches inserted
+after it are deleted and inserted again, see the checkpoint mode).
+The embedded state is kept only in memory.
+"""
+
+import json
+import os
+
+from utils import get_console_logger
+from config import CHECKPOINT_SAVE_EVERY
+
+logger = get_console_logger()
+
+STATE_PARSED = "parsed"
+STATE_EMBEDDED = "embedded"
+STATE_INSERTED = "inserted"
+
+
+class IngestionManifest:
+    """
+    state of a batch load, persisted in a JSON file
+    """
+
+    def __init__(
+        self,
+        manifest_path: str,
+        collection_name: str,
+        save_every: int = CHECKPOINT_SAVE_EVERY,
+    ):
+        """
+        load the manifest if it exists, otherwise start an empty one
+
+        raise ValueError if the manifest refers to another collection
+        """
+        self.manifest_path = manifest_path
+        self.collection_name = collection_name
+        self.save_every = max(1, save_every)
+        self.files = {}
+
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+
+            if content.get("collection") != collection_name:
+                raise ValueError(
+                    f"Manifest {manifest_path} refers to collection "
+                    f"{content.get('collection')}, not {collection_name}"
+                )
+            self.files = content.get("files", {})
+
+            logger.info("Resuming from manifest %s", manifest_path)
+
+    def exists(self) -> bool:
+        """
+        True if there is a previous run for this collection
+
+        the file is written (see save) before the collection is created:
+        a run interrupted before parsing any file can be resumed too
+        """
+        return os.path.exists(self.manifest_path)
+
+    def save(self):
+        """
+        write the manifest (atomic replace, to survive a crash while writing)
+        """
+        tmp_path = self.manifest_path + ".tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"collection": self.collection_name, "files": self.files}, f, indent=2
+            )
+
+        os.replace(tmp_path, self.manifest_path)
+
+    def get(self, file_path: str) -> dict:
+        """
+        return the entry for the file (None if not present)
+        """
+        return self.files.get(file_path)
+
+    def is_completed(self, file_path: str, file_hash: str) -> bool:
+        """
+        True if the file, with the same content, has been fully inserted
+        """
+        entry = self.get(file_path)
+
+        return (
+            entry is not None
+            and entry["hash"] == file_hash
+            and entry["state"] == STATE_INSERTED
+        )
+
+    def batches_inserted(self, file_path: str, file_hash: str, num_chunks: int) -> int:
+        """
+        num. of batches of the file already inserted
+
+        0 if the file is new or has changed since the previous run
+        """
+        entry = self.get(file_path)
+
+        if entry is None or entry["hash"] != file_hash or entry["chunks"] != num_chunks:
+            return 0
+
+        return entry["batches_inserted"]
+
+    def mark_parsed(
+        self, file_path: str, file_hash: str, num_chunks: int, batch_size: int
+    ):
+        """
+        the file has been split in chunks
+
+        a file already partially inserted (same content) keeps its progress
+        """
+        batches_inserted = self.batches_inserted(file_path, file_hash, num_chunks)
+        if batches_inserted > 0:
+            # the batches must be the same of the previous run
+            batch_size = self.files[file_path]["batch_size"]
+
+        self.files[file_path] = {
+            "hash": file_hash,
+            "chunks": num_chunks,
+            "batch_size": batch_size,
+            "state": STATE_PARSED,
+            "batches_inserted": batches_inserted,
+        }
+        self.save()
+
+    def mark_embedded(self, file_path: str):
+        """
+        the embeddings of the next batch have been computed (not saved)
+        """
+        self.files[file_path]["state"] = STATE_EMBEDDED
+
+    def mark_batch_inserted(self, file_path: str, completed: bool):
+        """
+        the next batch has been inserted and committed
+
+        saved every save_every batches and when the file is completed
+        """
+        entry = self.files[file_path]
+
+        entry["batches_inserted"] += 1
+        entry["state"] = STATE_INSERTED if completed else STATE_PARSED
+
+        if completed or entry["batches_inserted"] % self.save_every == 0:
+            self.save()
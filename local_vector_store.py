@@ -0,0 +1,457 @@
+"""
+Local, in-memory stand-in for the Oracle DB
+
+to run the loading pipeline (chunk_index_utils + db_doc_loader_backend)
+without a DB, e.g. in the benchmarks.
+
+LocalVectorStore has the interface of OracleVS4DBLoading: the insert
+path is the real one (bulk_add_documents, quantization), only the
+SQL is replaced by operations on a LocalDatabase (with the document
+catalogs).
+use_local_database() patches the backend to use them.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+import db_doc_loader_backend
+from collection_admin import UNKNOWN_HASH
+from oraclevs_4_db_loading import OracleVS4DBLoading, DEFAULT_QUERY
+from vector_quantization import get_vector_format, quantize
+
+
+class LocalDatabase:
+    """
+    collections (list of rows), registry and vector indexes, in memory
+
+    insert_latency: sec. added for each row inserted, to simulate the DB
+    insert_calls: (latency, rows, chars of text) of every batch inserted
+    """
+
+    def __init__(self, insert_latency: float = 0.0):
+        self.insert_latency = insert_latency
+
+        # collection name -> list of rows (id, vector, metadata, text)
+        self.tables = {}
+        self.vector_formats = {}
+        self.registry = {}
+        self.indexes = {}
+        # collection name -> {doc_name: catalog entry}
+        self.catalogs = {}
+        self.commits = 0
+        self.insert_calls = []
+        self.lock = threading.Lock()
+
+
+class LocalCursor:
+    """
+    no-op cursor, the SQL is never executed
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def close(self):
+        """
+        nothing to release
+        """
+
+
+class LocalConnection:
+    """
+    connection to a LocalDatabase (used as context manager, as oracledb)
+    """
+
+    def __init__(self, database: LocalDatabase):
+        self.database = database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def cursor(self):
+        """
+        a no-op cursor
+        """
+        return LocalCursor()
+
+    def commit(self):
+        """
+        count the commits
+        """
+        with self.database.lock:
+            self.database.commits += 1
+
+    def rollback(self):
+        """
+        no transactions
+        """
+
+    def close(self):
+        """
+        nothing to release
+        """
+
+
+class LocalVectorStore(OracleVS4DBLoading):
+    """
+    OracleVS4DBLoading storing the collections in a LocalDatabase
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(
+        self,
+        client: LocalConnection,
+        embedding_function,
+        table_name: str,
+        distance_strategy: DistanceStrategy = DistanceStrategy.EUCLIDEAN_DISTANCE,
+        query: str = DEFAULT_QUERY,
+        params: dict = None,
+        vector_format: str = None,
+        embedding_dim: int = None,
+    ):
+        # OracleVS.__init__ is not called: it needs a DB
+        self.client = client
+        self.embedding_function = embedding_function
+        self.table_name = table_name
+        self.distance_strategy = distance_strategy
+        self.query = query
+        self.params = params
+
+        database = client.database
+        with database.lock:
+            if table_name not in database.tables:
+                database.tables[table_name] = []
+                database.vector_formats[table_name] = (
+                    vector_format or get_vector_format()
+                )
+            self.vector_format = database.vector_formats[table_name]
+
+        # as OracleVS4DBLoading, to check the model
+        if embedding_dim is None:
+            embedding_dim = len(embedding_function.embed_query(query))
+        self.embedding_dim = embedding_dim
+
+    def _insert_batch(self, cursor, docs, embeddings, ids=None):
+        """
+        store a batch of documents, with their embeddings
+        """
+        database = self.client.database
+        time_start = time.perf_counter()
+
+        vectors = quantize(embeddings, self.vector_format)
+
+        if ids is None:
+            ids = [uuid.uuid4().bytes for _ in docs]
+
+        rows = [
+            (chunk_id, vector, dict(doc.metadata), doc.page_content)
+            for chunk_id, doc, vector in zip(ids, docs, vectors)
+        ]
+
+        if database.insert_latency > 0:
+            time.sleep(database.insert_latency * len(rows))
+
+        with database.lock:
+            database.tables[self.table_name].extend(rows)
+            database.insert_calls.append(
+                (
+                    time.perf_counter() - time_start,
+                    len(rows),
+                    sum(len(doc.page_content) for doc in docs),
+                )
+            )
+
+    def add_documents(self, documents, **_kwargs):
+        """
+        no LangChain insert path: same as bulk_add_documents
+        """
+        self.bulk_add_documents(documents)
+
+        return []
+
+    @classmethod
+    def list_collections(cls, connection):
+        """
+        names of the collections
+        """
+        with connection.database.lock:
+            return sorted(connection.database.tables)
+
+    @classmethod
+    def list_books_in_collection(cls, connection, collection_name):
+        """
+        names of the documents in the collection (catalog, or chunks)
+        """
+        with connection.database.lock:
+            catalog = connection.database.catalogs.get(collection_name)
+            if catalog is not None:
+                return sorted(
+                    doc_name
+                    for doc_name, entry in catalog.items()
+                    if entry["doc_hash"] is not None
+                )
+
+            rows = connection.database.tables.get(collection_name, [])
+
+            return sorted({row[2].get("source") for row in rows})
+
+    @classmethod
+    def get_collection_vector_format(cls, connection, collection_name):
+        """
+        vector format of the collection, None if it doesn't exist
+        """
+        with connection.database.lock:
+            return connection.database.vector_formats.get(collection_name)
+
+    @classmethod
+    def register_collection(
+        cls,
+        connection,
+        collection_name,
+        embed_model_id,
+        dimensions,
+        projection=None,
+    ):
+        """
+        record model, dimensions and projection of the collection
+        """
+        with connection.database.lock:
+            connection.database.registry[collection_name.upper()] = {
+                "embed_model": embed_model_id,
+                "dimensions": dimensions,
+                "projection": projection,
+            }
+
+    @classmethod
+    def get_collection_info(cls, connection, collection_name):
+        """
+        model, dimensions and projection recorded, None if not registered
+        """
+        with connection.database.lock:
+            return connection.database.registry.get(collection_name.upper())
+
+    @classmethod
+    def delete_documents(cls, connection, collection_name, doc_names, _batch_size=0):
+        """
+        delete the chunks of the documents (no batches in memory)
+
+        returns a dict doc_name -> num. of chunks deleted
+        """
+        names = set(doc_names)
+        deleted = Counter({doc_name: 0 for doc_name in doc_names})
+
+        with connection.database.lock:
+            rows = connection.database.tables[collection_name]
+
+            kept = []
+            for row in rows:
+                if row[2].get("source") in names:
+                    deleted[row[2]["source"]] += 1
+                else:
+                    kept.append(row)
+            rows[:] = kept
+
+            catalog = connection.database.catalogs.get(collection_name, {})
+            for doc_name in names:
+                catalog.pop(doc_name, None)
+
+        return dict(deleted)
+
+    @classmethod
+    def get_chunk_hashes(cls, connection, collection_name, doc_name):
+        """
+        (id, chunk_hash, doc_hash) of the chunks of the document
+        """
+        with connection.database.lock:
+            return [
+                (row[0], row[2].get("chunk_hash"), row[2].get("doc_hash"))
+                for row in connection.database.tables[collection_name]
+                if row[2].get("source") == doc_name
+            ]
+
+    @classmethod
+    def delete_chunks(cls, connection, collection_name, ids):
+        """
+        delete the chunks with the ids
+        """
+        ids = set(ids)
+
+        with connection.database.lock:
+            rows = connection.database.tables[collection_name]
+            rows[:] = [row for row in rows if row[0] not in ids]
+
+    @classmethod
+    def update_chunks_metadata(cls, connection, collection_name, ids, metadatas):
+        """
+        replace the metadata of the chunks with the ids
+        """
+        new_metadatas = dict(zip(ids, metadatas))
+
+        with connection.database.lock:
+            rows = connection.database.tables[collection_name]
+            rows[:] = [
+                (row[0], row[1], dict(new_metadatas.get(row[0], row[2])), row[3])
+                for row in rows
+            ]
+
+    @classmethod
+    def list_vector_indexes(cls, connection, collection_name):
+        """
+        the vector index of the collection, as (index_name, index_subtype, status)
+        """
+        with connection.database.lock:
+            index = connection.database.indexes.get(collection_name)
+
+        return [] if index is None else [index]
+
+    @classmethod
+    def create_vector_index(
+        cls, connection, collection_name, index_type="HNSW", **_kwargs
+    ):
+        """
+        record the index (nothing to build, the parameters are ignored)
+        """
+        index_name = f"{collection_name}_{index_type}_IDX".upper()
+
+        with connection.database.lock:
+            connection.database.indexes[collection_name] = (
+                index_name,
+                index_type,
+                "VALID",
+            )
+
+        return {"index_name": index_name, "build_time": 0.0, "size_bytes": None}
+
+    @classmethod
+    def drop_collection(cls, connection, collection_name):
+        """
+        drop the collection, with its registry entry, index and catalog
+        """
+        with connection.database.lock:
+            connection.database.tables.pop(collection_name, None)
+            connection.database.vector_formats.pop(collection_name, None)
+            connection.database.registry.pop(collection_name.upper(), None)
+            connection.database.indexes.pop(collection_name, None)
+            connection.database.catalogs.pop(collection_name, None)
+
+    @classmethod
+    def create_catalog(cls, connection, collection_name):
+        """
+        create the catalog, filled from the chunks
+
+        returns False if it already exists
+        """
+        with connection.database.lock:
+            if collection_name in connection.database.catalogs:
+                return False
+            connection.database.catalogs[collection_name] = {}
+
+        cls.rebuild_catalog(connection, collection_name)
+
+        return True
+
+    @classmethod
+    def rebuild_catalog(cls, connection, collection_name):
+        """
+        fill the catalog from the chunks, returns the num. of documents
+        """
+        info = cls.get_collection_info(connection, collection_name)
+        embed_model = info["embed_model"] if info is not None else None
+
+        with connection.database.lock:
+            catalog = {}
+            for _, _, metadata, _ in connection.database.tables[collection_name]:
+                doc_name = metadata.get("source")
+                if doc_name is None:
+                    continue
+                entry = catalog.setdefault(
+                    doc_name,
+                    {
+                        "doc_name": doc_name,
+                        "doc_hash": metadata.get("doc_hash", UNKNOWN_HASH),
+                        "chunk_count": 0,
+                        "loaded_at": datetime.now(),
+                        "embed_model": embed_model,
+                    },
+                )
+                entry["chunk_count"] += 1
+
+            connection.database.catalogs[collection_name] = catalog
+
+        return len(catalog)
+
+    @classmethod
+    def update_catalog(cls, connection, collection_name, entries, increment=False):
+        """
+        record (doc_name, doc_hash, chunk_count, embed_model) entries
+        """
+        with connection.database.lock:
+            catalog = connection.database.catalogs[collection_name]
+
+            for doc_name, doc_hash, chunk_count, embed_model in entries:
+                if increment and doc_name in catalog:
+                    chunk_count += catalog[doc_name]["chunk_count"]
+
+                catalog[doc_name] = {
+                    "doc_name": doc_name,
+                    "doc_hash": doc_hash,
+                    "chunk_count": chunk_count,
+                    "loaded_at": datetime.now(),
+                    "embed_model": embed_model,
+                }
+
+    @classmethod
+    def delete_from_catalog(cls, connection, collection_name, doc_names):
+        """
+        remove the documents from the catalog
+        """
+        with connection.database.lock:
+            catalog = connection.database.catalogs.get(collection_name, {})
+            for doc_name in doc_names:
+                catalog.pop(doc_name, None)
+
+    @classmethod
+    def get_catalog(cls, connection, collection_name):
+        """
+        entries of the catalog, as dicts, by document name
+        """
+        with connection.database.lock:
+            catalog = connection.database.catalogs[collection_name]
+
+            return [dict(catalog[doc_name]) for doc_name in sorted(catalog)]
+
+    @classmethod
+    def get_document_hash(cls, connection, collection_name, doc_name):
+        """
+        (found, doc_hash) of the document
+        """
+        with connection.database.lock:
+            catalog = connection.database.catalogs.get(collection_name)
+            if catalog is not None:
+                entry = catalog.get(doc_name)
+                return (True, entry["doc_hash"]) if entry else (False, None)
+
+            for _, _, metadata, _ in connection.database.tables[collection_name]:
+                if metadata.get("source") == doc_name:
+                    return True, metadata.get("doc_hash", UNKNOWN_HASH)
+
+        return False, None
+
+
+def use_local_database(database: LocalDatabase):
+    """
+    patch db_doc_loader_backend to use database instead of the Oracle DB
+    """
+    db_doc_loader_backend.OracleVS4DBLoading = LocalVectorStore
+    db_doc_loader_backend.get_db_connection = lambda: LocalConnection(database)
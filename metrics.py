@@ -0,0 +1,354 @@
+"""
+Metrics of the loading: timers and counters per stage
+
+stages (parse, split, summary, embed, insert, commit, ...) record the
+latency of every call, the num. of items (chunks, texts, rows) and bytes.
+Files record their own stats. Everything is kept in a process wide
+registry (METRICS), merged from the worker processes, and exported as
+a JSON run report or in the Prometheus text format.
+
+Usage:
+    with METRICS.stage("embed", items=len(texts)):
+        ...
+
+    with METRICS.stage("parse") as call:
+        pages = loader.load()
+        call["items"] = len(pages)
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from utils import get_console_logger
+
+logger = get_console_logger()
+
+# max num. of latencies kept for each stage (for the percentiles)
+MAX_SAMPLES = 100000
+
+PROMETHEUS_PREFIX = "doc_loader"
+
+
+def percentile(values, perc):
+    """
+    percentile (0-100) of values, by nearest rank (None if empty)
+    """
+    if len(values) == 0:
+        return None
+
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(perc / 100 * (len(ordered) - 1))))
+
+    return ordered[index]
+
+
+class MetricsRegistry:
+    """
+    thread safe registry of stages, counters and files
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # notified when a stage starts and ends (e.g. the profiler)
+        self.listeners = []
+        self.reset()
+
+    def add_listener(self, listener):
+        """
+        listener must have on_stage_enter(stage) and on_stage_exit(stage),
+        called in the thread running the stage
+        """
+        with self._lock:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """
+        stop notifying listener
+        """
+        with self._lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def reset(self):
+        """
+        clear everything, a new run starts
+        """
+        with self._lock:
+            self.start_time = time.time()
+            # stage -> {"calls", "seconds", "items", "bytes", "latencies"}
+            self.stages = defaultdict(
+                lambda: {
+                    "calls": 0,
+                    "seconds": 0.0,
+                    "items": 0,
+                    "bytes": 0,
+                    "latencies": [],
+                }
+            )
+            self.counters = defaultdict(float)
+            # file -> {"chunks", "bytes", "seconds"}
+            self.files = {}
+
+    def record(self, stage: str, seconds: float, items: int = 0, n_bytes: int = 0):
+        """
+        record a call of stage
+        """
+        with self._lock:
+            stats = self.stages[stage]
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["items"] += items
+            stats["bytes"] += n_bytes
+            if len(stats["latencies"]) < MAX_SAMPLES:
+                stats["latencies"].append(seconds)
+
+    @contextmanager
+    def stage(self, stage: str, items: int = 0, n_bytes: int = 0):
+        """
+        time the block as a call of stage
+
+        yields a dict: items and bytes can be set inside the block,
+        when known only at the end
+        """
+        call = {"items": items, "bytes": n_bytes}
+        listeners = list(self.listeners)
+
+        for listener in listeners:
+            listener.on_stage_enter(stage)
+        time_start = time.perf_counter()
+        try:
+            yield call
+        finally:
+            self.record(
+                stage, time.perf_counter() - time_start, call["items"], call["bytes"]
+            )
+            for listener in reversed(listeners):
+                listener.on_stage_exit(stage)
+
+    def increment(self, counter: str, value: float = 1):
+        """
+        add value to counter
+        """
+        with self._lock:
+            self.counters[counter] += value
+
+    def record_file(self, file_path: str, chunks: int, n_bytes: int, seconds: float):
+        """
+        record the stats of a file parsed and split
+        """
+        with self._lock:
+            self.files[file_path] = {
+                "chunks": chunks,
+                "bytes": n_bytes,
+                "seconds": seconds,
+            }
+
+    def snapshot(self) -> dict:
+        """
+        raw content, to be merged in another registry (e.g. from a worker)
+        """
+        with self._lock:
+            return {
+                "stages": {
+                    name: dict(stats, latencies=list(stats["latencies"]))
+                    for name, stats in self.stages.items()
+                },
+                "counters": dict(self.counters),
+                "files": dict(self.files),
+            }
+
+    def merge(self, snapshot: dict):
+        """
+        add the content of a snapshot
+        """
+        with self._lock:
+            for name, other in snapshot["stages"].items():
+                stats = self.stages[name]
+                for key in ["calls", "seconds", "items", "bytes"]:
+                    stats[key] += other[key]
+                free = MAX_SAMPLES - len(stats["latencies"])
+                stats["latencies"] += other["latencies"][:free]
+
+            for counter, value in snapshot["counters"].items():
+                self.counters[counter] += value
+
+            self.files.update(snapshot["files"])
+
+    def get_report(self) -> dict:
+        """
+        the run report: totals, rates and latency percentiles per stage
+        """
+        with self._lock:
+            stages = {}
+            for name, stats in self.stages.items():
+                seconds = stats["seconds"]
+                latencies = stats["latencies"]
+
+                stages[name] = {
+                    "calls": stats["calls"],
+                    "seconds": seconds,
+                    "items": stats["items"],
+                    "bytes": stats["bytes"],
+                    "items_per_sec": stats["items"] / seconds if seconds > 0 else None,
+                    "mb_per_sec": (
+                        stats["bytes"] / 2**20 / seconds if seconds > 0 else None
+                    ),
+                    "p50": percentile(latencies, 50),
+                    "p90": percentile(latencies, 90),
+                    "p99": percentile(latencies, 99),
+                    "max": max(latencies) if latencies else None,
+                }
+
+            return {
+                "start_time": self.start_time,
+                "wall_time": time.time() - self.start_time,
+                "stages": stages,
+                "counters": dict(self.counters),
+                "files": dict(self.files),
+            }
+
+    def write_json(self, path: str):
+        """
+        write the run report as JSON
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.get_report(), f, indent=2)
+
+        logger.info("Metrics report written in %s", path)
+
+    def to_prometheus(self) -> str:
+        """
+        the metrics in the Prometheus text format
+        """
+        report = self.get_report()
+        lines = []
+
+        def add_metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} {metric_type}")
+            for labels, value, *suffix in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(
+                    f"{PROMETHEUS_PREFIX}_{name}{''.join(suffix)}{label_text} {value}"
+                )
+
+        stages = report["stages"]
+
+        add_metric(
+            "stage_calls_total",
+            "counter",
+            "Num. of calls of the stage.",
+            [({"stage": s}, v["calls"]) for s, v in stages.items()],
+        )
+        add_metric(
+            "stage_seconds_total",
+            "counter",
+            "Time spent in the stage.",
+            [({"stage": s}, v["seconds"]) for s, v in stages.items()],
+        )
+        add_metric(
+            "stage_items_total",
+            "counter",
+            "Items (chunks, texts, rows) processed by the stage.",
+            [({"stage": s}, v["items"]) for s, v in stages.items()],
+        )
+        add_metric(
+            "stage_bytes_total",
+            "counter",
+            "Bytes processed by the stage.",
+            [({"stage": s}, v["bytes"]) for s, v in stages.items()],
+        )
+        add_metric(
+            "stage_latency_seconds",
+            "summary",
+            "Latency of the calls of the stage.",
+            [
+                ({"stage": s, "quantile": q}, v[key])
+                for s, v in stages.items()
+                for q, key in [("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99")]
+                if v[key] is not None
+            ]
+            + [({"stage": s}, v["seconds"], "_sum") for s, v in stages.items()]
+            + [({"stage": s}, v["calls"], "_count") for s, v in stages.items()],
+        )
+        add_metric(
+            "counter_total",
+            "counter",
+            "Counters of the loading.",
+            [({"name": c}, v) for c, v in report["counters"].items()],
+        )
+        add_metric(
+            "run_wall_seconds",
+            "gauge",
+            "Duration of the run.",
+            [({}, report["wall_time"])],
+        )
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        write the metrics in the Prometheus text format
+        (e.g. for the node exporter textfile collector)
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+        logger.info("Prometheus metrics written in %s", path)
+
+    def log_report(self):
+        """
+        print a table with the stats of the stages
+        """
+        report = self.get_report()
+
+        def fmt_ms(value):
+            return "n.a." if value is None else f"{1000 * value:.1f}"
+
+        logger.info("")
+        logger.info(
+            "%-10s %8s %10s %10s %10s %10s %10s",
+            "stage",
+            "calls",
+            "items",
+            "sec.",
+            "items/s",
+            "p50 ms",
+            "p99 ms",
+        )
+        for name, stats in sorted(report["stages"].items()):
+            logger.info(
+                "%-10s %8d %10d %10.2f %10s %10s %10s",
+                name,
+                stats["calls"],
+                stats["items"],
+                stats["seconds"],
+                (
+                    "n.a."
+                    if stats["items_per_sec"] is None
+                    else f"{stats['items_per_sec']:.1f}"
+                ),
+                fmt_ms(stats["p50"]),
+                fmt_ms(stats["p99"]),
+            )
+        logger.info("")
+
+
+# the registry of the process
+METRICS = MetricsRegistry()
+
+
+def write_metrics(json_path=None, prometheus_path=None):
+    """
+    print the report and export it, if paths are given
+    """
+    METRICS.log_report()
+
+    if json_path:
+        METRICS.write_json(json_path)
+    if prometheus_path:
+        METRICS.write_prometheus(prometheus_path)
@@ -3,139 +3,368 @@ Extensions to Oracle VS for the db_loading utility
 """
 
 import os
-from collections import Counter
-from oracledb import Connection, DB_TYPE_VECTOR
+import re
+import json
+import uuid
+from oracledb import Connection, DB_TYPE_VECTOR, DB_TYPE_RAW, DB_TYPE_LONG
 
+from langchain_core.documents import Document
 from langchain_community.vectorstores.oraclevs import OracleVS
+from langchain_community.vectorstores.utils import DistanceStrategy
 
+import collection_admin
 from utils import get_console_logger, debug_bool
+from metrics import METRICS
+from vector_quantization import get_vector_format, get_column_dimensions, quantize
+from config import BULK_INSERT_BATCH_SIZE, BULK_COMMIT_EVERY
 
 logger = get_console_logger()
 
 VERBOSE = debug_bool(os.environ.get("DEBUG", "False"))
 
+# query embedded by OracleVS to get the dimensions of the vectors
+DEFAULT_QUERY = "What is a Oracle database"
 
-class OracleVS4DBLoading(OracleVS):
+
+def get_chunk_ids(doc_name: str, n_chunks: int) -> list:
     """
-    This class extends OracleVS and has been defined to add utility methods
+    deterministic ids (RAW(16)) of the chunks of a document, from the
+    name of the document and the index of the chunk: a chunk inserted
+    again gets the same id (used to resume a load, see the checkpoint mode)
     """
+    return [
+        uuid.uuid5(uuid.NAMESPACE_URL, f"chunk:{doc_name}:{i}").bytes
+        for i in range(n_chunks)
+    ]
 
-    @classmethod
-    def list_collections(cls, connection: Connection):
-        """
-        return a list of all collections (tables) with a type vector
-        in the schema in use
-        """
 
-        query = """
-                SELECT DISTINCT table_name
-                FROM user_tab_columns
-                WHERE data_type = 'VECTOR'
-                ORDER by table_name ASC
-                """
+def get_filter_clause(metadata_filter: dict):
+    """
+    WHERE clause (and binds) for a metadata filter as in OracleVS:
+    {key: list of values}, the value of each key must be in its list
 
-        with connection.cursor() as cursor:
-            cursor.execute(query)
+    the keys become JSON paths: only letters, digits and _
+    """
+    if not metadata_filter:
+        return "", {}
 
-            rows = cursor.fetchall()
+    conditions = []
+    binds = {}
 
-            list_collections = []
-            for row in rows:
-                list_collections.append(row[0])
+    for i, (key, values) in enumerate(metadata_filter.items()):
+        if re.fullmatch(r"\w+", key) is None:
+            raise ValueError(f"Invalid metadata key in filter: {key}")
 
-        return list_collections
+        if isinstance(values, (str, int, float)):
+            values = [values]
 
-    @classmethod
-    def list_books_in_collection(cls, connection: Connection, collection_name: str):
-        """ "
-        get the list of books name in the collection
-        taken from metadata
-        expect metadata contains source
+        names = [f"f{i}_{j}" for j in range(len(values))]
+        binds.update(zip(names, values))
+
+        if len(names) == 0:
+            conditions.append("1 = 0")
+        else:
+            conditions.append(
+                f"json_value(metadata, '$.{key}') IN "
+                f"({', '.join(':' + name for name in names)})"
+            )
+
+    return "WHERE " + " AND ".join(conditions), binds
+
+
+class OracleVS4DBLoading(OracleVS):
+    """
+    This class extends OracleVS and has been defined to add utility methods
+    (the SQL ones are in collection_admin)
+
+    new collections are created with the vector format set by EMBEDDINGS_BITS,
+    for existing ones the format is read from the DB. In BINARY collections
+    the query vectors are quantized too and the distance is HAMMING
+    """
+
+    def __init__(
+        self,
+        client: Connection,
+        embedding_function,
+        table_name: str,
+        distance_strategy: DistanceStrategy = DistanceStrategy.EUCLIDEAN_DISTANCE,
+        query: str = DEFAULT_QUERY,
+        params: dict = None,
+        vector_format: str = None,
+        embedding_dim: int = None,
+    ):
         """
-        query = f"""
-                SELECT DISTINCT json_value(METADATA, '$.source') AS books
-                FROM {collection_name}
-                ORDER by books ASC
-                """
-        with connection.cursor() as cursor:
-            cursor.execute(query)
+        vector_format: FLOAT64, FLOAT32, INT8, BINARY (default from EMBEDDINGS_BITS)
+        embedding_dim: dimensions of the vectors, if known (otherwise the
+        query is embedded to get them)
+        """
+        if embedding_dim is None:
+            embedding_dim = len(embedding_function.embed_query(query))
+        self.embedding_dim = embedding_dim
+
+        existing_format = self.get_collection_vector_format(client, table_name)
+
+        if existing_format is None:
+            vector_format = vector_format or get_vector_format()
+
+            self.create_collection(client, table_name, embedding_dim, vector_format)
+        else:
+            if vector_format is not None and vector_format != existing_format:
+                logger.warning(
+                    "Collection %s has vectors %s, ignoring %s",
+                    table_name,
+                    existing_format,
+                    vector_format,
+                )
+            vector_format = existing_format
+
+        self.vector_format = vector_format
+
+        # the table exists now, OracleVS doesn't create it
+        super().__init__(
+            client=client,
+            embedding_function=embedding_function,
+            table_name=table_name,
+            distance_strategy=distance_strategy,
+            query=query,
+            params=params,
+        )
+
+    def get_embedding_dimension(self) -> int:
+        """
+        dimensions of the vectors (computed once, in __init__)
+        """
+        return self.embedding_dim
 
-            rows = cursor.fetchall()
+    # pylint: disable=redefined-builtin
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding, k: int = 4, filter: dict = None, **kwargs
+    ):
+        """
+        as OracleVS, for BINARY collections the query vector is quantized
+        and the distance is HAMMING, divided by the num. of bits (0 to 1,
+        as the COSINE distance used for the relevance scores).
+        The filter is applied in the query, before the first k are taken
+        """
+        if self.vector_format != "BINARY":
+            return super().similarity_search_by_vector_with_relevance_scores(
+                embedding, k, filter, **kwargs
+            )
 
-            list_books = []
-            for row in rows:
-                list_books.append(row[0])
+        where, binds = get_filter_clause(filter)
 
-        return list_books
+        query = f"""
+        SELECT id, text, metadata,
+          vector_distance(embedding, :embedding, HAMMING) / :n_bits as distance
+        FROM {self.table_name}
+        {where}
+        ORDER BY distance
+        FETCH APPROX FIRST {k} ROWS ONLY
+        """
 
-    @classmethod
-    def analyze_collection(cls, connection: Connection, collection_name: str) -> str:
+        with self.client.cursor() as cursor:
+            cursor.setinputsizes(embedding=DB_TYPE_VECTOR)
+            cursor.execute(
+                query,
+                embedding=quantize([embedding], "BINARY")[0],
+                n_bits=len(embedding),
+                **binds,
+            )
+            results = cursor.fetchall()
+
+        docs_and_scores = []
+        for _, text, metadata, distance in results:
+            doc = Document(
+                page_content=self._get_clob_value(text),
+                metadata=json.loads(self._get_clob_value(metadata) or "{}"),
+            )
+            docs_and_scores.append((doc, distance))
+
+        return docs_and_scores
+
+    def similarity_search_by_vector_returning_embeddings(
+        self, embedding, k: int, filter: dict = None, **kwargs
+    ):
         """
-        analyze completely a collection and return a text containing a short report
+        used by the MMR search: not available for BINARY collections
+        (the stored vectors are bits, not comparable with the query)
         """
-        sql = f"SELECT * FROM {collection_name}"
+        if self.vector_format == "BINARY":
+            raise NotImplementedError(
+                f"Collection {self.table_name} has BINARY vectors: "
+                "MMR search is not supported"
+            )
 
-        with connection.cursor() as cur:
-            cur.execute(sql)
-
-            descs = cur.description  # column metadata
-
-            records = 0
-            dim_counter = Counter()
-            format_counter = Counter()
-            # here we analyse the vector columns
-            # we compute the number of records
-            # and the number of different dimensions and formats
-            for row in cur:
-                records += 1
-                for idx, _ in enumerate(row):
-                    info = descs[idx]
-                    if info.type_code == DB_TYPE_VECTOR:
-                        dims = info.vector_dimensions
-                        fmt = info.vector_format
-                        dim_counter[dims] += 1
-                        format_counter[fmt] += 1
-
-        # output
-        report = f"Analyzed collection: {collection_name}\n"
-        report += f"Total chunks fetched: {records}\n"
-        report += f"Vector dimensions seen (count): {dict(dim_counter)}\n"
-        report += f"Vector formats seen (count): {dict(format_counter)}"
-
-        return report
+        return super().similarity_search_by_vector_returning_embeddings(
+            embedding, k, filter, **kwargs
+        )
 
     @classmethod
-    def delete_documents(
-        cls, connection: Connection, collection_name: str, doc_names: list
+    def create_collection(
+        cls,
+        connection: Connection,
+        collection_name: str,
+        embedding_dim: int,
+        vector_format: str,
     ):
         """
-        doc_names: list of names of docs to drop
+        create the table for a collection (same columns as OracleVS),
+        with vectors stored in vector_format
         """
-        for doc_name in doc_names:
-            sql = f"""
-                  DELETE FROM {collection_name}
-                  WHERE json_value(METADATA, '$.source') = :doc
-                  """
+        dimensions = get_column_dimensions(embedding_dim, vector_format)
 
-            if VERBOSE:
-                logger.info("Drop %s", doc_name)
-                logger.info(sql)
+        ddl = f"""
+              CREATE TABLE {collection_name} (
+                  id RAW(16) DEFAULT SYS_GUID() PRIMARY KEY,
+                  text CLOB,
+                  metadata CLOB,
+                  embedding VECTOR({dimensions}, {vector_format})
+              )
+              """
 
-            cur = connection.cursor()
+        with connection.cursor() as cur:
+            cur.execute(ddl)
 
-            cur.execute(sql, [doc_name])
+        logger.info(
+            "Created collection %s, vectors %s (%s dims.)",
+            collection_name,
+            vector_format,
+            dimensions,
+        )
 
-            cur.close()
+    def _insert_batch(self, cursor, docs, embeddings, ids=None):
+        """
+        insert a batch of documents, with their embeddings, in one round trip
 
-        connection.commit()
+        ids: ids of the rows (default: random)
+        """
+        # explicit bind types, so that the driver doesn't have to infer them
+        # CLOB columns (text, metadata) are bound as LONG: the values are sent
+        # inline, without creating temporary LOBs
+        cursor.setinputsizes(DB_TYPE_RAW, DB_TYPE_VECTOR, DB_TYPE_LONG, DB_TYPE_LONG)
+
+        # quantized client side for INT8 and BINARY
+        vectors = quantize(embeddings, self.vector_format)
+
+        if ids is None:
+            ids = [uuid.uuid4().bytes for _ in docs]
+
+        rows = [
+            (
+                chunk_id,
+                vector,
+                json.dumps(doc.metadata),
+                doc.page_content,
+            )
+            for chunk_id, doc, vector in zip(ids, docs, vectors)
+        ]
+
+        with METRICS.stage(
+            "insert",
+            items=len(rows),
+            n_bytes=sum(len(doc.page_content) for doc in docs),
+        ):
+            cursor.executemany(
+                f"INSERT INTO {self.table_name} (id, embedding, metadata, text) "
+                "VALUES (:1, :2, :3, :4)",
+                rows,
+            )
+
+    def insert_embedded_documents(
+        self, docs, embeddings, ids=None, before_commit=None
+    ) -> int:
+        """
+        insert docs with embeddings already computed, and commit
 
-    @classmethod
-    def drop_collection(cls, connection: Connection, collection_name: str):
+        docs: LangChain list of Documents
+        embeddings: list of vectors, one for each doc
+        ids: ids of the rows (default: random)
+        before_commit: called before the commit, to write in the same
+        transaction (e.g. the document catalog)
         """
-        drop a collection
+        with self.client.cursor() as cursor:
+            self._insert_batch(cursor, docs, embeddings, ids)
+
+        if before_commit is not None:
+            before_commit()
+
+        with METRICS.stage("commit"):
+            self.client.commit()
+
+        return len(docs)
+
+    def bulk_add_documents(
+        self,
+        docs,
+        batch_size: int = BULK_INSERT_BATCH_SIZE,
+        commit_every: int = BULK_COMMIT_EVERY,
+        before_commit=None,
+    ) -> int:
         """
-        sql = f"DROP TABLE {collection_name}"
+        embed and insert documents in batches, using array binding
 
-        cur = connection.cursor()
+        docs: LangChain list of Documents
+        batch_size: num. of docs embedded and inserted with one executemany
+        commit_every: commit after this num. of batches
+        before_commit: called before every commit as
+            before_commit(docs_inserted, is_last), docs_inserted the docs
+            committed with it (docs[:n]), to write in the same transaction
+            (e.g. the document catalog: pending until the last commit)
 
-        cur.execute(sql)
+        returns the num. of docs inserted
+        """
+        n_batches = 0
+
+        with self.client.cursor() as cursor:
+            for i in range(0, len(docs), batch_size):
+                batch = docs[i : i + batch_size]
+
+                embeddings = self.embedding_function.embed_documents(
+                    [doc.page_content for doc in batch]
+                )
+                self._insert_batch(cursor, batch, embeddings)
+
+                n_batches += 1
+                if n_batches % commit_every == 0 and i + batch_size < len(docs):
+                    if before_commit is not None:
+                        before_commit(docs[: i + batch_size], False)
+
+                    with METRICS.stage("commit"):
+                        self.client.commit()
+
+                if VERBOSE:
+                    logger.info("Inserted %s docs...", min(i + batch_size, len(docs)))
+
+        if before_commit is not None:
+            before_commit(docs, True)
+
+        with METRICS.stage("commit"):
+            self.client.commit()
+
+        return len(docs)
+
+    # plain SQL, in collection_admin (no LangChain needed)
+    get_collection_vector_format = staticmethod(
+        collection_admin.get_collection_vector_format
+    )
+    list_collections = staticmethod(collection_admin.list_collections)
+    list_books_in_collection = staticmethod(collection_admin.list_books_in_collection)
+    analyze_collection = staticmethod(collection_admin.analyze_collection)
+    delete_documents = staticmethod(collection_admin.delete_documents)
+    get_chunk_hashes = staticmethod(collection_admin.get_chunk_hashes)
+    delete_chunks = staticmethod(collection_admin.delete_chunks)
+    update_chunks_metadata = staticmethod(collection_admin.update_chunks_metadata)
+    create_vector_index = staticmethod(collection_admin.create_vector_index)
+    get_vector_index_size = staticmethod(collection_admin.get_vector_index_size)
+    list_vector_indexes = staticmethod(collection_admin.list_vector_indexes)
+    drop_vector_index = staticmethod(collection_admin.drop_vector_index)
+    create_registry = staticmethod(collection_admin.create_registry)
+    register_collection = staticmethod(collection_admin.register_collection)
+    get_collection_info = staticmethod(collection_admin.get_collection_info)
+    drop_collection = staticmethod(collection_admin.drop_collection)
+    create_catalog = staticmethod(collection_admin.create_catalog)
+    rebuild_catalog = staticmethod(collection_admin.rebuild_catalog)
+    update_catalog = staticmethod(collection_admin.update_catalog)
+    delete_from_catalog = staticmethod(collection_admin.delete_from_catalog)
+    get_catalog = staticmethod(collection_admin.get_catalog)
+    get_document_hash = staticmethod(collection_admin.get_document_hash)
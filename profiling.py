@@ -0,0 +1,336 @@
+"""
+Profiling of the loading, split by pipeline stage
+
+two modes:
+    * sample: a thread samples the stacks of all the threads every
+      interval (default 10 ms). Low overhead, can be left on for a
+      production batch. Each sample is attributed to the stage (see
+      metrics) running in the thread. Output: collapsed stacks
+      (samples.folded, the stage is the root frame), for speedscope
+      or flamegraph.pl
+    * cprofile: deterministic profile, one cProfile per stage (only
+      the thread that started the profiling, higher overhead).
+      Output: <stage>.pstats (pstats, snakeviz) and profile_summary.txt
+
+worker processes (--workers) profile themselves and write their files
+with the prefix worker_<pid>_
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from metrics import METRICS
+from utils import get_console_logger
+
+logger = get_console_logger()
+
+PROFILE_MODES = ["sample", "cprofile"]
+
+# sampling interval (sec.)
+DEFAULT_INTERVAL = 0.01
+
+# time outside of any stage
+NO_STAGE = "no_stage"
+
+# to pass the settings to the worker processes
+ENV_PROFILE_DIR = "DOC_LOADER_PROFILE_DIR"
+ENV_PROFILE_MODE = "DOC_LOADER_PROFILE_MODE"
+
+# max frames kept for each sample
+MAX_STACK_DEPTH = 128
+
+# num. of functions in the text summary of each stage
+SUMMARY_LINES = 25
+
+
+def frame_name(frame):
+    """
+    name of a frame in the collapsed stacks: function (file:line)
+    """
+    code = frame.f_code
+
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class StageProfiler:
+    """
+    profiler attributing the time to the stages of the loading
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        mode: str = "sample",
+        interval: float = DEFAULT_INTERVAL,
+        prefix: str = "",
+    ):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Profile mode must be one of {PROFILE_MODES}")
+
+        self.out_dir = out_dir
+        self.mode = mode
+        self.interval = interval
+        self.prefix = prefix
+
+        # thread id -> stack of the stages running
+        self._stages = defaultdict(list)
+        self._lock = threading.Lock()
+
+        # sample mode
+        self._samples = Counter()
+        self._n_samples = 0
+        self._stop_event = threading.Event()
+        self._sampler = None
+
+        # cprofile mode: one profile per stage, for the thread that started
+        self._thread_id = None
+        self._profiles = {}
+        self._active = []
+
+    def start(self):
+        """
+        start profiling
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._thread_id = threading.get_ident()
+
+        if self.mode == "sample":
+            self._sampler = threading.Thread(
+                target=self._sample_loop, name="stage-profiler", daemon=True
+            )
+            self._sampler.start()
+        else:
+            self._switch_to(NO_STAGE)
+
+        METRICS.add_listener(self)
+
+    def stop(self):
+        """
+        stop profiling and write the output
+        """
+        METRICS.remove_listener(self)
+
+        if self.mode == "sample":
+            self._stop_event.set()
+            self._sampler.join()
+        else:
+            for profile in self._profiles.values():
+                profile.disable()
+            self._active = []
+
+        self.write()
+
+    def on_stage_enter(self, stage):
+        """
+        called by METRICS in the thread running the stage
+        """
+        thread_id = threading.get_ident()
+
+        with self._lock:
+            self._stages[thread_id].append(stage)
+
+        if self.mode == "cprofile" and thread_id == self._thread_id:
+            self._switch_to(stage)
+
+    def on_stage_exit(self, _stage):
+        """
+        called by METRICS in the thread running the stage
+        """
+        thread_id = threading.get_ident()
+
+        with self._lock:
+            stages = self._stages[thread_id]
+            if stages:
+                stages.pop()
+
+        if self.mode == "cprofile" and thread_id == self._thread_id:
+            self._switch_back()
+
+    def _switch_to(self, stage):
+        """
+        the time from now is accounted to stage (cprofile mode)
+        """
+        if self._active:
+            self._profiles[self._active[-1]].disable()
+
+        profile = self._profiles.setdefault(stage, cProfile.Profile())
+        profile.enable()
+        self._active.append(stage)
+
+    def _switch_back(self):
+        """
+        back to the enclosing stage (cprofile mode)
+        """
+        if len(self._active) <= 1:
+            return
+
+        self._profiles[self._active.pop()].disable()
+        self._profiles[self._active[-1]].enable()
+
+    def _sample_loop(self):
+        """
+        take a sample of all the threads every interval (sample mode)
+        """
+        sampler_id = threading.get_ident()
+
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()  # pylint: disable=protected-access
+
+            with self._lock:
+                for thread_id, frame in frames.items():
+                    if thread_id == sampler_id:
+                        continue
+
+                    stages = self._stages.get(thread_id)
+                    stage = stages[-1] if stages else NO_STAGE
+
+                    stack = []
+                    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                        stack.append(frame_name(frame))
+                        frame = frame.f_back
+
+                    self._samples[(stage, ";".join(reversed(stack)))] += 1
+
+                self._n_samples += 1
+
+    def write(self):
+        """
+        write the output files (can be called more times, cumulative)
+        """
+        if self.mode == "sample":
+            self._write_samples()
+        else:
+            self._write_pstats()
+
+    def _write_samples(self):
+        with self._lock:
+            samples = dict(self._samples)
+            n_samples = self._n_samples
+
+        per_stage = Counter()
+
+        path = os.path.join(self.out_dir, f"{self.prefix}samples.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for (stage, stack), count in sorted(samples.items()):
+                f.write(f"{stage};{stack} {count}\n")
+                per_stage[stage] += count
+
+        path = os.path.join(self.out_dir, f"{self.prefix}samples_summary.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(
+                f"{n_samples} samples every {1000 * self.interval:.0f} ms "
+                "(all threads)\n"
+            )
+            total = sum(per_stage.values())
+            for stage, count in per_stage.most_common():
+                f.write(f"{stage:<20} {count:>8} {100 * count / total:6.1f}%\n")
+
+    def _write_pstats(self):
+        summary = io.StringIO()
+
+        for stage, profile in self._profiles.items():
+            path = os.path.join(self.out_dir, f"{self.prefix}{stage}.pstats")
+
+            try:
+                stats = pstats.Stats(profile)
+            except TypeError:
+                # never enabled with calls recorded
+                continue
+
+            stats.dump_stats(path)
+
+            summary.write(f"\n=== stage: {stage} ===\n")
+            stats.stream = summary
+            stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+
+        path = os.path.join(self.out_dir, f"{self.prefix}profile_summary.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(summary.getvalue())
+
+
+def start_profiling(out_dir, mode="sample", interval=DEFAULT_INTERVAL):
+    """
+    start a StageProfiler (None if out_dir is None)
+
+    worker processes started after this call are profiled too
+    """
+    if out_dir is None:
+        return None
+
+    profiler = StageProfiler(out_dir, mode, interval)
+    profiler.start()
+
+    os.environ[ENV_PROFILE_DIR] = out_dir
+    os.environ[ENV_PROFILE_MODE] = mode
+
+    logger.info("Profiling (%s), output in %s", mode, out_dir)
+
+    return profiler
+
+
+def stop_profiling(profiler):
+    """
+    stop the profiler and write the output
+    """
+    if profiler is None:
+        return
+
+    profiler.stop()
+
+    os.environ.pop(ENV_PROFILE_DIR, None)
+    os.environ.pop(ENV_PROFILE_MODE, None)
+
+    logger.info("Profile written in %s", profiler.out_dir)
+
+
+@contextmanager
+def profile_run(out_dir, mode="sample"):
+    """
+    profile the block (nothing if out_dir is None)
+    """
+    profiler = start_profiling(out_dir, mode)
+    try:
+        yield profiler
+    finally:
+        stop_profiling(profiler)
+
+
+# the profiler of a worker process, started at the first task
+_worker_profiler = None
+
+
+@contextmanager
+def worker_profiling():
+    """
+    in a worker process: profile the block if the parent is profiling
+
+    the output of the worker is updated at the end of each block
+    """
+    global _worker_profiler
+
+    out_dir = os.environ.get(ENV_PROFILE_DIR)
+
+    if not out_dir:
+        yield
+        return
+
+    if _worker_profiler is None:
+        _worker_profiler = StageProfiler(
+            out_dir,
+            os.environ.get(ENV_PROFILE_MODE, "sample"),
+            prefix=f"worker_{os.getpid()}_",
+        )
+        _worker_profiler.start()
+
+    try:
+        yield
+    finally:
+        _worker_profiler.write()
@@ -0,0 +1,182 @@
+"""
+Stub embedding server
+
+A local server speaking the NVIDIA NIM /v1/embeddings protocol,
+to test and benchmark the loaders without a real embedding endpoint.
+
+Vectors are deterministic (derived from the hash of the text) and each
+request waits a configurable latency, to simulate the model inference.
+With max_in_flight the server answers 429 (with Retry-After) when more
+requests are in progress, to simulate throttling.
+
+Usage: python stub_embedding_server.py --port 8000 --latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import get_console_logger
+
+logger = get_console_logger()
+
+DEFAULT_DIMENSIONS = 2048
+
+
+def fake_embedding(text, dimensions=DEFAULT_DIMENSIONS):
+    """
+    return a deterministic, normalized vector for text
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rnd = random.Random(seed)
+
+    vector = [rnd.uniform(-1.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(x * x for x in vector))
+
+    return [x / norm for x in vector]
+
+
+class StubEmbeddingHandler(BaseHTTPRequestHandler):
+    """
+    handles POST /v1/embeddings
+    """
+
+    # HTTP/1.1 to support keep-alive connections
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        """
+        compute the embeddings for the input texts
+        """
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length))
+
+        texts = request.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        dimensions = request.get("dimensions") or DEFAULT_DIMENSIONS
+
+        with self.server.stats_lock:
+            self.server.num_requests += 1
+            throttled = (
+                self.server.max_in_flight is not None
+                and self.server.in_flight >= self.server.max_in_flight
+            )
+            if throttled:
+                self.server.num_throttled += 1
+            else:
+                self.server.in_flight += 1
+                self.server.num_texts += len(texts)
+
+        if throttled:
+            self.send_error_response(429, {"Retry-After": "1"})
+            return
+
+        try:
+            # simulate the inference time
+            time.sleep(self.server.latency)
+        finally:
+            with self.server.stats_lock:
+                self.server.in_flight -= 1
+
+        body = json.dumps(
+            {
+                "object": "list",
+                "model": request.get("model"),
+                "data": [
+                    {
+                        "object": "embedding",
+                        "index": i,
+                        "embedding": fake_embedding(text, dimensions),
+                    }
+                    for i, text in enumerate(texts)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }
+        ).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_response(self, status, headers):
+        """
+        error with an empty json body
+        """
+        body = b"{}"
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # pylint: disable=redefined-builtin
+        # no log for every request
+        return
+
+
+def start_stub_server(host="127.0.0.1", port=0, latency=0.05, max_in_flight=None):
+    """
+    start the stub server in a background thread
+
+    port=0 picks a free port
+    max_in_flight: requests over this num. in progress get a 429
+    returns the server (call shutdown() to stop it) and the url
+    """
+    server = ThreadingHTTPServer((host, port), StubEmbeddingHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.stats_lock = threading.Lock()
+    server.num_requests = 0
+    server.num_texts = 0
+    server.num_throttled = 0
+    server.in_flight = 0
+    server.max_in_flight = max_in_flight
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    url = f"http://{host}:{server.server_address[1]}/v1/embeddings"
+
+    return server, url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub NIM embedding server.")
+
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host.")
+    parser.add_argument("--port", type=int, default=8000, help="Port.")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Latency per request (sec.)."
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help="Answer 429 over this num. of requests in progress.",
+    )
+
+    args = parser.parse_args()
+
+    stub_server, stub_url = start_stub_server(
+        args.host, args.port, args.latency, args.max_in_flight
+    )
+
+    logger.info("Stub embedding server listening on %s", stub_url)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub_server.shutdown()
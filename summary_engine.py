@@ -0,0 +1,240 @@
+"""
+Summary engine for the chunk headers
+
+Generates the summaries with the OCI GenAI LLM:
+    * one client (and prompt chain) reused for all the calls
+    * up to SUMMARY_MAX_CONCURRENCY requests in parallel
+    * a token bucket limits the rate of the requests (on-demand limits)
+    * retries with exponential backoff when throttled (429), on 5xx and on
+      connection errors (same classification of the embeddings)
+    * summaries are cached on disk by hash of the text, so re-runs and
+      unchanged documents don't call the LLM again
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import backoff
+from tqdm import tqdm
+from langchain.prompts import PromptTemplate
+from langchain_community.chat_models.oci_generative_ai import ChatOCIGenAI
+
+from embedding_resilience import is_retryable_error
+from utils import get_console_logger
+from metrics import METRICS
+from config import (
+    MODEL_4_SUMMARY,
+    ENDPOINT,
+    AUTH_TYPE,
+    SUMMARY_MAX_CONCURRENCY,
+    SUMMARY_REQUESTS_PER_MINUTE,
+    SUMMARY_BURST,
+    SUMMARY_MAX_RETRIES,
+    SUMMARY_CACHE_PATH,
+)
+from config_private import COMPARTMENT_ID
+
+logger = get_console_logger()
+
+SUMMARY_PROMPT = (
+    "Read the following text and generate a brief summary "
+    "in the **same language** of the original text.\n\n"
+    "Return ONLY the summary, do not add comments or any other text."
+    "Text:\n{text}\n\n"
+    "Summary:"
+)
+
+
+class TokenBucket:
+    """
+    Rate limiter: rate tokens per second, up to capacity (burst)
+    acquire() blocks until a token is available
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        take a token, waiting if needed
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.last_refill) * self.rate
+                )
+                self.last_refill = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class SummaryCache:
+    """
+    persistent cache of the summaries (SQLite), keyed by hash of model + text
+    """
+
+    def __init__(self, cache_path: str):
+        self._lock = threading.Lock()
+        # timeout: the file can be shared by the processes of the pool
+        self._conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        """
+        return the summary, None if not in cache
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def put(self, key: str, summary: str):
+        """
+        store the summary
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary) VALUES (?, ?)",
+                (key, summary),
+            )
+            self._conn.commit()
+
+
+class SummaryEngine:
+    """
+    generates (and caches) the summaries of texts
+    """
+
+    def __init__(
+        self,
+        model_id: str = MODEL_4_SUMMARY,
+        max_concurrency: int = SUMMARY_MAX_CONCURRENCY,
+        requests_per_minute: int = SUMMARY_REQUESTS_PER_MINUTE,
+        burst: int = SUMMARY_BURST,
+        max_retries: int = SUMMARY_MAX_RETRIES,
+        cache_path: str = SUMMARY_CACHE_PATH,
+    ):
+        self.model_id = model_id
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = TokenBucket(requests_per_minute / 60.0, burst)
+        self.cache = SummaryCache(cache_path) if cache_path else None
+
+        self.hits = 0
+        self.calls = 0
+        self._stats_lock = threading.Lock()
+
+        self._chain = None
+        self._chain_lock = threading.Lock()
+
+        self._invoke_with_retry = backoff.on_exception(
+            backoff.expo,
+            Exception,
+            max_tries=max_retries,
+            giveup=lambda e: not is_retryable_error(e),
+            jitter=backoff.full_jitter,
+            on_backoff=lambda details: logger.info(
+                "Summary throttled, retry in %.1f sec...", details["wait"]
+            ),
+        )(self._invoke)
+
+    def _get_chain(self):
+        """
+        prompt | llm, created once
+        """
+        with self._chain_lock:
+            if self._chain is None:
+                prompt_template = PromptTemplate(
+                    input_variables=["text"], template=SUMMARY_PROMPT
+                )
+                llm = ChatOCIGenAI(
+                    auth_type=AUTH_TYPE,
+                    model_id=self.model_id,
+                    service_endpoint=ENDPOINT,
+                    compartment_id=COMPARTMENT_ID,
+                )
+                self._chain = prompt_template | llm
+
+        return self._chain
+
+    def _invoke(self, text: str) -> str:
+        """
+        a single call to the LLM, rate limited
+        """
+        self.rate_limiter.acquire()
+
+        return self._get_chain().invoke({"text": text}).content
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_id}|{text}".encode("utf-8")).hexdigest()
+
+    def summarize(self, text: str) -> str:
+        """
+        return the summary of text
+        """
+        key = self._key(text)
+
+        if self.cache is not None:
+            summary = self.cache.get(key)
+            if summary is not None:
+                with self._stats_lock:
+                    self.hits += 1
+                METRICS.increment("summary_cache_hits")
+                return summary
+
+        with self._stats_lock:
+            self.calls += 1
+        with METRICS.stage("summary_llm", items=1, n_bytes=len(text)):
+            summary = self._invoke_with_retry(text)
+
+        if self.cache is not None:
+            self.cache.put(key, summary)
+
+        return summary
+
+    def summarize_many(self, texts: list, desc: str = "Summaries") -> list:
+        """
+        return the summaries of texts, in the same order (with a progress bar)
+        """
+        if self.max_concurrency == 1 or len(texts) <= 1:
+            return [self.summarize(text) for text in tqdm(texts, desc=desc)]
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            return list(
+                tqdm(executor.map(self.summarize, texts), total=len(texts), desc=desc)
+            )
+
+
+_summary_engine = None
+_summary_engine_lock = threading.Lock()
+
+
+def get_summary_engine() -> SummaryEngine:
+    """
+    return the engine shared in the process
+    """
+    global _summary_engine
+
+    with _summary_engine_lock:
+        if _summary_engine is None:
+            _summary_engine = SummaryEngine()
+
+    return _summary_engine
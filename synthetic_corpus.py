@@ -0,0 +1,250 @@
+"""
+Synthetic corpus for the benchmarks
+
+generates PDF, DOCX and MD files with random (but deterministic) text,
+without external dependencies: PDF and DOCX are written directly
+(minimal valid files, readable by the loaders)
+
+Usage: python synthetic_corpus.py ./bench_corpus --files 10 --pages 20
+"""
+
+import argparse
+import os
+import random
+import textwrap
+import zipfile
+from xml.sax.saxutils import escape
+
+from utils import get_console_logger
+
+logger = get_console_logger()
+
+SUPPORTED_FORMATS = ["pdf", "docx", "md"]
+
+# chars per line in PDF pages
+PDF_LINE_WIDTH = 95
+PDF_LINES_PER_PAGE = 60
+
+
+def make_vocabulary(rng, size=2000):
+    """
+    pseudo-words of 2-10 letters
+    """
+    letters = "abcdefghijklmnopqrstuvwxyz"
+
+    return [
+        "".join(rng.choice(letters) for _ in range(rng.randint(2, 10)))
+        for _ in range(size)
+    ]
+
+
+def make_paragraph(rng, vocabulary, n_sentences):
+    """
+    a paragraph of n_sentences random sentences
+    """
+    sentences = []
+    for _ in range(n_sentences):
+        words = rng.choices(vocabulary, k=rng.randint(6, 20))
+        sentences.append(" ".join(words).capitalize() + ".")
+
+    return " ".join(sentences)
+
+
+def make_pages(rng, vocabulary, n_pages, words_per_page):
+    """
+    list of pages, each one a list of paragraphs
+    """
+    pages = []
+    for _ in range(n_pages):
+        paragraphs = []
+        n_words = 0
+        while n_words < words_per_page:
+            paragraph = make_paragraph(rng, vocabulary, rng.randint(2, 6))
+            paragraphs.append(paragraph)
+            n_words += len(paragraph.split())
+        pages.append(paragraphs)
+
+    return pages
+
+
+def pdf_escape(text):
+    """
+    escape the special chars of PDF strings
+    """
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """
+    write a minimal PDF, one page for each page (text in Helvetica)
+    """
+    objects = []
+
+    # 1: catalog, 2: pages, 3: font, then page and content for each page
+    n_pages = len(pages)
+    page_ids = [4 + 2 * i for i in range(n_pages)]
+
+    objects.append("<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(
+        f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] "
+        f"/Count {n_pages} >>"
+    )
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for page_id, paragraphs in zip(page_ids, pages):
+        lines = []
+        for paragraph in paragraphs:
+            lines += textwrap.wrap(paragraph, PDF_LINE_WIDTH) + [""]
+        lines = lines[:PDF_LINES_PER_PAGE]
+
+        stream = "BT /F1 9 Tf 40 800 Td 12 TL\n"
+        stream += "\n".join(f"({pdf_escape(line)}) Tj T*" for line in lines)
+        stream += "\nET"
+
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        )
+        objects.append(
+            f"<< /Length {len(stream.encode('latin-1'))} >>\n"
+            f"stream\n{stream}\nendstream"
+        )
+
+    content = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(content))
+        content += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+
+    xref_offset = len(content)
+    content += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        content += f"{offset:010d} 00000 n \n".encode("latin-1")
+    content += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode("latin-1")
+
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def write_docx(path, pages):
+    """
+    write a minimal DOCX, with a page break between pages
+    """
+    body = []
+    for i, paragraphs in enumerate(pages):
+        if i > 0:
+            body.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+        for paragraph in paragraphs:
+            body.append(f"<w:p><w:r><w:t>{escape(paragraph)}</w:t></w:r></w:p>")
+
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/'
+        'wordprocessingml/2006/main">'
+        f"<w:body>{''.join(body)}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+        '.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", content_types)
+        zf.writestr("_rels/.rels", rels)
+        zf.writestr("word/document.xml", document)
+
+
+def write_md(path, pages, title):
+    """
+    write a MD file, a section for each page
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# {title}\n\n")
+        for i, paragraphs in enumerate(pages, start=1):
+            f.write(f"## Section {i}\n\n")
+            for paragraph in paragraphs:
+                f.write(paragraph + "\n\n")
+
+
+def generate_corpus(
+    out_dir,
+    n_files=10,
+    n_pages=20,
+    words_per_page=400,
+    formats=None,
+    seed=1234,
+):
+    """
+    generate n_files files (formats in turn) in out_dir
+
+    returns the list of the paths
+    """
+    formats = formats or SUPPORTED_FORMATS
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    paths = []
+    for i in range(n_files):
+        file_format = formats[i % len(formats)]
+        path = os.path.join(out_dir, f"synthetic_{i:04d}.{file_format}")
+
+        pages = make_pages(rng, vocabulary, n_pages, words_per_page)
+
+        if file_format == "pdf":
+            write_pdf(path, pages)
+        elif file_format == "docx":
+            write_docx(path, pages)
+        elif file_format == "md":
+            write_md(path, pages, f"Synthetic document {i}")
+        else:
+            raise ValueError(f"Unsupported format: {file_format}")
+
+        paths.append(path)
+
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus.")
+
+    parser.add_argument("out_dir", type=str, help="Output dir.")
+    parser.add_argument("--files", type=int, default=10, help="Num. of files.")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per file.")
+    parser.add_argument("--words", type=int, default=400, help="Words per page.")
+    parser.add_argument(
+        "--formats",
+        type=str,
+        nargs="+",
+        choices=SUPPORTED_FORMATS,
+        default=SUPPORTED_FORMATS,
+        help="File formats, used in turn.",
+    )
+
+    args = parser.parse_args()
+
+    corpus = generate_corpus(
+        args.out_dir, args.files, args.pages, args.words, args.formats
+    )
+
+    total_mb = sum(os.path.getsize(path) for path in corpus) / 2**20
+    logger.info(
+        "Generated %s files (%.1f MB) in %s", len(corpus), total_mb, args.out_dir
+    )
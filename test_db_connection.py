@@ -2,7 +2,7 @@
 Test connection to Vector Store
 """
 
-from db_doc_loader_backend import get_db_connection
+from db_connection import get_db_connection
 from utils import get_console_logger
 
 logger = get_console_logger()
@@ -5,9 +5,9 @@ Date last modified: 2024-04-27
 Python Version: 3.11
 """
 
+import hashlib
 import logging
 import os
-import numpy as np
 
 
 def debug_bool(b_str):
@@ -31,6 +31,26 @@ def remove_path_from_ref(ref_pathname):
     return ref
 
 
+def compute_file_hash(file_path, block_size=1024 * 1024):
+    """
+    return the sha256 of the content of the file
+    """
+    sha = hashlib.sha256()
+
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+
+    return sha.hexdigest()
+
+
+def compute_text_hash(text):
+    """
+    return the sha256 of a text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 def get_console_logger():
     """
     To get a logger to print on console
@@ -69,7 +89,18 @@ def compute_stats(list_docs):
 
     list_docs: LangChain list of Documents
     """
-    lengths = [len(d.page_content) for d in list_docs]
+    return compute_length_stats([len(d.page_content) for d in list_docs])
+
+
+def compute_length_stats(lengths):
+    """
+    Compute stats for the distribution of chunks' lengths
+
+    lengths: list of lengths (in chars) of the chunks
+    """
+    # imported here: utils is used also by commands that don't need NumPy
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
 
     mean_length = int(round(np.mean(lengths), 0))
     std_dev = int(round(np.std(lengths), 0))
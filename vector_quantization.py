@@ -0,0 +1,104 @@
+"""
+Reduced precision storage for the vectors
+
+Oracle 23ai VECTOR columns can store the dimensions as FLOAT64, FLOAT32,
+INT8 or BINARY. The format is chosen with EMBEDDINGS_BITS (config.py):
+
+    64 -> FLOAT64, 32 -> FLOAT32, 8 -> INT8, 1 -> BINARY
+
+vectors are quantized here (client side) before the insert:
+    * INT8: each vector is scaled so that its max abs value is 127
+      (the norm is lost, fine for COSINE distance)
+    * BINARY: one bit per dimension (1 if > 0), packed in bytes.
+      Dimensions must be a multiple of 8 and the only distances
+      supported are HAMMING and JACCARD (query vectors are quantized
+      in the same way, see OracleVS4DBLoading)
+"""
+
+from array import array
+
+import numpy as np
+
+from config import EMBEDDINGS_BITS
+
+# format of the VECTOR column for the num. of bits
+VECTOR_FORMATS = {64: "FLOAT64", 32: "FLOAT32", 8: "INT8", 1: "BINARY"}
+
+# typecode of the array bound to the VECTOR column
+ARRAY_TYPECODES = {"FLOAT64": "d", "FLOAT32": "f", "INT8": "b", "BINARY": "B"}
+
+# bytes used for one dimension (BINARY: 1 bit)
+BYTES_PER_DIMENSION = {"FLOAT64": 8, "FLOAT32": 4, "INT8": 1, "BINARY": 1 / 8}
+
+
+def get_vector_format(bits: int = EMBEDDINGS_BITS) -> str:
+    """
+    return the format of the VECTOR column for the num. of bits
+    """
+    if bits not in VECTOR_FORMATS:
+        raise ValueError(
+            f"EMBEDDINGS_BITS must be one of {list(VECTOR_FORMATS)}, got {bits}"
+        )
+
+    return VECTOR_FORMATS[bits]
+
+
+def get_column_dimensions(embedding_dim: int, vector_format: str) -> int:
+    """
+    num. of dimensions of the VECTOR column (for BINARY the num. of bits)
+    """
+    if vector_format == "BINARY" and embedding_dim % 8 != 0:
+        raise ValueError(
+            f"BINARY vectors need dimensions multiple of 8, got {embedding_dim}"
+        )
+
+    return embedding_dim
+
+
+def quantize_int8(vectors: np.ndarray) -> np.ndarray:
+    """
+    scale each vector to [-127, 127] and round
+    """
+    max_abs = np.abs(vectors).max(axis=1, keepdims=True)
+    # zero vectors stay zero
+    max_abs[max_abs == 0] = 1.0
+
+    return np.rint(vectors / max_abs * 127).astype(np.int8)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """
+    one bit per dimension (1 if > 0), packed in uint8
+    """
+    return np.packbits(vectors > 0, axis=1)
+
+
+def quantize(embeddings, vector_format: str) -> list:
+    """
+    convert the embeddings (list of vectors) to the arrays to bind
+    to a VECTOR column in vector_format
+    """
+    if len(embeddings) == 0:
+        return []
+
+    typecode = ARRAY_TYPECODES[vector_format]
+
+    if vector_format in ("FLOAT32", "FLOAT64"):
+        return [array(typecode, embedding) for embedding in embeddings]
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+
+    if vector_format == "INT8":
+        quantized = quantize_int8(vectors)
+    else:
+        get_column_dimensions(vectors.shape[1], vector_format)
+        quantized = quantize_binary(vectors)
+
+    return [array(typecode, row.tobytes()) for row in quantized]
+
+
+def get_vector_bytes(embedding_dim: int, vector_format: str) -> float:
+    """
+    bytes needed to store one vector in vector_format
+    """
+    return embedding_dim * BYTES_PER_DIMENSION[vector_format]